@@ -0,0 +1,96 @@
+"""
+导入耗时基准：每个模块在全新的解释器中冷启动导入（python -X importtime），
+报告导入该模块的总耗时以及耗时最多的依赖，用于跟踪启动时间是否退化
+
+用法:
+    python benchmark_imports.py                      # 默认模块
+    python benchmark_imports.py main core.qa_engine  # 指定模块
+    python benchmark_imports.py --repeat 5 --top 10 --budget-ms 1000
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+DEFAULT_MODULES = [
+    "main",
+    "core",
+    "models",
+    "core.qa_engine",
+    "core.vector_store",
+    "core.document_loader",
+    "core.text_processor",
+    "models.deepseek_models",
+    "models.huggingface_models",
+]
+
+# -X importtime 的输出格式: "import time:       self [us] |  cumulative | imported package"
+_LINE_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S.*?)\s*$")
+
+
+def measure(module: str) -> Tuple[float, Dict[str, int]]:
+    """
+    在子进程中导入 module，返回 (该模块的累计导入耗时ms, {模块名: 自身耗时us})
+    """
+    repo_root = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=repo_root,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "未知错误"
+        raise RuntimeError(f"导入 {module} 失败: {last_line}")
+
+    cumulative_ms = 0.0
+    self_times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = _LINE_PATTERN.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, name = match.groups()
+        self_times[name] = self_times.get(name, 0) + int(self_us)
+        if name == module:
+            cumulative_ms = int(cumulative_us) / 1000
+    return cumulative_ms, self_times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="测量各模块的冷启动导入耗时")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="要测量的模块")
+    parser.add_argument("--repeat", type=int, default=3, help="每个模块测量次数，取中位数")
+    parser.add_argument("--top", type=int, default=5, help="列出耗时最多的依赖个数")
+    parser.add_argument("--budget-ms", type=float, default=None, help="任一模块超过该耗时时以非0状态退出")
+    args = parser.parse_args()
+
+    over_budget: List[str] = []
+    print(f"{'模块':<32}{'导入耗时(ms)':>14}")
+    print("-" * 46)
+    for module in args.modules:
+        try:
+            runs = [measure(module) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{module:<32}{'失败':>14}  {e}")
+            over_budget.append(module)
+            continue
+        median_ms = statistics.median(cumulative for cumulative, _ in runs)
+        print(f"{module:<32}{median_ms:>14.1f}")
+
+        heaviest = sorted(runs[-1][1].items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for name, self_us in heaviest:
+            print(f"    {name:<40}{self_us / 1000:>10.1f} ms")
+        if args.budget_ms is not None and median_ms > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"\n超出预算或导入失败: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
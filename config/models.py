@@ -42,6 +42,7 @@ class QAResult:
     processing_time:float
     timestamp:datetime
     confidence:Optional[float] = None
+    from_cache: bool = False  # 是否来自答案缓存
 
 
 
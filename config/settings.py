@@ -24,35 +24,109 @@ class ModelConfig:
     api_base: Optional[str] = None
     temperature: float = 0.1
     max_tokens: Optional[int] = None
+    max_concurrency: int = 8  # 并发批量问答时同时进行的请求数上限
+    connect_timeout: float = 5.0  # 建立连接超时（秒）
+    read_timeout: float = 60.0  # 读取响应超时（秒）
+    max_connections: Optional[int] = None  # 连接池大小，None 表示与 max_concurrency 一致
+    keepalive_expiry: float = 30.0  # 空闲keep-alive连接的保留时间（秒）
+    max_retries: int = 3  # 429/5xx/超时等可重试错误的最大重试次数
+    retry_backoff_base: float = 0.5  # 指数退避的初始等待（秒）
+    retry_backoff_max: float = 8.0  # 单次退避等待上限（秒）
+    circuit_failure_threshold: int = 5  # 连续失败多少次后熔断，0 表示关闭熔断
+    circuit_reset_timeout: float = 30.0  # 熔断持续时间（秒）
 
 @dataclass
 class EmbeddingConfig:
     """嵌入模型配置类"""
-    provider: str # 'openai', 'deepseek', 'huggingface'
+    provider: str # 'openai', 'deepseek', 'huggingface', 'onnx'
     model_name: str
     api_key: Optional[str] = None
     api_base: Optional[str] = None
+    cache_path: Optional[str] = None  # 持久化嵌入缓存(SQLite)路径，为空时不启用
+    cache_max_entries: int = 500000  # 嵌入缓存最多保存的向量数，超出后按LRU淘汰
+    query_cache_size: int = 1024  # 进程内查询向量LRU缓存容量，0 表示关闭
+    # 文档向量化分批：按token长度排序，每批 token数(按最长文本计) 不超过预算
+    batch_token_budget: int = 8192
+    max_batch_size: int = 128
+    adaptive_batching: bool = True  # 根据实测吞吐自动调节token预算
+    # 全量构建知识库时的多进程嵌入：进程数 × 每进程线程数，进程数 <= 1 时不启用
+    worker_processes: int = 0
+    worker_threads: int = 1
+    worker_shard_size: int = 64  # 每次分发给一个工作进程的文本数
+    # ONNX Runtime后端（provider='onnx'时生效）
+    onnx_path: Optional[str] = None  # 导出的ONNX模型目录，默认 cache/onnx/<模型名>
+    onnx_quantize: bool = False  # 使用int8动态量化模型
+    intra_op_threads: Optional[int] = None  # ONNX Runtime算子内线程数，默认由ONNX Runtime决定
+    onnx_parity_threshold: Optional[float] = 0.99  # 导出/量化后与PyTorch向量的最小余弦相似度，None 表示不检查
 
 @dataclass
 class VectorStoreConfig:
     """向量数据库配置类"""
-    provider: str # 'chroma', 'faiss', 'pinecone'
+    provider: str # 'chroma', 'numpy', 'faiss', 'pinecone'
     persist_directory: Optional[str] =  None
     collection_name: str = "langchain_docs"
+    ingest_batch_size: int = 256  # 流式构建时每批向量化并写入的chunk数
+    # FAISS索引参数（provider='faiss'时生效）
+    index_type: str = "flat"  # 'flat', 'ivfpq', 'hnsw'
+    nlist: int = 1024  # IVF聚类中心数
+    pq_m: int = 16  # PQ子向量个数，需整除向量维度
+    pq_nbits: int = 8  # 每个子向量的编码位数
+    nprobe: int = 16  # 检索时访问的聚类数，越大召回越高越慢
+    hnsw_m: int = 32  # HNSW每个节点的邻居数
+    ef_construction: int = 200
+    ef_search: int = 64  # 检索时的候选队列长度，越大召回越高越慢
+    hnsw_compact_ratio: float = 0.2  # hnsw中已删除向量的占比超过该值时用存活向量重建索引
+    train_size: Optional[int] = None  # IVF-PQ训练样本数，默认 nlist * 39
+    keyword_index: bool = False  # 写入时同步维护BM25关键词索引（hybrid检索时开启），关闭时首次关键词检索再从chunk存储补建
 
 @dataclass
 class ProcessingConfig:
     """文档处理配置类"""
     chunk_size: int = 1000
     chunk_overlap: int = 200
+    length_unit: str = "chars"  # 'chars'（字符数）, 'tokens'（嵌入模型分词器的token数）；chunk_size/chunk_overlap 使用该单位
+    tokenizer_name: Optional[str] = None  # tokens模式使用的分词器，默认与嵌入模型相同
+    max_tokens: Optional[int] = None  # 嵌入模型的最大序列长度，None 时从模型配置读取
     separators: list = field(default_factory=lambda: ['\n\n', '\n', ' ', ''])
+    parallel_loading: bool = False  # 是否使用进程池并行解析文档
+    load_workers: Optional[int] = None  # 并行加载的进程数，None 表示CPU核数
+    # 内容相同的chunk只向量化和存储一次，metadata["locations"] 记录所有位置
+    # 开启后chunk id改为内容哈希，取代按 源文件路径+chunk位置 生成的稳定id（旧库迁移也只为未去重的chunk生成位置id）；
+    # 切换该选项后需要重建知识库，否则同一向量库中会混用两种id
+    deduplicate_chunks: bool = False
+    parallel_chunking: bool = False  # 是否使用进程池并行切分文档
+    chunk_workers: Optional[int] = None  # 并行切分的进程数，None 表示CPU核数
+    chunk_docs_per_task: int = 16  # 每个切分任务包含的文档数
 
 @dataclass
 class RetrievalConfig:
     """向量检索配置类"""
-    serch_type: str = "similarity"
+    serch_type: str = "similarity"  # 'similarity'（向量检索）, 'mmr'（最大边际相关）, 'hybrid'（向量 + BM25，RRF融合）
     k: int = 4
-    score_threshold: Optional[float] = None
+    score_threshold: Optional[float] = None  # 向量检索的最低余弦相似度，低于阈值的chunk不送入LLM
+    fetch_k: int = 20  # mmr/hybrid模式下取回的候选数
+    mmr_lambda: float = 0.5  # MMR中相关性的权重，越小结果越多样
+    context_max_tokens: int = 3000  # 送入LLM的上下文token预算
+    rrf_k: int = 60  # RRF融合常数，越大排名靠后的结果权重越高
+
+@dataclass
+class AnswerCacheConfig:
+    """问答语义缓存配置类"""
+    enabled: bool = True
+    similarity_threshold: float = 0.95  # 问题向量余弦相似度不低于该值才复用回答
+    max_entries: int = 512
+    ttl_seconds: Optional[float] = 3600.0
+
+@dataclass
+class RerankerConfig:
+    """交叉编码器重排序配置类"""
+    enabled: bool = False
+    model_name: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"  # 小型多语言模型，支持中英文问题
+    fetch_k: int = 20  # 重排序前取回的候选数
+    top_n: int = 3  # 重排序后送入LLM的chunk数
+    batch_size: int = 32
+    max_length: int = 512  # (问题, chunk) 拼接后的最大token数，限制CPU上的计算量
+    latency_budget_ms: Optional[float] = 300.0  # 预计耗时超过预算时少排或跳过重排序，None 表示不限制
 
 class Settings:
     """全局配置管理类"""
@@ -69,34 +143,103 @@ class Settings:
             provider=os.getenv("LLM_PROVIDER", "deepseek"),
             model_name=os.getenv("LLM_MODEL", "deepseek-chat"),
             api_key=os.getenv("DEEPSEEK_API_KEY"),
-            temperature=float(os.getenv("LLM_TEMPERATURE", "0.1"))
+            api_base=os.getenv("LLM_API_BASE"),
+            temperature=float(os.getenv("LLM_TEMPERATURE", "0.1")),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("LLM_READ_TIMEOUT", "60")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS")) if os.getenv("LLM_MAX_CONNECTIONS") else None,
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            retry_backoff_base=float(os.getenv("LLM_RETRY_BACKOFF_BASE", "0.5")),
+            retry_backoff_max=float(os.getenv("LLM_RETRY_BACKOFF_MAX", "8")),
+            circuit_failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5")),
+            circuit_reset_timeout=float(os.getenv("LLM_CIRCUIT_RESET_TIMEOUT", "30"))
         )
 
         #嵌入模型配置
         self.embedding_config = EmbeddingConfig(
             provider=os.getenv("EMBEDDING_PROVIDER", "huggingface"),
             model_name=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
-            api_key=os.getenv("DEEPSEEK_API_KEY")
+            api_key=os.getenv("DEEPSEEK_API_KEY"),
+            cache_path=os.getenv("EMBEDDING_CACHE_PATH", os.path.join("cache", "embeddings.sqlite")) or None,
+            cache_max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000")),
+            query_cache_size=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024")),
+            batch_token_budget=int(os.getenv("EMBEDDING_BATCH_TOKEN_BUDGET", "8192")),
+            max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "128")),
+            adaptive_batching=os.getenv("EMBEDDING_ADAPTIVE_BATCHING", "true").lower() in ("1", "true", "yes"),
+            worker_processes=int(os.getenv("EMBEDDING_WORKER_PROCESSES", "0")),
+            worker_threads=int(os.getenv("EMBEDDING_WORKER_THREADS", "1")),
+            worker_shard_size=int(os.getenv("EMBEDDING_WORKER_SHARD_SIZE", "64")),
+            onnx_path=os.getenv("ONNX_MODEL_PATH") or None,
+            onnx_quantize=os.getenv("ONNX_QUANTIZE", "false").lower() in ("1", "true", "yes"),
+            intra_op_threads=int(os.getenv("ONNX_INTRA_OP_THREADS")) if os.getenv("ONNX_INTRA_OP_THREADS") else None,
+            onnx_parity_threshold=float(os.getenv("ONNX_PARITY_THRESHOLD", "0.99")) or None
         )
 
         #向量数据库配置
         self.vector_store_config = VectorStoreConfig(
             provider=os.getenv("VECTOR_STORE_PROVIDER", "chroma"),
             persist_directory=os.getenv("VECTOR_STORE_PATH", "chroma_db"),
-            collection_name=os.getenv("COLLECTION_NAME", "langchain_docs")
+            collection_name=os.getenv("COLLECTION_NAME", "langchain_docs"),
+            ingest_batch_size=int(os.getenv("INGEST_BATCH_SIZE", "256")),
+            index_type=os.getenv("FAISS_INDEX_TYPE", "flat"),
+            nlist=int(os.getenv("FAISS_NLIST", "1024")),
+            pq_m=int(os.getenv("FAISS_PQ_M", "16")),
+            pq_nbits=int(os.getenv("FAISS_PQ_NBITS", "8")),
+            nprobe=int(os.getenv("FAISS_NPROBE", "16")),
+            hnsw_m=int(os.getenv("FAISS_HNSW_M", "32")),
+            ef_construction=int(os.getenv("FAISS_EF_CONSTRUCTION", "200")),
+            ef_search=int(os.getenv("FAISS_EF_SEARCH", "64")),
+            hnsw_compact_ratio=float(os.getenv("FAISS_HNSW_COMPACT_RATIO", "0.2")),
+            train_size=int(os.getenv("FAISS_TRAIN_SIZE")) if os.getenv("FAISS_TRAIN_SIZE") else None,
+            keyword_index=os.getenv("RETRIEVAL_SEARCH_TYPE", "similarity") == "hybrid"
         )
 
         #文档处理配置
+        length_unit = os.getenv("CHUNK_LENGTH_UNIT", "chars")
         self.processing_config = ProcessingConfig(
-            chunk_size=int(os.getenv("CHUNK_SIZE", "1000")),
-            chunk_overlap=int(os.getenv("CHUNK_OVERLAP", "200")),
+            # tokens模式的默认值按 all-MiniLM-L6-v2 的256 token窗口设置
+            chunk_size=int(os.getenv("CHUNK_SIZE", "256" if length_unit == "tokens" else "1000")),
+            chunk_overlap=int(os.getenv("CHUNK_OVERLAP", "32" if length_unit == "tokens" else "200")),
+            length_unit=length_unit,
+            tokenizer_name=os.getenv("CHUNK_TOKENIZER") or self.embedding_config.model_name,
+            max_tokens=int(os.getenv("EMBEDDING_MAX_TOKENS")) if os.getenv("EMBEDDING_MAX_TOKENS") else None,
+            parallel_loading=os.getenv("PARALLEL_LOADING", "false").lower() in ("1", "true", "yes"),
+            load_workers=int(os.getenv("LOAD_WORKERS")) if os.getenv("LOAD_WORKERS") else None,
+            deduplicate_chunks=os.getenv("DEDUPLICATE_CHUNKS", "false").lower() in ("1", "true", "yes"),
+            parallel_chunking=os.getenv("PARALLEL_CHUNKING", "false").lower() in ("1", "true", "yes"),
+            chunk_workers=int(os.getenv("CHUNK_WORKERS")) if os.getenv("CHUNK_WORKERS") else None,
+            chunk_docs_per_task=int(os.getenv("CHUNK_DOCS_PER_TASK", "16")),
         )
 
         #向量检索配置
         self.retrieval_config = RetrievalConfig(
+            serch_type = os.getenv("RETRIEVAL_SEARCH_TYPE", "similarity"),
             k = int(os.getenv("RETRIEVAL_K", "4")),
-            score_threshold = float(os.getenv("RETRIEVAL_SCORE_THRESHOLD", "0.0"))  if os.getenv("SCORE_THRESHOLD") else None
+            score_threshold = float(os.getenv("RETRIEVAL_SCORE_THRESHOLD")) if os.getenv("RETRIEVAL_SCORE_THRESHOLD") else None,
+            fetch_k = int(os.getenv("RETRIEVAL_FETCH_K", "20")),
+            mmr_lambda = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.5")),
+            context_max_tokens = int(os.getenv("CONTEXT_MAX_TOKENS", "3000")),
+            rrf_k = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+        )
+
+        #问答语义缓存配置
+        self.answer_cache_config = AnswerCacheConfig(
+            enabled=os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"),
+            similarity_threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+            max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512")),
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")) or None
+        )
 
+        #重排序配置
+        self.reranker_config = RerankerConfig(
+            enabled=os.getenv("RERANKER_ENABLED", "false").lower() in ("1", "true", "yes"),
+            model_name=os.getenv("RERANKER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"),
+            fetch_k=int(os.getenv("RERANKER_FETCH_K", "20")),
+            top_n=int(os.getenv("RERANKER_TOP_N", "3")),
+            batch_size=int(os.getenv("RERANKER_BATCH_SIZE", "32")),
+            max_length=int(os.getenv("RERANKER_MAX_LENGTH", "512")),
+            latency_budget_ms=float(os.getenv("RERANKER_LATENCY_BUDGET_MS", "300")) or None
         )
 
         # 文档路径
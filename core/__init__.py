@@ -1,7 +1,21 @@
-from .document_loader import DocumentLoader
-from .text_processor import TextProcessor
-from .vector_store import VectorStoreManager
-from .qa_engine import QAEngine
+import importlib
 
-__all__ = ["DocumentLoader", "TextProcessor", "VectorStoreManager", "QAEngine"]
+# 按需导入（PEP 562）：访问时才加载对应模块及其依赖（langchain、chroma、unstructured等）
+_LAZY_IMPORTS = {
+    "DocumentLoader": ".document_loader",
+    "TextProcessor": ".text_processor",
+    "VectorStoreManager": ".vector_store",
+    "QAEngine": ".qa_engine",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
 
+
+__all__ = ["DocumentLoader", "TextProcessor", "VectorStoreManager", "QAEngine"]
@@ -0,0 +1,116 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+from config.models import QAResult
+from models.base import BaseEmbedding
+from utils.logger import get_logger
+
+
+class SemanticAnswerCache:
+    """
+    问答结果语义缓存
+    新问题与缓存问题的向量余弦相似度不低于阈值、且检索到的chunk_id完全一致时，直接复用缓存的回答
+    """
+    def __init__(self, embedding_model: BaseEmbedding, similarity_threshold: float = 0.95,
+                 max_entries: int = 512, ttl_seconds: Optional[float] = None):
+        self.embedding_model = embedding_model
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.logger = get_logger(__name__)
+        self.hits = 0
+        self.misses = 0
+        # 按检索到的chunk_id集合分桶，只需和同一桶内的问题比较相似度
+        self._buckets: Dict[Tuple[str, ...], List[int]] = {}
+        # entry_id -> (归一化的问题向量, chunk_id集合, 回答, 写入时间)
+        self._entries: "OrderedDict[int, Tuple[List[float], Tuple[str, ...], QAResult, float]]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> List[float]:
+        norm = math.sqrt(sum(x * x for x in vector))
+        return [x / norm for x in vector] if norm else list(vector)
+
+    @staticmethod
+    def _key(chunk_ids: Sequence[str]) -> Tuple[str, ...]:
+        return tuple(sorted(chunk_ids))
+
+    def lookup(self, question: str, chunk_ids: Sequence[str]) -> Optional[QAResult]:
+        """
+        查找可复用的回答，未命中返回 None
+        """
+        key = self._key(chunk_ids)
+        with self._lock:
+            candidates = list(self._buckets.get(key, ()))
+        if not candidates:
+            self.misses += 1
+            return None
+
+        embedding = self._normalize(self.embedding_model.embed_query(question))
+        now = time.time()
+        best_result, best_similarity = None, self.similarity_threshold
+        with self._lock:
+            for entry_id in candidates:
+                entry = self._entries.get(entry_id)
+                if entry is None:
+                    continue
+                cached_embedding, _, result, created_at = entry
+                if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                    self._remove(entry_id)
+                    continue
+                similarity = sum(a * b for a, b in zip(embedding, cached_embedding))
+                if similarity >= best_similarity:
+                    best_result, best_similarity = result, similarity
+                    self._entries.move_to_end(entry_id)
+
+        if best_result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.logger.info(f"命中答案缓存（相似度 {best_similarity:.3f}）")
+        return best_result
+
+    def store(self, question: str, chunk_ids: Sequence[str], result: QAResult) -> None:
+        """
+        缓存一次问答结果，超出容量时淘汰最久未使用的条目
+        """
+        key = self._key(chunk_ids)
+        embedding = self._normalize(self.embedding_model.embed_query(question))
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (embedding, key, result, time.time())
+            self._buckets.setdefault(key, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int) -> None:
+        """
+        删除一个条目（调用方需持有锁）
+        """
+        _, key, _, _ = self._entries.pop(entry_id)
+        bucket = self._buckets.get(key, [])
+        if entry_id in bucket:
+            bucket.remove(entry_id)
+        if not bucket:
+            self._buckets.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        清空缓存（知识库重建后旧回答可能已过期）
+        """
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,57 @@
+import hashlib
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+from config.models import Chunk
+from utils.logger import get_logger
+
+LOCATIONS_KEY = "locations"
+
+
+def content_hash(content: str) -> str:
+    """
+    规范化（合并连续空白）后的内容哈希，作为去重后chunk的id
+    """
+    normalized = " ".join(content.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+
+
+def chunk_location(chunk: Chunk) -> Dict:
+    """
+    chunk在源文档中的位置
+    """
+    return {"source": chunk.metadata.get("source"), "parent_doc_id": chunk.parent_doc_id}
+
+
+class ChunkDeduplicator:
+    """
+    按内容去重：内容相同（忽略空白差异）的chunk使用同一个id，只向量化和存储一次，
+    metadata["locations"] 记录它出现过的所有位置
+    分两步接入chunk流水线：assign_ids 为每个chunk换成内容id（源文件清单按此登记），
+    drop_duplicates 丢弃重复的chunk并收集它们的位置，写入完成后由 extra_locations 合并到已存储的chunk
+    exists 用于增量同步：内容已在向量库中的chunk不再重复向量化
+    内容id会取代 core.chunk_ids 的位置id，因此默认关闭（ProcessingConfig.deduplicate_chunks），切换后需重建知识库
+    """
+
+    def __init__(self, exists: Optional[Callable[[str], bool]] = None):
+        self.exists = exists
+        self.logger = get_logger(__name__)
+        self._seen: Set[str] = set()
+        self.extra_locations: Dict[str, List[Dict]] = {}
+        self.duplicates = 0
+
+    @staticmethod
+    def assign_ids(chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        for chunk in chunks:
+            chunk.chunk_id = content_hash(chunk.content)
+            chunk.metadata[LOCATIONS_KEY] = [chunk_location(chunk)]
+            yield chunk
+
+    def drop_duplicates(self, chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        for chunk in chunks:
+            if chunk.chunk_id in self._seen or (self.exists is not None and self.exists(chunk.chunk_id)):
+                self.extra_locations.setdefault(chunk.chunk_id, []).extend(chunk.metadata[LOCATIONS_KEY])
+                self.duplicates += 1
+                continue
+            self._seen.add(chunk.chunk_id)
+            yield chunk
+        if self.duplicates:
+            self.logger.info(f"去重: 跳过 {self.duplicates} 个内容重复的chunks")
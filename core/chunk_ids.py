@@ -0,0 +1,89 @@
+import hashlib
+import os
+import unicodedata
+from typing import Dict
+from config.models import Chunk
+from core.chunk_dedup import LOCATIONS_KEY
+from utils.logger import get_logger
+
+# chunk存储中记录的id方案版本：0/1 为按加载顺序编号的 doc_{i}，2 为按源文件路径和chunk位置生成的稳定id
+ID_SCHEME_VERSION = 2
+POSITION_KEY = "chunk_position"
+
+
+def document_id(docs_path: str, file_path: str, page: int = 0) -> str:
+    """
+    文档id：相对 docs_path 的规范化路径（统一为 / 分隔、Unicode NFC），
+    同一文件产生多个文档时第2个起加 #序号；与文件的加载顺序无关
+    """
+    rel_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(docs_path))
+    rel_path = unicodedata.normalize("NFC", rel_path.replace(os.sep, "/"))
+    return rel_path if page == 0 else f"{rel_path}#{page}"
+
+
+def chunk_id(doc_id: str, position: str, content: str) -> str:
+    """
+    chunk id：文档id + chunk在文档中的结构位置 + 完整内容的哈希
+    """
+    key = f"{doc_id}\x00{position}\x00{content}".encode("utf-8")
+    return hashlib.sha256(key).hexdigest()[:32]
+
+
+def _legacy_position(chunk: Chunk, counters: Dict[tuple, int]) -> str:
+    """
+    从旧chunk的元数据还原它在文档中的结构位置；旧版本没有记录子块序号，按写入顺序重新编号
+    """
+    metadata = chunk.metadata
+    if POSITION_KEY in metadata:
+        return str(metadata[POSITION_KEY])
+    if "header_chunk_idx" in metadata:
+        return str(metadata["header_chunk_idx"])
+    if "parent_header_chunk_idx" in metadata:
+        key = (chunk.parent_doc_id, metadata["parent_header_chunk_idx"])
+    else:
+        key = (chunk.parent_doc_id, metadata.get("split_type"))
+    index = counters.get(key, 0)
+    counters[key] = index + 1
+    if "parent_header_chunk_idx" in metadata:
+        return f"{metadata['parent_header_chunk_idx']}_{index}"
+    return str(index)
+
+
+def migrate_chunk_ids(vector_store, docs_path: str) -> Dict[str, str]:
+    """
+    把旧id方案的向量库迁移到稳定id：按 chunk存储的写入顺序 重新计算文档id和chunk id，
+    并在chunk存储、关键词索引和向量索引中改名；返回 旧chunk_id -> 新chunk_id
+    去重后的chunk（id已是内容哈希）只更新父文档id
+    """
+    logger = get_logger(__name__)
+    counters: Dict[tuple, int] = {}
+    renamed: Dict[str, Chunk] = {}
+    updated = []
+    for chunk in vector_store.chunk_store.iter_chunks():
+        source = chunk.metadata.get("source")
+        doc_id = document_id(docs_path, source) if source else chunk.parent_doc_id
+        if LOCATIONS_KEY in chunk.metadata:
+            for location in chunk.metadata[LOCATIONS_KEY]:
+                if location.get("source"):
+                    location["parent_doc_id"] = document_id(docs_path, location["source"])
+            chunk.parent_doc_id = doc_id
+            updated.append(chunk)
+            continue
+        position = _legacy_position(chunk, counters)
+        new_chunk = Chunk(
+            content=chunk.content,
+            metadata=dict(chunk.metadata, **{POSITION_KEY: position}),
+            chunk_id=chunk_id(doc_id, position, chunk.content),
+            embedding=chunk.embedding,
+            parent_doc_id=doc_id
+        )
+        if new_chunk.chunk_id != chunk.chunk_id or new_chunk.parent_doc_id != chunk.parent_doc_id:
+            renamed[chunk.chunk_id] = new_chunk
+
+    if updated:
+        vector_store.chunk_store.put_many(updated)
+    if renamed:
+        vector_store.rename_chunks(renamed)
+    logger.info(f"chunk id迁移完成: {len(renamed)} 个chunks改名，{len(updated)} 个去重chunks更新了文档id")
+    return {old_id: chunk.chunk_id for old_id, chunk in renamed.items()}
+
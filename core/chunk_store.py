@@ -0,0 +1,182 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+from array import array
+from typing import Dict, Iterable, Iterator, Optional, Sequence
+from config.models import Chunk
+from utils.logger import get_logger
+
+
+class ChunkStore:
+    """
+    chunk内容存储（SQLite），与向量索引放在同一目录
+    检索时只按chunk_id取出命中的k个chunk，加载知识库时不需要把全部chunk读入内存
+    """
+    FILENAME = "chunks.sqlite"
+    LEGACY_PICKLE = "chunks_metadata.pkl"  # 旧版本保存的完整chunks_metadata字典
+    QUERY_BATCH_SIZE = 500  # 单条SQL中IN参数的数量上限，低于SQLite默认的999
+
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = get_logger(__name__)
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "chunk_id TEXT PRIMARY KEY, parent_doc_id TEXT, content TEXT NOT NULL, "
+            "metadata TEXT NOT NULL, embedding BLOB)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def open(cls, directory: str) -> "ChunkStore":
+        """
+        打开目录下的chunk存储；只有旧版 chunks_metadata.pkl 时自动迁移
+        """
+        store = cls(os.path.join(directory, cls.FILENAME))
+        legacy_path = os.path.join(directory, cls.LEGACY_PICKLE)
+        if os.path.exists(legacy_path) and len(store) == 0:
+            store.migrate_pickle(legacy_path)
+        return store
+
+    def migrate_pickle(self, legacy_path: str) -> None:
+        """
+        把旧版pickle中的chunks写入SQLite，成功后删除pickle文件
+        """
+        self.logger.info(f"迁移旧版chunk元数据: {legacy_path}")
+        with open(legacy_path, "rb") as f:
+            legacy = pickle.load(f)
+        if not isinstance(legacy, dict):
+            self.logger.warning("旧版元数据格式异常，跳过迁移")
+            return
+        self.put_many(legacy.values())
+        self.commit()
+        os.remove(legacy_path)
+        self.logger.info(f"迁移完成，共 {len(legacy)} 个chunks")
+
+    @staticmethod
+    def _to_row(chunk: Chunk) -> tuple:
+        embedding = array("f", chunk.embedding).tobytes() if chunk.embedding is not None else None
+        # 元数据中可能有非JSON类型（如日期），按字符串保存
+        return (chunk.chunk_id, chunk.parent_doc_id, chunk.content,
+                json.dumps(chunk.metadata, ensure_ascii=False, default=str), embedding)
+
+    @staticmethod
+    def _from_row(row: tuple) -> Chunk:
+        chunk_id, parent_doc_id, content, metadata, blob = row
+        embedding = None
+        if blob is not None:
+            vector = array("f")
+            vector.frombytes(blob)
+            embedding = vector.tolist()
+        return Chunk(content=content, metadata=json.loads(metadata), chunk_id=chunk_id,
+                     embedding=embedding, parent_doc_id=parent_doc_id)
+
+    def put_many(self, chunks: Iterable[Chunk]) -> None:
+        """
+        批量写入chunks（已存在的chunk_id覆盖），在 commit 之前不落盘
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, parent_doc_id, content, metadata, embedding) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self._to_row(chunk) for chunk in chunks)
+            )
+
+    def get_many(self, chunk_ids: Sequence[str]) -> Dict[str, Chunk]:
+        """
+        按chunk_id批量读取，不存在的id不出现在结果中
+        """
+        found: Dict[str, Chunk] = {}
+        with self._lock:
+            for start in range(0, len(chunk_ids), self.QUERY_BATCH_SIZE):
+                batch = list(chunk_ids[start:start + self.QUERY_BATCH_SIZE])
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    "SELECT chunk_id, parent_doc_id, content, metadata, embedding FROM chunks "
+                    f"WHERE chunk_id IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for row in rows:
+                    found[row[0]] = self._from_row(row)
+        return found
+
+    def update_metadata(self, metadata_by_id: Dict[str, Dict]) -> None:
+        """
+        只更新元数据（内容和向量不变），在 commit 之前不落盘
+        """
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET metadata = ? WHERE chunk_id = ?",
+                ((json.dumps(metadata, ensure_ascii=False, default=str), chunk_id)
+                 for chunk_id, metadata in metadata_by_id.items())
+            )
+
+    @property
+    def id_scheme(self) -> int:
+        """
+        chunk id方案的版本号（保存在SQLite的 user_version 中，旧版本创建的库为0）
+        """
+        with self._lock:
+            return self._conn.execute("PRAGMA user_version").fetchone()[0]
+
+    @id_scheme.setter
+    def id_scheme(self, version: int) -> None:
+        with self._lock:
+            self._conn.execute(f"PRAGMA user_version = {int(version)}")
+
+    def get(self, chunk_id: str) -> Optional[Chunk]:
+        return self.get_many([chunk_id]).get(chunk_id)
+
+    def iter_chunks(self, batch_size: int = 500) -> Iterator[Chunk]:
+        """
+        分页遍历全部chunks（重建派生索引时使用），内存中只保留一页
+        """
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, chunk_id, parent_doc_id, content, metadata, embedding FROM chunks "
+                    "WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            for row in rows:
+                yield self._from_row(row[1:])
+
+    def delete_many(self, chunk_ids: Sequence[str]) -> None:
+        with self._lock:
+            for start in range(0, len(chunk_ids), self.QUERY_BATCH_SIZE):
+                batch = list(chunk_ids[start:start + self.QUERY_BATCH_SIZE])
+                self._conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({','.join('?' * len(batch))})", batch)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    def commit(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def __contains__(self, chunk_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone() is not None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
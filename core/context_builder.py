@@ -0,0 +1,135 @@
+import os
+import re
+from typing import Dict, List, Optional
+from config.models import SearchResult
+from utils.logger import get_logger
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+class TokenCounter:
+    """
+    token计数：优先使用 tiktoken 的本地编码，不可用时（未安装或离线无法下载编码文件）按字符估算
+    估算规则：中日韩字符约1个token，其余字符约4个字符1个token
+    """
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        self.logger = get_logger(__name__)
+        self._encoding = None
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            self.logger.warning(f"tiktoken编码 {encoding_name} 不可用，按字符估算token数：{e}")
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        cjk = len(_CJK_PATTERN.findall(text))
+        return cjk + (len(text) - cjk + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        截断文本使其不超过 max_tokens
+        """
+        if max_tokens <= 0:
+            return ""
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self._encoding.decode(tokens[:max_tokens])
+        if self.count(text) <= max_tokens:
+            return text
+        # 按估算的平均每token字符数截断，再逐步收缩到预算内
+        end = max(1, int(len(text) * max_tokens / self.count(text)))
+        while end > 0 and self.count(text[:end]) > max_tokens:
+            end = int(end * 0.9)
+        return text[:end]
+
+
+class ContextBuilder:
+    """
+    上下文组装：按相关度顺序在token预算内打包检索结果
+    - 去掉同一父文档相邻chunk之间重叠的文本（切分时的 chunk_overlap）
+    - 放不下的chunk截断；剩余预算太少时丢弃该chunk，继续尝试后面的
+    - 使用紧凑的模板，不把空白和分隔线发给LLM
+    """
+    MIN_OVERLAP_CHARS = 20  # 重叠短于该长度视为偶然相同，不处理
+    MIN_TAIL_TOKENS = 64  # 剩余预算少于该值时不再截断放入
+
+    def __init__(self, max_tokens: int = 3000, max_overlap_chars: int = 1000,
+                 token_counter: Optional[TokenCounter] = None):
+        self.max_tokens = max_tokens
+        self.max_overlap_chars = max_overlap_chars
+        self.token_counter = token_counter or TokenCounter()
+        self.logger = get_logger(__name__)
+
+    def build(self, search_results: List[SearchResult]) -> str:
+        parts = []
+        used = 0
+        included: Dict[str, List[str]] = {}  # parent_doc_id -> 已放入的内容
+        for result in search_results:
+            chunk = result.chunk
+            content = chunk.content.strip()
+            if chunk.parent_doc_id:
+                content = self._strip_overlap(content, included.get(chunk.parent_doc_id, []))
+            if not content:
+                continue
+
+            header = self._header(len(parts) + 1, result)
+            # 段落之间的空行也计入预算
+            cost = self.token_counter.count(header) + self.token_counter.count(content) + 2
+            if used + cost > self.max_tokens:
+                remaining = self.max_tokens - used - self.token_counter.count(header) - 2
+                if remaining < self.MIN_TAIL_TOKENS:
+                    continue  # 后面更短的chunk可能还放得下
+                content = self.token_counter.truncate(content, remaining)
+                cost = self.max_tokens - used
+            parts.append(f"{header}\n{content}")
+            used += cost
+            if chunk.parent_doc_id:
+                # 用原文比较重叠：切分时的重叠是相对原始chunk而言的
+                included.setdefault(chunk.parent_doc_id, []).append(chunk.content.strip())
+
+        if len(parts) < len(search_results):
+            self.logger.info(f"上下文 {used}/{self.max_tokens} tokens，放入 {len(parts)}/{len(search_results)} 个chunks")
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def _header(index: int, result: SearchResult) -> str:
+        metadata = result.chunk.metadata
+        source = os.path.basename(str(metadata.get("source", ""))) or "未知来源"
+        headers = [str(value) for key, value in sorted(metadata.items()) if key.startswith("Header")]
+        return f"[{index}] {source}" + (f" | {' > '.join(headers)}" if headers else "")
+
+    def _strip_overlap(self, content: str, siblings: List[str]) -> str:
+        """
+        去掉与同一文档已放入内容重叠的部分：
+        已放入内容的结尾与当前内容的开头重叠时去掉开头，当前内容的结尾与已放入内容的开头重叠时去掉结尾
+        """
+        for sibling in siblings:
+            if content in sibling:
+                return ""
+            overlap = self._overlap(sibling, content)
+            if overlap:
+                content = content[overlap:].lstrip()
+            overlap = self._overlap(content, sibling)
+            if overlap:
+                content = content[:-overlap].rstrip()
+        return content
+
+    def _overlap(self, left: str, right: str) -> int:
+        """
+        left 的后缀与 right 的前缀的最长重叠长度（不足 MIN_OVERLAP_CHARS 时为0）
+        """
+        limit = min(len(left), len(right), self.max_overlap_chars)
+        if limit < self.MIN_OVERLAP_CHARS:
+            return 0
+        tail = left[-limit:]
+        probe = right[:self.MIN_OVERLAP_CHARS]
+        # 从最长的可能重叠开始，找 probe 在 tail 中出现的位置并验证
+        start = tail.find(probe)
+        while start != -1:
+            length = limit - start
+            if right.startswith(tail[start:]):
+                return length
+            start = tail.find(probe, start + 1)
+        return 0
@@ -1,89 +1,122 @@
+import glob
 import os
-from typing import Any, Dict, List
-from langchain_community.document_loaders import DirectoryLoader,UnstructuredMarkdownLoader
-from langchain.schema import Document as LangChainDocument
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from config.models import  Document
+from core.chunk_ids import document_id
 from utils.logger import get_logger
 from utils.exceptions import DocumentLoadError
+from utils.parallel import ordered_parallel_map, resolve_workers
+
+
+def _load_markdown_file(file_path: str) -> Tuple[str, List[Tuple[str, Dict[str, Any]]], Optional[str]]:
+    """
+    解析单个markdown文件（串行加载直接调用，并行加载时作为进程池worker）
+    返回 (文件路径, [(page_content, metadata)], 错误信息)，出错时不抛异常，由主进程汇总
+    """
+    try:
+        from langchain_community.document_loaders import UnstructuredMarkdownLoader
+        docs = UnstructuredMarkdownLoader(file_path).load()
+        return file_path, [(doc.page_content, dict(doc.metadata)) for doc in docs], None
+    except Exception as e:
+        return file_path, [], f"{type(e).__name__}: {e}"
+
 
 class DocumentLoader:
     """
     文档加载器
     """
-    def __init__(self, docs_path: str):
+    def __init__(self, docs_path: str, parallel: bool = False, max_workers: Optional[int] = None):
         self.docs_path = docs_path
+        self.parallel = parallel
+        self.max_workers = max_workers  # None 表示使用全部CPU核数
+        self.failed_files: List[Tuple[str, str]] = []  # 加载失败的文件及原因
         self.logger = get_logger(__name__)# __name__ 在这个文件中的值是 'core.document_loader'
 
     def load_documents(self)-> List[Document]:
         """
         加载所有文档
         """
+        documents = list(self.iter_documents())
+        self.logger.info(f"成功加载{len(documents)}个文档")
+        return documents
+
+    def iter_documents(self) -> Iterator[Document]:
+        """
+        逐个产出文档（流式构建知识库时使用，内存中只保留正在处理的文档）
+        """
         self.logger.info(f"开始从{self.docs_path}加载文档...")
 
         if not os.path.exists(self.docs_path):
             raise DocumentLoadError(f"文档路径不存在: {self.docs_path}")
 
-        try:
-            # 检查目录是否为空
-            docs_files = [f for f in os.listdir(self.docs_path) if f.endswith('.md') or f.endswith('.mdx')]
-            if not docs_files:
-                self.logger.warning(f"文档路径 {self.docs_path} 中没有找到 .md 或 .mdx 文件")
-            
-            self.logger.info(f"在 {self.docs_path} 中找到 {len(docs_files)} 个文档文件")
-            
-            # 使用langchain的DirectLoader加载所有文档
-            loader = DirectoryLoader(
-                self.docs_path,
-                glob="**/*.md",
-                loader_cls=UnstructuredMarkdownLoader,# 指定用什么加载器处理每个文件
-                recursive=True,# 递归搜索所有子目录
-                show_progress=True
+        file_paths = self.list_source_files()
+        if not file_paths:
+            self.logger.warning(f"文档路径 {self.docs_path} 中没有找到 .md 或 .mdx 文件")
+            return
+        self.logger.info(f"在 {self.docs_path} 中找到 {len(file_paths)} 个文档文件")
+
+        yield from self._iter_documents_from(file_paths)
+
+    def list_source_files(self) -> List[str]:
+        """
+        列出知识库的全部源文件（匹配规则与 load_documents 一致：优先 .md，没有时使用 .mdx）
+        """
+        for pattern in ("*.md", "*.mdx"):
+            files = sorted(
+                path for path in glob.glob(os.path.join(self.docs_path, "**", pattern), recursive=True)
+                if os.path.isfile(path)
             )
-            # ** = 匹配任意深度的目录
-            # *.md* = 匹配以.md开头的文件
-
-            # 会匹配：
-            # docs/intro.md
-            # docs/concepts/memory.mdx
-            # docs/tutorials/basic/setup.md
-            # docs/advanced/chains/custom.mdx
-
-
-            # UnstructuredMarkdownLoader 专门处理Markdown文件
-            # 它能解析Markdown结构，提取文本内容
-            langchain_docs = loader.load()
-            
-            self.logger.info(f"DirectoryLoader 加载了 {len(langchain_docs)} 个文档")
-
-            # 尝试使用不同的glob模式加载.md和.mdx文件
-            if len(langchain_docs) == 0:
-                self.logger.info("未找到.md文件，尝试加载.mdx文件...")
-                loader_mdx = DirectoryLoader(
-                    self.docs_path,
-                    glob="**/*.mdx",
-                    loader_cls=UnstructuredMarkdownLoader,
-                    recursive=True,
-                    show_progress=True
-                )
-                langchain_docs = loader_mdx.load()
-                self.logger.info(f"DirectoryLoader (mdx) 加载了 {len(langchain_docs)} 个文档")
-
-            # 将langchain的文档转换为Document对象
-            documents = []
-            for i ,doc in enumerate(langchain_docs):
-                documents.append(
-                    Document(
-                        content=doc.page_content,
-                        doc_id=f"doc_{i}",
-                        metadata=doc.metadata
-                    )
+            if files:
+                return files
+        return []
+
+    def _iter_parsed_files(self, file_paths: List[str]):
+        """
+        解析文件，按 file_paths 的顺序逐个产出 (文件路径, [(page_content, metadata)])；parallel 时在进程池中解析
+        单个文件失败只记录到 failed_files，不中断整体加载（串行与并行路径一致）
+        """
+        self.failed_files = []
+        if self.parallel:
+            workers = min(resolve_workers(self.max_workers), max(len(file_paths), 1))
+            self.logger.info(f"使用 {workers} 个进程并行加载 {len(file_paths)} 个文件")
+            results = ordered_parallel_map(_load_markdown_file, file_paths, max_workers=workers)
+        else:
+            results = map(_load_markdown_file, file_paths)
+        for file_path, parsed, error in results:
+            if error:
+                self.logger.warning(f"加载文档{file_path}失败，已跳过: {error}")
+                self.failed_files.append((file_path, error))
+                continue
+            yield file_path, parsed
+
+    def _iter_documents_from(self, file_paths: List[str]) -> Iterator[Document]:
+        """
+        加载指定的源文件，文档顺序与 file_paths 一致，doc_id 由源文件路径和页序号决定
+        """
+        doc_count = 0
+        for file_path, parsed in self._iter_parsed_files(file_paths):
+            for page, (page_content, metadata) in enumerate(parsed):
+                yield Document(
+                    content=page_content,
+                    doc_id=document_id(self.docs_path, file_path, page),
+                    metadata=metadata
                 )
-            self.logger.info(f"成功加载{len(documents)}个文档")
-            return documents
+                doc_count += 1
+        self.logger.info(f"加载完成: {doc_count}个文档，失败{len(self.failed_files)}个文件")
 
-        except Exception as e:
-            self.logger.error(f"加载文档时出错: {e}")
-            raise DocumentLoadError(f"加载文档时出错: {e}")
+    def load_files(self, file_paths: List[str]) -> List[Document]:
+        """
+        加载指定的源文件（增量同步时只加载新增/修改的文件）
+        """
+        documents = list(self.iter_files(file_paths))
+        self.logger.info(f"成功加载{len(documents)}个文档（共{len(file_paths)}个文件，失败{len(self.failed_files)}个）")
+        return documents
+
+    def iter_files(self, file_paths: List[str]) -> Iterator[Document]:
+        """
+        逐个产出指定源文件的文档，doc_id 与全量加载时相同（由源文件路径决定）
+        """
+        return self._iter_documents_from(file_paths)
 
     def load_single_document(self, file_path: str)-> Document:
         """
@@ -95,7 +128,7 @@ class DocumentLoader:
 
             return Document(
                 content=content,
-                doc_id=os.path.basename(file_path),
+                doc_id=document_id(self.docs_path, file_path),
                 metadata={"source": file_path}
             )
 
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+from models.base import BaseEmbedding
+from utils.logger import get_logger
+
+
+class EmbeddingCache:
+    """
+    持久化嵌入缓存（SQLite）
+    键为 (模型名, 文本sha256)，向量以float32二进制存储；超过 max_entries 时按最近使用时间淘汰（LRU）
+    """
+    QUERY_BATCH_SIZE = 500  # 单条SQL中IN参数的数量上限，低于SQLite默认的999
+
+    def __init__(self, path: str, max_entries: int = 500000):
+        self.path = path
+        self.max_entries = max_entries
+        self.logger = get_logger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self._count: Optional[int] = None  # 条目数，首次写入时统计一次，之后随写入/淘汰增减，避免每批 COUNT(*) 全表扫描
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        批量查询缓存，未命中的位置为 None；命中的条目刷新最近使用时间
+        """
+        hashes = [self.text_hash(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(hashes), self.QUERY_BATCH_SIZE):
+                batch = list(set(hashes[start:start + self.QUERY_BATCH_SIZE]))
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+                if rows:
+                    hit_hashes = [row[0] for row in rows]
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE model = ? "
+                        f"AND text_hash IN ({','.join('?' * len(hit_hashes))})",
+                        [now, model, *hit_hashes]
+                    )
+            self._conn.commit()
+
+        results = [found.get(text_hash) for text_hash in hashes]
+        hit_count = sum(1 for vector in results if vector is not None)
+        self.hits += hit_count
+        self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[List[float]]) -> None:
+        """
+        批量写入缓存，超出容量时淘汰最久未使用的条目
+        """
+        now = time.time()
+        rows = [
+            (model, self.text_hash(text), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+            if any(vector)  # 嵌入失败时模型返回零向量，不缓存
+        ]
+        if not rows:
+            return
+        with self._lock:
+            if self._count is None:
+                self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            # 先插入新条目（rowcount 即新增数），已存在的条目再更新
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            ).rowcount
+            if inserted < len(rows):
+                self._conn.executemany(
+                    "UPDATE embeddings SET vector = ?, last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(vector, last_used, row_model, text_hash) for row_model, text_hash, vector, last_used in rows]
+                )
+            self._count += inserted
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                deleted = self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                ).rowcount
+                self._count -= deleted
+                self.logger.info(f"嵌入缓存超出容量，淘汰了 {deleted} 条最久未使用的向量")
+            self._conn.commit()
+
+    def embed_documents(self, embedding_model: BaseEmbedding, texts: List[str]) -> List[List[float]]:
+        """
+        先查缓存，只对未命中的文本调用嵌入模型，并把新向量写回缓存
+        """
+        model = embedding_model.cache_key
+        vectors, missing_texts = self._lookup(model, texts)
+        new_vectors = embedding_model.embed_documents(missing_texts) if missing_texts else []
+        return self._fill(model, texts, vectors, missing_texts, new_vectors)
+
+    def embed_batches(self, embedding_model: BaseEmbedding,
+                      batches: Iterable[List[str]]) -> Iterator[List[List[float]]]:
+        """
+        embed_documents 的流水线版本：每批先查缓存，只把未命中的文本交给模型的 embed_batches，按输入顺序产出每批向量
+        """
+        model = embedding_model.cache_key
+        pending = deque()  # 已交给模型、尚未收回向量的批次
+
+        def missing_batches():
+            for texts in batches:
+                vectors, missing_texts = self._lookup(model, texts)
+                pending.append((texts, vectors, missing_texts))
+                yield missing_texts
+
+        for new_vectors in embedding_model.embed_batches(missing_batches()):
+            texts, vectors, missing_texts = pending.popleft()
+            yield self._fill(model, texts, vectors, missing_texts, new_vectors)
+
+    def _lookup(self, model: str, texts: List[str]):
+        """
+        查询缓存，返回 (命中的向量，未命中位置为 None, 去重后的未命中文本)
+        """
+        vectors = self.get_many(model, texts)
+        # 同一批中重复的文本只计算一次
+        missing_texts = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        return vectors, missing_texts
+
+    def _fill(self, model: str, texts: List[str], vectors: List[Optional[List[float]]],
+              missing_texts: List[str], new_vectors: List[List[float]]) -> List[List[float]]:
+        """
+        用新计算的向量补齐未命中的位置，并写回缓存
+        """
+        hits = sum(1 for vector in vectors if vector is not None)
+        if missing_texts:
+            by_text = dict(zip(missing_texts, new_vectors))
+            vectors = [vector if vector is not None else by_text[text] for text, vector in zip(texts, vectors)]
+            self.put_many(model, missing_texts, new_vectors)
+        self.logger.info(f"嵌入缓存命中 {hits}/{len(texts)}")
+        return vectors
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,270 @@
+import json
+import os
+from typing import Dict, List, Optional
+import numpy as np
+import faiss
+from config.models import Chunk, SearchResult
+from config.settings import VectorStoreConfig
+from core.embedding_cache import EmbeddingCache
+from core.vector_store_base import ChunkVectorStore
+from models.base import BaseEmbedding
+from utils.exceptions import ConfigurationError, SearchError
+
+
+class FaissVectorStore(ChunkVectorStore):
+    """
+    FAISS向量存储实现，支持三种索引（VectorStoreConfig.index_type）：
+    - flat: 精确内积检索
+    - ivfpq: 倒排 + 乘积量化，需要先用已入库的向量训练，nprobe 控制召回/速度（样本少于 2^pq_nbits 时退化为flat）
+    - hnsw: 图索引，efSearch 控制召回/速度（不支持物理删除，删除的向量只从映射中移除，
+      占比超过 hnsw_compact_ratio 后用存活向量重建索引）
+    向量已归一化，内积即余弦相似度，score 越大越相关
+    """
+    INDEX_FILENAME = "faiss.index"
+    IDS_FILENAME = "faiss_ids.json"
+    INDEX_TYPES = ("flat", "ivfpq", "hnsw")
+
+    def __init__(self, embedding_model: BaseEmbedding, config: VectorStoreConfig,
+                 embedding_cache: Optional[EmbeddingCache] = None):
+        super().__init__(embedding_model, config.persist_directory, batch_size=config.ingest_batch_size,
+                         embedding_cache=embedding_cache, keyword_index=config.keyword_index)
+        if config.index_type not in self.INDEX_TYPES:
+            raise ConfigurationError(f"不支持的FAISS索引类型: {config.index_type}，可选 {self.INDEX_TYPES}")
+        self.config = config
+        self.index = None
+        self._next_id = 0
+        self._int_to_chunk: Dict[int, str] = {}  # faiss内部int64 id -> chunk_id
+        self._chunk_to_int: Dict[str, int] = {}
+        # ivfpq 训练前先缓存向量，攒够训练样本后一次性训练并写入
+        self._train_buffer: List[np.ndarray] = []
+        self._train_buffer_ids: List[np.ndarray] = []
+
+    @property
+    def train_size(self) -> int:
+        # FAISS建议每个聚类中心至少约39个训练样本
+        return self.config.train_size or self.config.nlist * 39
+
+    def _create_index(self, dim: int, num_train: int = 0):
+        index_type = self.config.index_type
+        if index_type == "flat":
+            return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        if index_type == "hnsw":
+            hnsw = faiss.IndexHNSWFlat(dim, self.config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            hnsw.hnsw.efConstruction = self.config.ef_construction
+            return faiss.IndexIDMap2(hnsw)
+        # PQ每个子量化器有 2^pq_nbits 个码字，训练样本少于码字数时无法训练，小语料直接使用flat索引
+        if num_train < 2 ** self.config.pq_nbits:
+            self.logger.warning(
+                f"训练样本只有 {num_train} 个，少于PQ码字数 {2 ** self.config.pq_nbits}，改用flat精确索引"
+            )
+            return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        # 样本不足时自动减少聚类中心数，避免训练失败
+        nlist = max(1, min(self.config.nlist, num_train // 39 or 1))
+        if nlist < self.config.nlist:
+            self.logger.warning(f"训练样本只有 {num_train} 个，IVF聚类中心数从 {self.config.nlist} 降为 {nlist}")
+        quantizer = faiss.IndexFlatIP(dim)
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, self.config.pq_m, self.config.pq_nbits,
+                                faiss.METRIC_INNER_PRODUCT)
+
+    def _upsert_batch(self, chunks: List[Chunk], embeddings: List[List[float]]) -> None:
+        """
+        写入一批chunks及其向量，已存在的chunk_id先删除再写入
+        """
+        existing = [chunk.chunk_id for chunk in chunks if chunk.chunk_id in self._chunk_to_int]
+        if existing:
+            self.delete_chunks(existing)
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        ids = np.arange(self._next_id, self._next_id + len(chunks), dtype=np.int64)
+        self._next_id += len(chunks)
+        for int_id, chunk in zip(ids, chunks):
+            self._int_to_chunk[int(int_id)] = chunk.chunk_id
+            self._chunk_to_int[chunk.chunk_id] = int(int_id)
+        #保存完整的chunk信息
+        self._store_records(chunks)
+
+        if self.index is None and self.config.index_type != "ivfpq":
+            self.index = self._create_index(vectors.shape[1])
+
+        if self.index is not None and self.index.is_trained:
+            self.index.add_with_ids(vectors, ids)
+            return
+
+        self._train_buffer.append(vectors)
+        self._train_buffer_ids.append(ids)
+        if sum(len(block) for block in self._train_buffer) >= self.train_size:
+            self._train_and_flush()
+
+    def _train_and_flush(self) -> None:
+        """
+        用缓存的向量训练IVF-PQ索引，并把缓存的向量写入索引
+        """
+        if not self._train_buffer:
+            return
+        vectors = np.concatenate(self._train_buffer, axis=0)
+        ids = np.concatenate(self._train_buffer_ids, axis=0)
+        # 缓存期间可能有向量被删除
+        alive = np.array([int(int_id) in self._int_to_chunk for int_id in ids], dtype=bool)
+        vectors, ids = vectors[alive], ids[alive]
+        self._train_buffer, self._train_buffer_ids = [], []
+        if not len(vectors):
+            return
+
+        if self.index is None:
+            self.index = self._create_index(vectors.shape[1], num_train=len(vectors))
+        if not self.index.is_trained:
+            self.logger.info(f"开始训练IVF-PQ索引，训练样本 {len(vectors)} 个")
+            self.index.train(vectors)
+            # 哈希表形式的直接映射，支持删除和按id取回向量
+            self.index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        self.index.add_with_ids(vectors, ids)
+
+    def _apply_search_params(self) -> None:
+        if self.config.index_type == "ivfpq":
+            ivf = faiss.try_extract_index_ivf(self.index)
+            if ivf is not None:  # 小语料时退化为flat索引，没有nprobe
+                ivf.nprobe = self.config.nprobe
+        elif self.config.index_type == "hnsw":
+            faiss.downcast_index(self.index.index).hnsw.efSearch = self.config.ef_search
+
+    def delete_chunks(self, chunk_ids: List[str]) -> None:
+        """
+        删除指定chunk；hnsw索引不支持物理删除，只从id映射中移除（检索时过滤）
+        """
+        if not chunk_ids:
+            return
+        int_ids = [self._chunk_to_int.pop(chunk_id) for chunk_id in chunk_ids if chunk_id in self._chunk_to_int]
+        for int_id in int_ids:
+            self._int_to_chunk.pop(int_id, None)
+        if int_ids and self.index is not None:
+            if self.config.index_type == "hnsw":
+                self._compact_hnsw()
+            else:
+                self.index.remove_ids(np.asarray(int_ids, dtype=np.int64))
+        self._delete_records(chunk_ids)
+        self.logger.info(f"已从向量存储删除{len(int_ids)}个chunks")
+
+    def _compact_hnsw(self) -> None:
+        """
+        已删除向量超过 hnsw_compact_ratio 时，用存活向量重建hnsw索引，
+        否则检索时为过滤已删除向量而多取的候选数会随删除次数无限增长
+        """
+        ntotal = self.index.ntotal
+        if ntotal == 0 or ntotal - len(self._int_to_chunk) <= self.config.hnsw_compact_ratio * ntotal:
+            return
+        ids = faiss.vector_to_array(self.index.id_map)
+        vectors = self.index.index.reconstruct_n(0, ntotal)
+        alive = np.array([int(int_id) in self._int_to_chunk for int_id in ids], dtype=bool)
+        self.index = self._create_index(vectors.shape[1])
+        if alive.any():
+            self.index.add_with_ids(vectors[alive], ids[alive])
+        self.logger.info(f"hnsw索引重建完成: 清除 {ntotal - int(alive.sum())} 个已删除向量，保留 {self.index.ntotal} 个")
+
+    def _rename_vectors(self, renamed: Dict[str, Chunk]) -> None:
+        for old_id, chunk in renamed.items():
+            int_id = self._chunk_to_int.pop(old_id, None)
+            if int_id is not None:
+                self._chunk_to_int[chunk.chunk_id] = int_id
+                self._int_to_chunk[int_id] = chunk.chunk_id
+
+    def reset(self) -> None:
+        self.index = None
+        self._next_id = 0
+        self._int_to_chunk = {}
+        self._chunk_to_int = {}
+        self._train_buffer, self._train_buffer_ids = [], []
+        self._clear_records()
+
+    def search(self, query: str, k: int = 4) -> List[SearchResult]:
+        """
+        在FAISS索引中检索top-k
+        """
+        return self.search_batch([query], k=k)[0]
+
+    def search_batch(self, queries: List[str], k: int = 4,
+                     with_embeddings: bool = False) -> List[List[SearchResult]]:
+        """
+        批量检索：所有查询一次编码，一次 index.search
+        with_embeddings 时在 chunk.embedding 中带回候选向量（ivfpq 为PQ解码后的近似向量）
+        """
+        self._train_and_flush()
+        if self.index is None or self.index.ntotal == 0:
+            raise SearchError("向量存储未初始化")
+        if not queries:
+            return []
+        try:
+            self._apply_search_params()
+            query_matrix = np.asarray(self.embedding_model.embed_queries(queries), dtype=np.float32)
+            # hnsw中已删除的向量仍在图里，多取一些再过滤
+            fetch_k = min(self.index.ntotal, k + (self.index.ntotal - len(self._int_to_chunk)))
+            scores, ids = self.index.search(query_matrix, fetch_k)
+            hits_per_query = [
+                [(self._int_to_chunk[int(int_id)], float(score))
+                 for score, int_id in zip(row_scores, row_ids) if int(int_id) in self._int_to_chunk][:k]
+                for row_scores, row_ids in zip(scores, ids)
+            ]
+            chunks = self._fetch_chunks(list({chunk_id for hits in hits_per_query for chunk_id, _ in hits}))
+            if with_embeddings:
+                for chunk_id, chunk in chunks.items():
+                    chunk.embedding = self.index.reconstruct(self._chunk_to_int[chunk_id]).tolist()
+            return [
+                [
+                    SearchResult(chunk=chunks[chunk_id], score=score, rank=rank)
+                    for rank, (chunk_id, score) in enumerate(hits, 1)
+                    if chunk_id in chunks
+                ]
+                for hits in hits_per_query
+            ]
+        except Exception as e:
+            self.logger.error(f"搜索相似chunks时出错：{e}")
+            raise SearchError(f"搜索相似chunks时出错：{e}")
+
+    def save(self, path: str) -> None:
+        """
+        保存FAISS索引、id映射并提交chunk存储
+        """
+        self._train_and_flush()
+        try:
+            os.makedirs(path, exist_ok=True)
+            if self.index is not None:
+                faiss.write_index(self.index, os.path.join(path, self.INDEX_FILENAME))
+            int_ids = sorted(self._int_to_chunk)
+            with open(os.path.join(path, self.IDS_FILENAME), "w", encoding="utf-8") as f:
+                json.dump({
+                    "index_type": self.config.index_type,
+                    "next_id": self._next_id,
+                    "ids": int_ids,
+                    "chunk_ids": [self._int_to_chunk[int_id] for int_id in int_ids],
+                }, f)
+            self.logger.info(f"FAISS索引保存完成: {len(int_ids)} 个向量")
+        except Exception as e:
+            self.logger.error(f"保存FAISS索引时出错：{e}")
+            raise SearchError(f"保存FAISS索引时出错：{e}")
+        self._save_chunk_store(path)
+
+    def load(self, path: str) -> None:
+        """
+        加载FAISS索引与id映射
+        """
+        try:
+            index_path = os.path.join(path, self.INDEX_FILENAME)
+            if not os.path.exists(index_path):
+                raise SearchError(f"FAISS索引文件不存在: {index_path}")
+            self.index = faiss.read_index(index_path)
+            with open(os.path.join(path, self.IDS_FILENAME), "r", encoding="utf-8") as f:
+                mapping = json.load(f)
+            if mapping.get("index_type") != self.config.index_type:
+                raise SearchError(
+                    f"索引类型不一致: 磁盘上为 {mapping.get('index_type')}，配置为 {self.config.index_type}，请重建知识库"
+                )
+            self._next_id = mapping["next_id"]
+            self._int_to_chunk = dict(zip(mapping["ids"], mapping["chunk_ids"]))
+            self._chunk_to_int = {chunk_id: int_id for int_id, chunk_id in self._int_to_chunk.items()}
+            self._train_buffer, self._train_buffer_ids = [], []
+            self._load_chunk_store(path)
+            self.logger.info(f"FAISS索引加载成功: {self.index.ntotal} 个向量")
+        except SearchError:
+            raise
+        except Exception as e:
+            self.logger.error(f"加载向量存储时出错：{e}")
+            raise SearchError(f"加载向量存储时出错：{e}")
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+from utils.logger import get_logger
+
+MANIFEST_FILENAME = "sources_manifest.json"
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class ManifestDiff:
+    """
+    源文件变更集合（路径均为相对 docs_path 的路径）
+    """
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    touched: List[str] = field(default_factory=list)  # mtime变化但内容未变，只需刷新指纹
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    计算文件内容的sha256
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SourceManifest:
+    """
+    知识库源文件清单：记录每个源文件的 mtime、大小、内容哈希以及它产生的 chunk_id，
+    与 chunk存储（chunks.sqlite）一起保存在向量库目录中，用于增量同步
+    """
+    def __init__(self, docs_path: str, files: Optional[Dict[str, Dict]] = None):
+        self.docs_path = os.path.abspath(docs_path)
+        self.files: Dict[str, Dict] = files or {}
+        self.logger = get_logger(__name__)
+        self._fingerprints: Dict[str, Dict] = {}  # diff 时计算出的新指纹，record 时复用
+
+    @staticmethod
+    def path_in(persist_directory: str) -> str:
+        return os.path.join(persist_directory, MANIFEST_FILENAME)
+
+    @classmethod
+    def load(cls, persist_directory: str, docs_path: str) -> Optional["SourceManifest"]:
+        """
+        从向量库目录加载清单，不存在或格式不兼容时返回 None
+        """
+        manifest_path = cls.path_in(persist_directory)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(docs_path, files=data.get("files", {}))
+
+    def save(self, persist_directory: str) -> None:
+        """
+        原子写入清单文件
+        """
+        os.makedirs(persist_directory, exist_ok=True)
+        manifest_path = self.path_in(persist_directory)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, manifest_path)
+        self.logger.info(f"源文件清单已保存: {len(self.files)} 个文件")
+
+    def relpath(self, file_path: str) -> str:
+        return os.path.relpath(os.path.abspath(file_path), self.docs_path)
+
+    def abspath(self, rel_path: str) -> str:
+        return os.path.join(self.docs_path, rel_path)
+
+    def _fingerprint(self, rel_path: str, previous: Optional[Dict]) -> Dict:
+        """
+        计算文件指纹；mtime 和大小都没变时直接沿用旧哈希，避免重复读文件
+        """
+        stat = os.stat(self.abspath(rel_path))
+        if previous and previous.get("mtime") == stat.st_mtime and previous.get("size") == stat.st_size:
+            return {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": previous["sha256"]}
+        return {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": file_sha256(self.abspath(rel_path))}
+
+    def diff(self, file_paths: Iterable[str]) -> ManifestDiff:
+        """
+        对比当前源文件与清单，得出新增/修改/删除的文件
+        """
+        result = ManifestDiff()
+        current = set()
+        for file_path in file_paths:
+            rel_path = self.relpath(file_path)
+            current.add(rel_path)
+            previous = self.files.get(rel_path)
+            fingerprint = self._fingerprint(rel_path, previous)
+            self._fingerprints[rel_path] = fingerprint
+            if previous is None:
+                result.added.append(rel_path)
+            elif previous.get("sha256") != fingerprint["sha256"]:
+                result.changed.append(rel_path)
+            elif previous.get("mtime") != fingerprint["mtime"]:
+                result.touched.append(rel_path)
+
+        result.removed = sorted(set(self.files) - current)
+        return result
+
+    def chunk_ids_of(self, rel_paths: Iterable[str]) -> List[str]:
+        """
+        获取指定文件在清单中登记的全部 chunk_id
+        """
+        chunk_ids = []
+        for rel_path in rel_paths:
+            chunk_ids.extend(self.files.get(rel_path, {}).get("chunk_ids", []))
+        return chunk_ids
+
+    def rename_chunk_ids(self, mapping: Dict[str, str]) -> None:
+        """
+        chunk id迁移后按 mapping 更新登记的chunk_id
+        """
+        for entry in self.files.values():
+            entry["chunk_ids"] = [mapping.get(chunk_id, chunk_id) for chunk_id in entry.get("chunk_ids", [])]
+
+    def record(self, rel_path: str, chunk_ids: Optional[List[str]] = None) -> None:
+        """
+        登记（或刷新）一个文件的指纹与 chunk_id；chunk_ids 为 None 时保留原有登记
+        """
+        previous = self.files.get(rel_path)
+        fingerprint = self._fingerprints.pop(rel_path, None) or self._fingerprint(rel_path, None)
+        if chunk_ids is None:
+            chunk_ids = previous.get("chunk_ids", []) if previous else []
+        self.files[rel_path] = dict(fingerprint, chunk_ids=list(chunk_ids))
+
+    def remove(self, rel_path: str) -> None:
+        self.files.pop(rel_path, None)
+        self._fingerprints.pop(rel_path, None)
@@ -0,0 +1,180 @@
+import json
+import os
+from typing import Dict, List, Optional
+import numpy as np
+from config.models import Chunk, SearchResult
+from core.embedding_cache import EmbeddingCache
+from core.vector_store_base import ChunkVectorStore
+from models.base import BaseEmbedding
+from utils.exceptions import SearchError
+
+
+class NumpyVectorStore(ChunkVectorStore):
+    """
+    纯NumPy的内存向量索引
+    所有向量保存在一个连续的float32矩阵中，暴力点积 + argpartition 取top-k；
+    持久化为 .npy 文件，加载时以内存映射方式打开，启动几乎不需要时间
+    向量已归一化，score 为余弦相似度（越大越相关）
+    """
+    EMBEDDINGS_FILENAME = "embeddings.npy"
+    IDS_FILENAME = "chunk_ids.json"
+
+    def __init__(self, embedding_model: BaseEmbedding, persist_directory: str, batch_size: int = 256,
+                 embedding_cache: Optional[EmbeddingCache] = None, keyword_index: bool = False):
+        super().__init__(embedding_model, persist_directory, batch_size=batch_size, embedding_cache=embedding_cache,
+                         keyword_index=keyword_index)
+        self._matrix: Optional[np.ndarray] = None  # (N, dim) float32，可能是只读的内存映射
+        self._ids: List[str] = []  # 第i行向量对应的chunk_id（包括尚未合并进矩阵的行）
+        self._id_to_row: Dict[str, int] = {}
+        self._pending: List[np.ndarray] = []  # 尚未合并进矩阵的新增向量，避免每批都整体复制矩阵
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _upsert_batch(self, chunks: List[Chunk], embeddings: List[List[float]]) -> None:
+        """
+        写入一批chunks及其向量，已存在的chunk_id先删除再追加
+        """
+        existing = [chunk.chunk_id for chunk in chunks if chunk.chunk_id in self._id_to_row]
+        if existing:
+            self.delete_chunks(existing)
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        self._pending.append(vectors)
+        for chunk in chunks:
+            self._id_to_row[chunk.chunk_id] = len(self._ids)
+            self._ids.append(chunk.chunk_id)
+        #保存完整的chunk信息
+        self._store_records(chunks)
+
+    def _consolidate(self) -> None:
+        """
+        把待合并的向量并入主矩阵
+        """
+        if not self._pending:
+            return
+        blocks = ([self._matrix] if self._matrix is not None and len(self._matrix) else []) + self._pending
+        self._matrix = np.ascontiguousarray(np.concatenate(blocks, axis=0), dtype=np.float32)
+        self._pending = []
+
+    def delete_chunks(self, chunk_ids: List[str]) -> None:
+        """
+        删除指定chunk的向量（压缩矩阵）以及chunk存储中的记录
+        """
+        if not chunk_ids:
+            return
+        self._consolidate()
+        to_delete = {chunk_id for chunk_id in chunk_ids if chunk_id in self._id_to_row}
+        if to_delete:
+            keep = np.array([chunk_id not in to_delete for chunk_id in self._ids], dtype=bool)
+            # 布尔索引会生成新的可写数组，同时脱离内存映射
+            self._matrix = self._matrix[keep]
+            self._ids = [chunk_id for chunk_id in self._ids if chunk_id not in to_delete]
+            self._id_to_row = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._delete_records(chunk_ids)
+        self.logger.info(f"已从向量存储删除{len(to_delete)}个chunks")
+
+    def _rename_vectors(self, renamed: Dict[str, Chunk]) -> None:
+        self._ids = [renamed[chunk_id].chunk_id if chunk_id in renamed else chunk_id for chunk_id in self._ids]
+        self._id_to_row = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+
+    def reset(self) -> None:
+        self._matrix = None
+        self._ids = []
+        self._id_to_row = {}
+        self._pending = []
+        self._clear_records()
+
+    def search(self, query: str, k: int = 4) -> List[SearchResult]:
+        """
+        暴力点积检索top-k
+        """
+        return self.search_batch([query], k=k)[0]
+
+    def search_batch(self, queries: List[str], k: int = 4,
+                     with_embeddings: bool = False) -> List[List[SearchResult]]:
+        """
+        批量检索：查询矩阵与向量矩阵一次矩阵乘法，按行取top-k
+        with_embeddings 时在 chunk.embedding 中带回候选向量
+        """
+        self._consolidate()
+        if self._matrix is None or not len(self._ids):
+            raise SearchError("向量存储未初始化")
+        if not queries:
+            return []
+        try:
+            query_matrix = np.asarray(self.embedding_model.embed_queries(queries), dtype=np.float32)
+            scores = query_matrix @ self._matrix.T  # (查询数, N)
+            rows_per_query = [self._top_k(row_scores, k) for row_scores in scores]
+            hit_rows = {row for rows in rows_per_query for row in rows}
+            chunks = self._fetch_chunks([self._ids[row] for row in hit_rows])
+            if with_embeddings:
+                for row in hit_rows:
+                    if self._ids[row] in chunks:
+                        chunks[self._ids[row]].embedding = self._matrix[row].tolist()
+            return [
+                [
+                    SearchResult(chunk=chunks[self._ids[row]], score=float(row_scores[row]), rank=rank)
+                    for rank, row in enumerate(rows, 1)
+                    if self._ids[row] in chunks
+                ]
+                for rows, row_scores in zip(rows_per_query, scores)
+            ]
+        except Exception as e:
+            self.logger.error(f"搜索相似chunks时出错：{e}")
+            raise SearchError(f"搜索相似chunks时出错：{e}")
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        返回得分最高的k个下标（按得分降序）；argpartition 为O(N)，只对k个候选排序
+        """
+        k = min(k, scores.shape[-1])
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        return candidates[np.argsort(-scores[candidates])]
+
+    def save(self, path: str) -> None:
+        """
+        保存向量矩阵(.npy)、chunk_id列表并提交chunk存储
+        """
+        self._consolidate()
+        try:
+            os.makedirs(path, exist_ok=True)
+            matrix = self._matrix if self._matrix is not None else np.zeros((0, 0), dtype=np.float32)
+            # 先写临时文件再替换：当前矩阵可能正是被映射的旧文件
+            tmp_path = os.path.join(path, self.EMBEDDINGS_FILENAME + ".tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, matrix)
+            os.replace(tmp_path, os.path.join(path, self.EMBEDDINGS_FILENAME))
+            with open(os.path.join(path, self.IDS_FILENAME), "w", encoding="utf-8") as f:
+                json.dump(self._ids, f)
+            self.logger.info(f"向量矩阵保存完成: {matrix.shape}")
+        except Exception as e:
+            self.logger.error(f"保存向量矩阵时出错：{e}")
+            raise SearchError(f"保存向量矩阵时出错：{e}")
+        self._save_chunk_store(path)
+
+    def load(self, path: str) -> None:
+        """
+        以内存映射方式加载向量矩阵，只有被访问到的页才会读入内存
+        """
+        try:
+            embeddings_path = os.path.join(path, self.EMBEDDINGS_FILENAME)
+            if not os.path.exists(embeddings_path):
+                raise SearchError(f"向量文件不存在: {embeddings_path}")
+            self._matrix = np.load(embeddings_path, mmap_mode="r")
+            with open(os.path.join(path, self.IDS_FILENAME), "r", encoding="utf-8") as f:
+                self._ids = json.load(f)
+            if len(self._ids) != len(self._matrix):
+                raise SearchError(f"向量数({len(self._matrix)})与chunk_id数({len(self._ids)})不一致")
+            self._id_to_row = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self._pending = []
+            self._load_chunk_store(path)
+            self.logger.info(f"向量存储加载成功: {len(self._ids)} 个向量")
+        except SearchError:
+            raise
+        except Exception as e:
+            self.logger.error(f"加载向量存储时出错：{e}")
+            raise SearchError(f"加载向量存储时出错：{e}")
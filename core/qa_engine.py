@@ -1,19 +1,73 @@
+import asyncio
 import time
 from datetime import datetime
-from typing import List, Optional
+from typing import Callable, Iterable, Iterator, List, Optional
 from config.models import QAResult, SearchResult
 from models.base import BaseLLM,BaseVectorStore
 from config .settings import RetrievalConfig
+from core.answer_cache import SemanticAnswerCache
+from core.context_builder import ContextBuilder
+from core.reranker import CrossEncoderReranker
+from core.retrieval import Retriever
 from utils.logger import get_logger
 
+
+class AnswerStream:
+    """
+    流式回答：迭代得到回答的文本片段，迭代结束后 result 为完整的 QAResult
+    """
+    def __init__(self, question: str, source_chunk: List[SearchResult], tokens: Iterable[str],
+                 start_time: float, from_cache: bool = False,
+                 on_complete: Optional[Callable[[QAResult], None]] = None):
+        self.question = question
+        self.source_chunk = source_chunk
+        self.from_cache = from_cache
+        self.result: Optional[QAResult] = None
+        self.time_to_first_token: Optional[float] = None
+        self._tokens = tokens
+        self._start_time = start_time
+        self._on_complete = on_complete
+
+    def __iter__(self) -> Iterator[str]:
+        parts = []
+        try:
+            for token in self._tokens:
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.time() - self._start_time
+                parts.append(token)
+                yield token
+        finally:
+            # 调用方提前停止迭代时立即关闭上游的token流（释放LLM的流式连接），不生成 result、不写缓存
+            close = getattr(self._tokens, "close", None)
+            if close is not None:
+                close()
+
+        self.result = QAResult(
+            question=self.question,
+            answer="".join(parts),
+            source_chunk=self.source_chunk,
+            processing_time=time.time() - self._start_time,
+            timestamp=datetime.now(),
+            from_cache=self.from_cache
+        )
+        if self._on_complete is not None:
+            self._on_complete(self.result)
+
+
 class QAEngine:
     """
     问答引擎
     """
-    def __init__(self, llm: BaseLLM, vector_store: BaseVectorStore, config: RetrievalConfig):
+    def __init__(self, llm: BaseLLM, vector_store: BaseVectorStore, config: RetrievalConfig,
+                 answer_cache: Optional[SemanticAnswerCache] = None, max_concurrency: int = 8,
+                 reranker: Optional[CrossEncoderReranker] = None):
         self.llm = llm
         self.vector_store = vector_store
         self.config = config
+        self.retriever = Retriever(vector_store, config, reranker=reranker)
+        self.context_builder = ContextBuilder(max_tokens=config.context_max_tokens)
+        self.answer_cache = answer_cache
+        self.max_concurrency = max_concurrency
         self.logger = get_logger(__name__)
 
     def answer_question(self, question: str) -> QAResult:
@@ -25,7 +79,7 @@ class QAEngine:
 
         try:
             #1.检索相关文档。
-            search_results = self.vector_store.search(question, k=self.config.k)
+            search_results = self._retrieve(question)
 
             if not search_results:
                 return QAResult(
@@ -37,6 +91,19 @@ class QAEngine:
                 )
             self.logger.info(f"检索到 {len(search_results)} 个相关chunks")
 
+            # 相似问题且检索结果相同时复用缓存的回答，省去一次LLM调用
+            cached = self._lookup_cache(question, search_results)
+            if cached is not None:
+                return QAResult(
+                    question=question,
+                    answer=cached.answer,
+                    source_chunk=search_results,
+                    processing_time=time.time() - start_time,
+                    timestamp=datetime.now(),
+                    confidence=cached.confidence,
+                    from_cache=True
+                )
+
             #2.准备上下文
             context = self._prepare_context(search_results)
 
@@ -46,13 +113,15 @@ class QAEngine:
             processing_time = time.time() - start_time
             self.logger.info(f"问题回答完成，耗时 {processing_time:.2f} 秒")
 
-            return QAResult(
+            result = QAResult(
                 question=question,
                 answer=answer,
                 source_chunk=search_results,
                 processing_time=processing_time,
                 timestamp=datetime.now()
             )
+            self._store_cache(question, search_results, result)
+            return result
         except Exception as e:
             self.logger.error(f"回答问题时出错: {e}")
             return QAResult(
@@ -63,45 +132,178 @@ class QAEngine:
                 timestamp=datetime.now()
             )
 
+    async def aanswer_question(self, question: str) -> QAResult:
+        """
+        异步回答问题：检索放到线程池执行，生成使用LLM的异步接口
+        """
+        start_time = time.time()
+        try:
+            search_results = await asyncio.to_thread(self._retrieve, question)
+        except Exception as e:
+            self.logger.error(f"回答问题时出错: {e}")
+            return self._error_result(question, start_time)
+        return await self._agenerate_answer(question, search_results, start_time)
 
-    def _prepare_context(self, search_results: List[SearchResult])-> str:
+    async def _agenerate_answer(self, question: str, search_results: List[SearchResult],
+                                start_time: float) -> QAResult:
+        """
+        基于已检索到的chunks异步生成回答
+        """
+        try:
+            if not search_results:
+                return QAResult(
+                    question=question,
+                    answer="抱歉，没有找到相关信息。",
+                    source_chunk=[],
+                    processing_time=time.time() - start_time,
+                    timestamp=datetime.now()
+                )
+
+            # 缓存查找/写入要计算问题向量（模型前向计算），放到线程池执行，避免阻塞事件循环上的其它问题
+            cached = await asyncio.to_thread(self._lookup_cache, question, search_results)
+            if cached is not None:
+                return QAResult(
+                    question=question,
+                    answer=cached.answer,
+                    source_chunk=search_results,
+                    processing_time=time.time() - start_time,
+                    timestamp=datetime.now(),
+                    confidence=cached.confidence,
+                    from_cache=True
+                )
+
+            context = self._prepare_context(search_results)
+            answer = await self.llm.agenerate_with_context(question, context)
+
+            result = QAResult(
+                question=question,
+                answer=answer,
+                source_chunk=search_results,
+                processing_time=time.time() - start_time,
+                timestamp=datetime.now()
+            )
+            await asyncio.to_thread(self._store_cache, question, search_results, result)
+            return result
+        except Exception as e:
+            self.logger.error(f"回答问题时出错: {e}")
+            return self._error_result(question, start_time)
+
+    @staticmethod
+    def _error_result(question: str, start_time: float) -> QAResult:
+        return QAResult(
+            question=question,
+            answer="抱歉，处理问题时出错。",
+            source_chunk=[],
+            processing_time=time.time() - start_time,
+            timestamp=datetime.now()
+        )
+
+    async def abatch_answer_questions(self, questions: List[str],
+                                      max_concurrency: Optional[int] = None) -> List[QAResult]:
         """
-        准备上下文信息
+        并发批量回答问题：所有问题一次批量检索，再并发生成，同时进行的生成数不超过 max_concurrency，结果顺序与输入一致
         """
-        context_parts = []
+        start_time = time.time()
+        try:
+            batch_results = await asyncio.to_thread(self._retrieve_batch, questions)
+        except Exception as e:
+            self.logger.error(f"批量检索时出错: {e}")
+            return [self._error_result(question, start_time) for question in questions]
+        self.logger.info(f"批量检索 {len(questions)} 个问题完成，耗时 {time.time() - start_time:.2f} 秒")
+
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def answer_with_limit(question: str, search_results: List[SearchResult]) -> QAResult:
+            async with semaphore:
+                return await self._agenerate_answer(question, search_results, start_time)
+
+        results = await asyncio.gather(*(
+            answer_with_limit(question, search_results)
+            for question, search_results in zip(questions, batch_results)
+        ))
+        self.logger.info(f"批量回答 {len(questions)} 个问题完成，耗时 {time.time() - start_time:.2f} 秒")
+        return list(results)
+
+    def stream_answer(self, question: str) -> AnswerStream:
+        """
+        流式回答问题：检索完成后立即返回，回答文本随LLM生成逐步产出
+        """
+        start_time = time.time()
+        self.logger.info(f"开始流式处理问题: {question}")
+
+        try:
+            search_results = self._retrieve(question)
+        except Exception as e:
+            self.logger.error(f"检索时出错: {e}")
+            return AnswerStream(question, [], ["抱歉，处理问题时出错。"], start_time)
+
+        if not search_results:
+            return AnswerStream(question, [], ["抱歉，没有找到相关信息。"], start_time)
+        self.logger.info(f"检索到 {len(search_results)} 个相关chunks")
+
+        cached = self._lookup_cache(question, search_results)
+        if cached is not None:
+            return AnswerStream(question, search_results, [cached.answer], start_time, from_cache=True)
+
+        context = self._prepare_context(search_results)
+        errors = []
 
-        for i ,result in enumerate(search_results):
-            chunk = result.chunk
-            source = chunk.metadata.get("source", "未知来源")
+        def guarded_tokens() -> Iterator[str]:
+            # LLM在生成过程中失败时给出提示而不是让异常打断调用方的迭代
+            try:
+                yield from self.llm.generate_with_context_stream(question, context)
+            except Exception as e:
+                self.logger.error(f"流式生成回答时出错: {e}")
+                errors.append(e)
+                yield "\n抱歉，生成回答时出现错误。"
 
-            #获取标题信息
-            headers = []
-            for key, value in chunk.metadata.items():
-                if key.startswith("Header"):
-                    headers.append(f"{key}: {value}")
+        def on_complete(result: QAResult) -> None:
+            if not errors:  # 失败的回答不进缓存
+                self._store_cache(question, search_results, result)
 
-            header_info = " | ".join(headers) if headers else "无标题信息"
-            context_part = f"""
-            来源 {i + 1}: {source}
-            标题: {header_info}
-            相关度: {result.score:.3f}
+        return AnswerStream(question, search_results, guarded_tokens(), start_time, on_complete=on_complete)
 
-            内容:
-            {chunk.content}
-            """
-            context_parts.append(context_part)
+    def _retrieve(self, question: str) -> List[SearchResult]:
+        """
+        检索与问题相关的chunks
+        """
+        return self.retriever.retrieve(question)
+
+    def _retrieve_batch(self, questions: List[str]) -> List[List[SearchResult]]:
+        """
+        批量检索：一次编码所有问题并做一次批量近邻搜索
+        """
+        return self.retriever.retrieve_batch(questions)
 
-        return "\n" + "="*80 + "\n".join(context_parts)
+    def _lookup_cache(self, question: str, search_results: List[SearchResult]) -> Optional[QAResult]:
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.lookup(question, [result.chunk.chunk_id for result in search_results])
+
+    def _store_cache(self, question: str, search_results: List[SearchResult], result: QAResult) -> None:
+        if self.answer_cache is not None:
+            self.answer_cache.store(question, [r.chunk.chunk_id for r in search_results], result)
+
+    def _prepare_context(self, search_results: List[SearchResult])-> str:
+        """
+        准备上下文信息（按token预算打包，去除相邻chunk的重叠文本）
+        """
+        return self.context_builder.build(search_results)
 
     def batch_answer_questions(self, questions: List[str]) -> List[QAResult]:
         """
-        批量处理问题
+        批量处理问题（同步入口，内部并发执行；已在事件循环中时请直接 await abatch_answer_questions）
         """
-        results = []
-        for question in questions:
-            result = self.answer_question(question)
-            results.append(result)
-        return results
+        return asyncio.run(self._run_batch(questions))
+
+    async def _run_batch(self, questions: List[str]) -> List[QAResult]:
+        """
+        在 asyncio.run 创建的事件循环中批量回答，结束前关闭LLM在该循环中创建的异步连接池
+        """
+        try:
+            return await self.abatch_answer_questions(questions)
+        finally:
+            await self.llm.aclose()
 
 
 
@@ -0,0 +1,93 @@
+import threading
+import time
+from typing import List, Optional
+from config.models import SearchResult
+from config.settings import RerankerConfig
+from utils.logger import get_logger
+
+
+class CrossEncoderReranker:
+    """
+    交叉编码器重排序：把 (问题, chunk内容) 成对送入小型交叉编码器一次批量打分，保留得分最高的 top_n 个
+    按历史平均单对耗时估算本次耗时，超出 latency_budget_ms 时只重排预算内能处理的前几个候选，
+    连 top_n 个都处理不了时直接跳过重排序
+    """
+    EMA_ALPHA = 0.3  # 单对耗时估计的指数滑动平均系数
+
+    def __init__(self, config: RerankerConfig):
+        self.config = config
+        self.logger = get_logger(__name__)
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._seconds_per_pair: Optional[float] = None  # 首次打分之前没有估计，不做预算裁剪
+        self.skipped = 0
+
+    @property
+    def model(self):
+        """
+        首次使用时加载模型（sentence-transformers 的 CrossEncoder）
+        """
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self.logger.info(f"加载重排序模型: {self.config.model_name}")
+                    self._model = CrossEncoder(self.config.model_name, max_length=self.config.max_length)
+        return self._model
+
+    def _affordable_pairs(self, num_candidates: int) -> int:
+        """
+        按耗时预算估算本次最多能打分的候选数
+        """
+        if self.config.latency_budget_ms is None or self._seconds_per_pair is None:
+            return num_candidates
+        budget = self.config.latency_budget_ms / 1000.0
+        return min(num_candidates, int(budget / self._seconds_per_pair))
+
+    def rerank(self, question: str, candidates: List[SearchResult], top_n: Optional[int] = None) -> List[SearchResult]:
+        """
+        对候选重新打分排序，返回前 top_n 个；score 为交叉编码器得分
+        """
+        top_n = top_n or self.config.top_n
+        if len(candidates) <= 1:
+            return candidates[:top_n]
+
+        affordable = self._affordable_pairs(len(candidates))
+        if affordable < min(top_n, len(candidates)):
+            self.skipped += 1
+            # 逐步调低估计，使负载下降后能重新尝试重排序，而不是一直跳过
+            self._seconds_per_pair *= 1 - self.EMA_ALPHA
+            self.logger.warning(
+                f"预计重排序耗时超出预算（{self.config.latency_budget_ms}ms），跳过重排序"
+            )
+            return candidates[:top_n]
+        if affordable < len(candidates):
+            self.logger.info(f"受耗时预算限制，只重排序前 {affordable}/{len(candidates)} 个候选")
+            candidates = candidates[:affordable]
+
+        try:
+            # 先取到模型再计时：首次调用的模型加载不计入单对耗时估计
+            model = self.model
+            start_time = time.time()
+            scores = model.predict(
+                [(question, result.chunk.content) for result in candidates],
+                batch_size=self.config.batch_size,
+                show_progress_bar=False
+            )
+            elapsed = time.time() - start_time
+        except Exception as e:
+            self.logger.error(f"重排序时出错，使用原始排序：{e}")
+            return candidates[:top_n]
+
+        per_pair = elapsed / len(candidates)
+        if self._seconds_per_pair is None:
+            self._seconds_per_pair = per_pair
+        else:
+            self._seconds_per_pair += self.EMA_ALPHA * (per_pair - self._seconds_per_pair)
+        self.logger.info(f"重排序 {len(candidates)} 个候选，耗时 {elapsed * 1000:.0f}ms")
+
+        ranked = sorted(zip(candidates, scores), key=lambda item: float(item[1]), reverse=True)[:top_n]
+        return [
+            SearchResult(chunk=result.chunk, score=float(score), rank=rank)
+            for rank, (result, score) in enumerate(ranked, 1)
+        ]
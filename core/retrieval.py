@@ -0,0 +1,137 @@
+from typing import Dict, List, Optional
+import numpy as np
+from config.models import SearchResult
+from config.settings import RetrievalConfig
+from core.reranker import CrossEncoderReranker
+from models.base import BaseVectorStore
+from utils.exceptions import ConfigurationError
+from utils.logger import get_logger
+
+
+def reciprocal_rank_fusion(rankings: List[List[SearchResult]], k: int, rrf_k: int = 60) -> List[SearchResult]:
+    """
+    倒数排名融合（RRF）：每路排名中第r名贡献 1/(rrf_k + r)，按总分取前k个
+    只使用名次，不依赖各路得分的量纲（向量距离与BM25得分不可直接比较）
+    """
+    fused: Dict[str, float] = {}
+    chunks = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, 1):
+            chunk_id = result.chunk.chunk_id
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank)
+            chunks.setdefault(chunk_id, result.chunk)
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [
+        SearchResult(chunk=chunks[chunk_id], score=score, rank=rank)
+        for rank, (chunk_id, score) in enumerate(ordered, 1)
+    ]
+
+
+def maximal_marginal_relevance(relevance: np.ndarray, embeddings: np.ndarray, k: int,
+                               lambda_mult: float = 0.5) -> List[int]:
+    """
+    最大边际相关（MMR）：每一步选择 lambda * 与查询的相关度 - (1 - lambda) * 与已选结果的最大相似度 最高的候选
+    候选两两相似度一次矩阵乘法算出，之后每步只做向量运算，返回被选中候选的下标
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    similarity = embeddings @ embeddings.T  # 向量已归一化，点积即余弦相似度
+    max_similarity = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = [int(np.argmax(relevance))]
+    available[selected[0]] = False
+    while len(selected) < k:
+        max_similarity = np.maximum(max_similarity, similarity[:, selected[-1]])
+        mmr_scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        mmr_scores[~available] = -np.inf
+        best = int(np.argmax(mmr_scores))
+        selected.append(best)
+        available[best] = False
+    return selected
+
+
+class Retriever:
+    """
+    检索器：按 RetrievalConfig.serch_type 选择检索方式
+    - similarity: 向量检索
+    - mmr: 向量检索取 fetch_k 个候选，用MMR选出k个彼此不重复的结果（避免重叠分块重复送入LLM）
+    - hybrid: 向量检索与BM25关键词检索各取 fetch_k 个候选，RRF融合后取前k个
+    score_threshold 作用于向量检索结果（余弦相似度）
+    配置了 reranker 时，以上检索先取回 reranker 的 fetch_k 个候选，再由交叉编码器重排序保留 top_n 个
+    """
+    SEARCH_TYPES = ("similarity", "mmr", "hybrid")
+
+    def __init__(self, vector_store: BaseVectorStore, config: RetrievalConfig,
+                 reranker: Optional[CrossEncoderReranker] = None):
+        if config.serch_type not in self.SEARCH_TYPES:
+            raise ConfigurationError(f"不支持的检索方式: {config.serch_type}，可选 {self.SEARCH_TYPES}")
+        self.vector_store = vector_store
+        self.config = config
+        self.reranker = reranker
+        self.logger = get_logger(__name__)
+
+    def retrieve(self, question: str) -> List[SearchResult]:
+        return self.retrieve_batch([question])[0]
+
+    def retrieve_batch(self, questions: List[str]) -> List[List[SearchResult]]:
+        """
+        批量检索，向量检索部分一次批量完成
+        """
+        if self.reranker is None:
+            return self._retrieve_candidates(questions, self.config.k)
+        candidates_batch = self._retrieve_candidates(questions, max(self.reranker.config.fetch_k, self.config.k))
+        return [
+            self.reranker.rerank(question, candidates)
+            for question, candidates in zip(questions, candidates_batch)
+        ]
+
+    def _retrieve_candidates(self, questions: List[str], k: int) -> List[List[SearchResult]]:
+        """
+        按 serch_type 为每个问题检索k个结果
+        """
+        if self.config.serch_type == "similarity":
+            return [
+                self._apply_threshold(results)
+                for results in self.vector_store.search_batch(questions, k=k)
+            ]
+
+        fetch_k = max(self.config.fetch_k, k)
+        if self.config.serch_type == "mmr":
+            return [
+                self._select_mmr(self._apply_threshold(results), k)
+                for results in self.vector_store.search_batch(questions, k=fetch_k, with_embeddings=True)
+            ]
+
+        dense_batch = self.vector_store.search_batch(questions, k=fetch_k)
+        return [
+            reciprocal_rank_fusion(
+                [self._apply_threshold(dense), self.vector_store.sparse_search(question, k=fetch_k)],
+                k=k,
+                rrf_k=self.config.rrf_k
+            )
+            for question, dense in zip(questions, dense_batch)
+        ]
+
+    def _apply_threshold(self, results: List[SearchResult]) -> List[SearchResult]:
+        if self.config.score_threshold is None:
+            return results
+        return [result for result in results if result.score >= self.config.score_threshold]
+
+    def _select_mmr(self, candidates: List[SearchResult], k: int) -> List[SearchResult]:
+        """
+        从候选中用MMR选出k个结果，保留原始相似度作为score
+        """
+        if len(candidates) <= 1:
+            return candidates
+        if any(result.chunk.embedding is None for result in candidates):
+            self.logger.warning("候选chunk缺少向量，跳过MMR")
+            return candidates[:k]
+        relevance = np.asarray([result.score for result in candidates], dtype=np.float32)
+        embeddings = np.asarray([result.chunk.embedding for result in candidates], dtype=np.float32)
+        selected = maximal_marginal_relevance(relevance, embeddings, k, self.config.mmr_lambda)
+        return [
+            SearchResult(chunk=candidates[index].chunk, score=candidates[index].score, rank=rank)
+            for rank, index in enumerate(selected, 1)
+        ]
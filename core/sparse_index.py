@@ -0,0 +1,140 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Iterable, List, Tuple
+from config.models import Chunk
+from utils.logger import get_logger
+
+# 英文/代码标识符与连续的中日韩字符分别匹配
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+|[\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7af]+")
+# 驼峰拆分：OpenAIEmbeddings -> Open, AI, Embeddings
+_CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    关键词检索的分词
+    标识符保留完整形式（embed_query、openaiembeddings），同时加入下划线/驼峰拆分后的子词；
+    中文没有空格分词，按单字 + 相邻两字切分
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        word = match.group()
+        if word[0].isascii():
+            tokens.append(word.lower())
+            parts = [part for piece in word.split("_") for part in _CAMEL_PATTERN.findall(piece)]
+            if len(parts) > 1:
+                tokens.extend(part.lower() for part in parts)
+        else:
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+class SparseIndex:
+    """
+    BM25倒排索引（SQLite），与向量索引放在同一目录，随 add_chunks 增量构建
+    表 postings(term, chunk_id, tf) 为倒排表，doc_lengths(chunk_id, length) 记录文档长度
+    """
+    FILENAME = "bm25.sqlite"
+    QUERY_BATCH_SIZE = 500  # 单条SQL中IN参数的数量上限，低于SQLite默认的999
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.logger = get_logger(__name__)
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, chunk_id TEXT NOT NULL, tf INTEGER NOT NULL, PRIMARY KEY (term, chunk_id)) "
+            "WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings(chunk_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS doc_lengths (chunk_id TEXT PRIMARY KEY, length INTEGER NOT NULL)")
+        self._conn.commit()
+
+    @classmethod
+    def open(cls, directory: str) -> "SparseIndex":
+        return cls(os.path.join(directory, cls.FILENAME))
+
+    def add_many(self, chunks: Iterable[Chunk]) -> None:
+        """
+        写入chunks的词频（已存在的chunk_id先删除），在 commit 之前不落盘
+        """
+        chunks = list({chunk.chunk_id: chunk for chunk in chunks}.values())
+        self.delete_many([chunk.chunk_id for chunk in chunks])
+        postings, lengths = [], []
+        for chunk in chunks:
+            tokens = tokenize(chunk.content)
+            lengths.append((chunk.chunk_id, len(tokens)))
+            postings.extend((term, chunk.chunk_id, tf) for term, tf in Counter(tokens).items())
+        with self._lock:
+            self._conn.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", postings)
+            self._conn.executemany("INSERT INTO doc_lengths (chunk_id, length) VALUES (?, ?)", lengths)
+
+    def delete_many(self, chunk_ids: List[str]) -> None:
+        with self._lock:
+            for start in range(0, len(chunk_ids), self.QUERY_BATCH_SIZE):
+                batch = chunk_ids[start:start + self.QUERY_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", batch)
+                self._conn.execute(f"DELETE FROM doc_lengths WHERE chunk_id IN ({placeholders})", batch)
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[str, float]]:
+        """
+        BM25检索，返回按得分降序的 (chunk_id, score)
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            num_docs, avg_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM doc_lengths").fetchone()
+            if not num_docs:
+                return []
+            avg_length = avg_length or 1.0
+            placeholders = ",".join("?" * len(terms))
+            doc_freqs = dict(self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms
+            ).fetchall())
+            rows = self._conn.execute(
+                f"SELECT p.term, p.chunk_id, p.tf, d.length FROM postings p "
+                f"JOIN doc_lengths d ON d.chunk_id = p.chunk_id WHERE p.term IN ({placeholders})",
+                terms
+            ).fetchall()
+
+        scores: Counter = Counter()
+        for term, chunk_id, tf, length in rows:
+            df = doc_freqs[term]
+            idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+            scores[chunk_id] += idf * tf * (self.k1 + 1) / norm
+        return scores.most_common(k)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM doc_lengths")
+            self._conn.commit()
+
+    def commit(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM doc_lengths").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
@@ -1,40 +1,126 @@
-import hashlib
-from typing import List, Dict
-from langchain_text_splitters import RecursiveCharacterTextSplitter, MarkdownTextSplitter
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional
 from config.models import Document, Chunk
+from core.chunk_ids import POSITION_KEY, chunk_id
 from utils.logger import get_logger
 from config.settings import ProcessingConfig
+from utils.batching import batched
+from utils.parallel import ordered_parallel_map, resolve_workers
+
+
+class EmbeddingTokenCounter:
+    """
+    用嵌入模型自己的分词器计算token数（不含 [CLS]/[SEP] 等特殊token），结果按文本缓存
+    分割器在合并/递归切分时会对同一段文本反复求长度，缓存避免重复分词
+    """
+    def __init__(self, tokenizer_name: str, max_tokens: Optional[int] = None, cache_size: int = 65536):
+        from transformers import AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+        # 快速分词器直接调用底层Rust实现，跳过transformers的Python封装
+        self._backend = getattr(self.tokenizer, "backend_tokenizer", None)
+        window = max_tokens or self._model_max_seq_length(tokenizer_name) or self.tokenizer.model_max_length
+        # 编码时会加上特殊token，chunk本身可用的token数要扣除
+        self.max_tokens = window - self.tokenizer.num_special_tokens_to_add()
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    @staticmethod
+    def _model_max_seq_length(model_name: str) -> Optional[int]:
+        """
+        sentence-transformers模型的最大序列长度，可能比分词器的 model_max_length 小
+        """
+        from models.huggingface_models import sentence_transformer_max_seq_length
+        return sentence_transformer_max_seq_length(model_name)
+
+    def _count(self, text: str) -> int:
+        if self._backend is not None:
+            return len(self._backend.encode(text, add_special_tokens=False).ids)
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def __call__(self, text: str) -> int:
+        return self.count(text)
+
+    def split_to_fit(self, text: str, max_tokens: int) -> List[str]:
+        """
+        按token边界把文本切成不超过 max_tokens 的片段（分割器合并片段时token数不严格可加，作为兜底）
+        """
+        encoded = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        offsets = encoded["offset_mapping"]
+        pieces = []
+        for start in range(0, len(offsets), max_tokens):
+            window = offsets[start:start + max_tokens]
+            end = offsets[start + max_tokens][0] if start + max_tokens < len(offsets) else len(text)
+            piece = text[window[0][0]:end].strip()
+            if piece:
+                pieces.append(piece)
+        return pieces
 
 
 class TextProcessor:
     """文本处理器：负责文档分割、Chunk 创建"""
 
     def __init__(self, config: ProcessingConfig):
+        from langchain_text_splitters import RecursiveCharacterTextSplitter, MarkdownTextSplitter
         self.logger = get_logger(__name__)
         self.config = config
 
+        # 长度单位：字符数，或嵌入模型分词器的token数（保证chunk不超出模型的最大序列长度）
+        self.token_counter: Optional[EmbeddingTokenCounter] = None
+        self.chunk_size = self.config.chunk_size
+        chunk_overlap = self.config.chunk_overlap
+        length_function = len
+        if self.config.length_unit == "tokens":
+            self.token_counter = EmbeddingTokenCounter(self.config.tokenizer_name, self.config.max_tokens)
+            if self.chunk_size > self.token_counter.max_tokens:
+                self.logger.warning(
+                    f"chunk_size={self.chunk_size} tokens 超出嵌入模型窗口，调整为 {self.token_counter.max_tokens}"
+                )
+                self.chunk_size = self.token_counter.max_tokens
+            chunk_overlap = min(chunk_overlap, self.chunk_size // 2)
+            length_function = self.token_counter
+        self.length_function = length_function
+
         # 基础文本分割器
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.config.chunk_size,
-            chunk_overlap=self.config.chunk_overlap,
-            length_function=len,
+            chunk_size=self.chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=length_function,
             separators=self.config.separators,
         )
 
         # Markdown 标题分割器
         self.header_splitter = MarkdownTextSplitter(
-            chunk_size=self.config.chunk_size,
-            chunk_overlap=self.config.chunk_overlap,
+            chunk_size=self.chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=length_function,
             keep_separator=True
         )
 
     def process_documents(self, documents: List[Document]) -> List[Chunk]:
         self.logger.info(f"开始处理 {len(documents)} 个文档")
-        all_chunks = []
+        return list(self.iter_chunks(documents))
+
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[Chunk]:
+        """
+        逐个文档切分并产出chunks，可直接接在 DocumentLoader.iter_documents 之后流式处理
+        开启 parallel_chunking 时按 chunk_docs_per_task 个文档一组分发到进程池，chunks 的顺序和id与串行处理一致
+        """
+        if self.config.parallel_chunking:
+            yield from self._iter_chunks_parallel(documents)
+            return
         for doc in documents:
-            chunks = self.process_single_document(doc)
-            all_chunks.extend(chunks)
-        return all_chunks
+            yield from self.process_single_document(doc)
+
+    def _iter_chunks_parallel(self, documents: Iterable[Document]) -> Iterator[Chunk]:
+        workers = resolve_workers(self.config.chunk_workers)
+        self.logger.info(f"使用 {workers} 个进程并行切分文档")
+        for chunks in ordered_parallel_map(
+            _split_documents,
+            batched(documents, self.config.chunk_docs_per_task),
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self.config,)
+        ):
+            yield from chunks
 
     def process_single_document(self, document: Document) -> List[Chunk]:
         chunks = []
@@ -42,16 +128,15 @@ class TextProcessor:
             header_based_chunks = self.header_splitter.split_text(document.content)
 
             for chunk_idx, chunk_content in enumerate(header_based_chunks):
-                if len(chunk_content) > self.config.chunk_size:
-                    sub_chunks = self.text_splitter.split_text(chunk_content)
+                if self.length_function(chunk_content) > self.chunk_size:
+                    sub_chunks = self._split_to_fit(chunk_content)
                     for sub_idx, sub_content in enumerate(sub_chunks):
-                        # 关键修复1：用 dict() 包装 document.metadata，确保是可变字典
-                        metadata = dict(document.metadata)  # 先转换为可变字典
-                        # 再添加新字段（替代 **展开，避免继承只读特性）
-                        metadata.update({
+                        # 每个chunk一个新字典，不与 document.metadata 共享
+                        metadata = {
+                            **document.metadata,
                             "split_type": "markdown_header + recursive",
                             "parent_header_chunk_idx": chunk_idx
-                        })
+                        }
                         chunk = self._create_chunk(
                             content=sub_content,
                             metadata=metadata,
@@ -60,12 +145,11 @@ class TextProcessor:
                         )
                         chunks.append(chunk)
                 else:
-                    # 关键修复2：同样转换为可变字典
-                    metadata = dict(document.metadata)
-                    metadata.update({
+                    metadata = {
+                        **document.metadata,
                         "split_type": "markdown_header",
                         "header_chunk_idx": chunk_idx
-                    })
+                    }
                     chunk = self._create_chunk(
                         content=chunk_content,
                         metadata=metadata,
@@ -76,11 +160,9 @@ class TextProcessor:
 
         except Exception as e:
             self.logger.error(f"处理文档 {document.doc_id} 时出错：{e}，使用基础分割器降级处理")
-            simple_chunks = self.text_splitter.split_text(document.content)
+            simple_chunks = self._split_to_fit(document.content)
             for simple_idx, simple_content in enumerate(simple_chunks):
-                # 关键修复3：异常处理中也确保可变
-                metadata = dict(document.metadata)
-                metadata.update({"split_type": "recursive_fallback"})
+                metadata = {**document.metadata, "split_type": "recursive_fallback"}
                 chunk = self._create_chunk(
                     content=simple_content,
                     metadata=metadata,
@@ -91,17 +173,47 @@ class TextProcessor:
 
         return chunks
 
+    def _split_to_fit(self, text: str) -> List[str]:
+        """
+        递归切分；按token计长度时再检查每个片段，超出窗口的按token边界强制切开
+        """
+        pieces = self.text_splitter.split_text(text)
+        if self.token_counter is None:
+            return pieces
+        fitted = []
+        for piece in pieces:
+            if self.token_counter(piece) > self.chunk_size:
+                fitted.extend(self.token_counter.split_to_fit(piece, self.chunk_size))
+            else:
+                fitted.append(piece)
+        return fitted
+
     def _create_chunk(self, content: str, metadata: Dict, parent_doc_id: str, chunk_index: str or int) -> Chunk:
-        unique_key = f"{parent_doc_id}_{chunk_index}_{content[:50]}".encode("utf-8")
-        chunk_id = hashlib.md5(unique_key).hexdigest()
-        # 关键修复：创建全新的字典，彻底摆脱原字典的只读关联
-        mutable_metadata = {}
-        # 逐个复制键值对（避免直接引用原字典）
-        for key, value in metadata.items():
-            mutable_metadata[key] = value
+        # id由文档id、结构位置和内容决定，与文档的加载顺序无关
+        position = str(chunk_index)
+        metadata[POSITION_KEY] = position
         return Chunk(
             content=content,
-            metadata=metadata,  # 此时 metadata 已是可变字典
-            chunk_id=chunk_id,
+            metadata=metadata,  # 调用方已为每个chunk创建了新字典，直接使用
+            chunk_id=chunk_id(parent_doc_id, position, content),
             parent_doc_id=parent_doc_id
         )
+
+
+# 工作进程内的 TextProcessor，由 _init_worker 创建一次（分割器只构建一次）
+_worker_processor = None
+
+
+def _init_worker(config: ProcessingConfig) -> None:
+    global _worker_processor
+    _worker_processor = TextProcessor(config)
+
+
+def _split_documents(documents: List[Document]) -> List[Chunk]:
+    """
+    在工作进程中切分一组文档（模块级函数，可被pickle）
+    """
+    chunks = []
+    for document in documents:
+        chunks.extend(_worker_processor.process_single_document(document))
+    return chunks
@@ -1,116 +1,226 @@
-import os
-import pickle
-from typing import List, Optional
-from langchain_chroma import Chroma  # 新的导入方式
+from typing import Dict, List, Optional
 from config.models import Chunk,SearchResult
 from models.base import BaseEmbedding,BaseVectorStore
 from utils.logger import get_logger
-from utils.exceptions import SearchError
+from utils.exceptions import ConfigurationError, SearchError
+from core.embedding_cache import EmbeddingCache
+from core.chunk_dedup import LOCATIONS_KEY
+from core.chunk_ids import POSITION_KEY
+from core.vector_store_base import ChunkVectorStore
 
-class ChromaVectorStore(BaseVectorStore):
+class ChromaVectorStore(ChunkVectorStore):
     """
     Chroma向量存储实现
     """
-    def __init__(self, embedding_model: BaseEmbedding,persist_directory: str, collection_name: str ="documents"):
-        self.embedding_model = embedding_model
-        self.persist_directory = persist_directory
+    DELETE_BATCH_SIZE = 500
+    DEFAULT_MAX_BATCH_SIZE = 5461  # 读不到客户端上限时使用chroma默认SQLite配置下的值
+
+    def __init__(self, embedding_model: BaseEmbedding,persist_directory: str, collection_name: str ="documents",
+                 batch_size: int = 256, embedding_cache: Optional[EmbeddingCache] = None,
+                 keyword_index: bool = False):
+        super().__init__(embedding_model, persist_directory, batch_size=batch_size, embedding_cache=embedding_cache,
+                         keyword_index=keyword_index)
         self.collection_name = collection_name
-        self.logger = get_logger(__name__)
         self.chroma_db = None
-        self.chunks_metadata = {}
 
-    def add_chunks(self, chunks:List[Chunk])-> None:
+    def _open_chroma(self):
+        """
+        创建（或打开）chroma collection；langchain_chroma 在这里才导入，避免拖慢启动
+        """
+        from langchain_chroma import Chroma  # 新的导入方式
+        return Chroma(
+            persist_directory=self.persist_directory,
+            collection_name=self.collection_name,
+            embedding_function=self.embedding_model.client # 使用langchain兼容的embedding
+        )
+
+    @property
+    def max_upsert_batch_size(self) -> Optional[int]:
+        """
+        chroma客户端单次写入的最大条数（由SQLite的参数个数上限决定）
+        """
+        if self.chroma_db is None:
+            self.chroma_db = self._open_chroma()
+        try:
+            return self.chroma_db._client.get_max_batch_size()
+        except Exception:
+            return self.DEFAULT_MAX_BATCH_SIZE
+
+    def _upsert_batch(self, chunks: List[Chunk], embeddings: List[List[float]]) -> None:
+        """
+        写入一批chunks及其向量
         """
-        添加chunks到向量存储中
+        #准备文档内容和元数据
+        texts = [chunk.content for chunk in chunks]
+        metadatas = []
+
+        for chunk in chunks:
+            #为chorma准备元数据（chroma只支持标量值，位置列表只保存在chunk存储中）
+            metadata = {key: value for key, value in chunk.metadata.items() if key != LOCATIONS_KEY}
+            metadata.update( {
+                "chunk_id" :chunk.chunk_id,
+                "content_length": len(chunk.content),
+                "parent_doc_id": chunk.parent_doc_id or ''
+            })
+            metadatas.append(metadata)
+
+        #保存完整的chunk信息
+        self._store_records(chunks)
+
+        if self.chroma_db is None:
+            #创建（或打开）向量数据库chroma
+            self.chroma_db = self._open_chroma()
+        # 以chunk_id作为chroma的行id，便于增量同步时按id删除
+        self.chroma_db._collection.upsert(
+            ids=[chunk.chunk_id for chunk in chunks],
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=metadatas
+        )
+
+    def delete_chunks(self, chunk_ids: List[str]) -> None:
         """
-        self.logger.info(f"开始添加{len(chunks)}个chunks到向量存储中...")
-        
-        # 检查chunks是否为空
-        if not chunks:
-            self.logger.warning("没有chunks需要添加到向量存储中")
+        按chunk_id删除chroma中的行以及chunk存储中的记录
+        """
+        if not chunk_ids:
             return
-            
+        if not self.chroma_db:
+            raise SearchError("向量存储未初始化")
         try:
-            #准备文档内容和元数据
-            texts = [chunk.content for chunk in chunks]
-            metadatas = []
-
-            for chunk in chunks:
-                #为chorma准备元数据
-                metadata = chunk.metadata.copy()
-                metadata.update( {
-                    "chunk_id" :chunk.chunk_id,
-                    "content_length": len(chunk.content),
-                    "parent_doc_id": chunk.parent_doc_id or ''
-                })
-                metadatas.append(metadata)
-
-                #保存完整的chunk信息
-                self.chunks_metadata[chunk.chunk_id] = chunk
-
-            #创建向量数据库chroma
-            self.chroma_db = Chroma.from_texts(
-                texts=texts,
-                embedding=self.embedding_model.client,# # 使用langchain兼容的embedding
-                metadatas=metadatas,
-                persist_directory=self.persist_directory,
-                collection_name=self.collection_name
+            deleted = 0
+            for start in range(0, len(chunk_ids), self.DELETE_BATCH_SIZE):
+                batch_ids = chunk_ids[start:start + self.DELETE_BATCH_SIZE]
+                # 按元数据中的chunk_id查行id，兼容旧版本未指定ids写入的数据
+                rows = self.chroma_db.get(where={"chunk_id": {"$in": batch_ids}}, include=[])
+                if rows["ids"]:
+                    self.chroma_db.delete(ids=rows["ids"])
+                    deleted += len(rows["ids"])
+            self._delete_records(chunk_ids)
+            self.logger.info(f"已从向量存储删除{deleted}个chunks")
+        except Exception as e:
+            self.logger.error(f"删除chunks时出错：{e}")
+            raise SearchError(f"删除chunks时出错：{e}")
 
+    def _rename_vectors(self, renamed: Dict[str, Chunk]) -> None:
+        """
+        chroma的行id不能修改：读出旧行的向量，以新id写入后删除旧行
+        """
+        if not self.chroma_db:
+            raise SearchError("向量存储未初始化")
+        old_ids = list(renamed)
+        for start in range(0, len(old_ids), self.DELETE_BATCH_SIZE):
+            batch_ids = old_ids[start:start + self.DELETE_BATCH_SIZE]
+            rows = self.chroma_db._collection.get(
+                where={"chunk_id": {"$in": batch_ids}},
+                include=["embeddings", "documents", "metadatas"]
+            )
+            if not rows["ids"]:
+                continue
+            chunks = [renamed[metadata["chunk_id"]] for metadata in rows["metadatas"]]
+            new_ids = [chunk.chunk_id for chunk in chunks]
+            metadatas = [
+                dict(metadata, chunk_id=chunk.chunk_id, parent_doc_id=chunk.parent_doc_id or "",
+                     **{POSITION_KEY: chunk.metadata[POSITION_KEY]})
+                for metadata, chunk in zip(rows["metadatas"], chunks)
+            ]
+            self.chroma_db._collection.upsert(
+                ids=new_ids,
+                embeddings=rows["embeddings"],
+                documents=rows["documents"],
+                metadatas=metadatas
             )
-            self.logger.info("向量存储添加完成")
+            # 旧版本写入的行id可能与新id相同（没有改名的行已被upsert覆盖），不能删除
+            stale_ids = [row_id for row_id in rows["ids"] if row_id not in set(new_ids)]
+            if stale_ids:
+                self.chroma_db._collection.delete(ids=stale_ids)
 
+    def reset(self) -> None:
+        """
+        删除整个collection并清空chunk存储
+        """
+        try:
+            if self.chroma_db is None:
+                self.chroma_db = self._open_chroma()
+            self.chroma_db.delete_collection()
         except Exception as e:
-            self.logger.error(f"添加chunks到向量存储时出错：{e}")
-            raise SearchError(f"添加chunks到向量存储时出错：{e}")
+            self.logger.warning(f"清空collection时出错（可能尚不存在）：{e}")
+        self.chroma_db = None
+        self._clear_records()
 
     def search(self, query: str, k: int = 4)-> List[SearchResult]:
         """
         搜索相似chunks
         """
+        return self.search_batch([query], k=k)[0]
+
+    def search_batch(self, queries: List[str], k: int = 4,
+                     with_embeddings: bool = False) -> List[List[SearchResult]]:
+        """
+        批量搜索相似chunks：所有查询一次编码，一次chroma查询
+        score 统一换算为余弦相似度（越大越相关）；with_embeddings 时在 chunk.embedding 中带回候选向量
+        """
         if not self.chroma_db:
             raise SearchError("向量存储未初始化")
+        if not queries:
+            return []
         try:
-            #使用chorma向量数据库进行相似性搜索
-            results = self.chroma_db.similarity_search_with_score(query, k=k)
-            search_results = []
-            for i,(doc, score) in enumerate(results):
-                chunk_id = doc.metadata.get("chunk_id")
-                if chunk_id and chunk_id in self.chunks_metadata:
-                    chunk = self.chunks_metadata[chunk_id]
-                    search_results.append(SearchResult(
-                        chunk = chunk,
-                        score = score,
-                        rank = i+1
-                    ))
-            return search_results
+            # 查询向量由嵌入模型计算（带查询缓存），再按向量在chroma中做相似性搜索
+            query_embeddings = self.embedding_model.embed_queries(queries)
+            include = ["metadatas", "distances"] + (["embeddings"] if with_embeddings else [])
+            results = self.chroma_db._collection.query(
+                query_embeddings=query_embeddings,
+                n_results=k,
+                include=include
+            )
+            # 只从chunk存储中读取命中的chunks
+            hit_ids = [[(metadata or {}).get("chunk_id") for metadata in metadatas]
+                       for metadatas in results["metadatas"]]
+            chunks = self._fetch_chunks(list({chunk_id for ids in hit_ids for chunk_id in ids if chunk_id}))
+            embeddings = results["embeddings"] if with_embeddings else [[None] * len(ids) for ids in hit_ids]
+            to_similarity = self._similarity_function()
+            batch_results = []
+            for ids, distances, vectors in zip(hit_ids, results["distances"], embeddings):
+                search_results = []
+                for i, (chunk_id, distance, vector) in enumerate(zip(ids, distances, vectors)):
+                    if chunk_id and chunk_id in chunks:
+                        chunk = chunks[chunk_id]
+                        if vector is not None:
+                            chunk.embedding = [float(x) for x in vector]
+                        search_results.append(SearchResult(
+                            chunk = chunk,
+                            score = to_similarity(distance),
+                            rank = i+1
+                        ))
+                batch_results.append(search_results)
+            return batch_results
 
         except Exception as e:
             self.logger.error(f"搜索相似chunks时出错：{e}")
             raise SearchError(f"搜索相似chunks时出错：{e}")
 
+    def _similarity_function(self):
+        """
+        chroma返回的是距离（越小越相关），按collection的距离类型换算为余弦相似度
+        向量已归一化：l2（平方欧氏距离）d = 2 - 2cos；cosine/ip 的距离为 1 - cos
+        """
+        space = (self.chroma_db._collection.metadata or {}).get("hnsw:space", "l2")
+        if space == "l2":
+            return lambda distance: 1.0 - distance / 2.0
+        return lambda distance: 1.0 - distance
+
     def save(self,path: str)-> None:
         """
-        保存额外的metadata
+        提交chunk存储（向量由chroma自行持久化）
         """
-        try:
-            with open(os.path.join(path, "chunks_metadata.pkl"), "wb") as f:
-                pickle.dump(self.chunks_metadata, f)
-            self.logger.info("保存额外的metadata完成,向量存储元数据保存成功")
-        except Exception as e:
-            self.logger.error(f"保存metadata时出错：{e}")
+        self._save_chunk_store(path)
 
     def load(self, path: str) -> None:
         """
-        加载向量存储，确保元数据为可变字典
+        加载向量存储，chunk内容在检索时按需读取
         """
         try:
             # 修复拼写错误：chorma_db → chroma_db（避免后续引用错误）
-            # 修复拼写错误：chorma_db → chroma_db（避免后续引用错误）
-            self.chroma_db = Chroma(
-                persist_directory=self.persist_directory,
-                collection_name=self.collection_name,
-                embedding_function=self.embedding_model.client
-            )
+            self.chroma_db = self._open_chroma()
 
             # 验证chroma_db是否初始化成功
             if self.chroma_db is None:
@@ -120,29 +230,7 @@ class ChromaVectorStore(BaseVectorStore):
             if not hasattr(self.chroma_db, 'client') or self.chroma_db.client is None:
                 raise SearchError("Chroma数据库客户端初始化失败")
 
-            # 加载metadata并确保可变
-            metadata_path = os.path.join(path, "chunks_metadata.pkl")
-            if os.path.exists(metadata_path):
-                with open(metadata_path, "rb") as f:
-                    loaded_metadata = pickle.load(f)
-
-                    # 关键修复：强制转换为可变字典
-                    if isinstance(loaded_metadata, dict):
-                        # 对顶层字典转换
-                        self.chunks_metadata = dict(loaded_metadata)
-                        # 如果有嵌套字典，递归转换（根据实际数据结构调整）
-                        for key, value in self.chunks_metadata.items():
-                            if isinstance(value, dict):
-                                self.chunks_metadata[key] = dict(value)
-                    else:
-                        # 若加载的不是字典，初始化空字典避免报错
-                        self.chunks_metadata = {}
-                        self.logger.warning(f"元数据格式异常，已初始化为空字典")
-            else:
-                # 元数据文件不存在时，初始化空字典
-                self.chunks_metadata = {}
-                self.logger.info("未找到元数据文件，初始化为空字典")
-
+            self._load_chunk_store(path)
             self.logger.info("向量存储加载成功")
 
         except Exception as e:
@@ -172,57 +260,40 @@ class VectorStoreManager:
             self.vector_store = ChromaVectorStore(
                 embedding_model=self.embedding_model,
                 persist_directory=self.config.persist_directory,
-                collection_name=self.config.collection_name
+                collection_name=self.config.collection_name,
+                batch_size=self.config.ingest_batch_size,
+                embedding_cache=self._create_embedding_cache(),
+                keyword_index=self.config.keyword_index
+            )
+        elif self.config.provider == "numpy":
+            from core.numpy_vector_store import NumpyVectorStore
+            self.vector_store = NumpyVectorStore(
+                embedding_model=self.embedding_model,
+                persist_directory=self.config.persist_directory,
+                batch_size=self.config.ingest_batch_size,
+                embedding_cache=self._create_embedding_cache(),
+                keyword_index=self.config.keyword_index
+            )
+        elif self.config.provider == "faiss":
+            try:
+                from core.faiss_vector_store import FaissVectorStore
+            except ImportError as e:
+                raise ConfigurationError(f"使用FAISS向量存储需要安装faiss（pip install faiss-cpu）：{e}")
+            self.vector_store = FaissVectorStore(
+                embedding_model=self.embedding_model,
+                config=self.config,
+                embedding_cache=self._create_embedding_cache()
             )
         else:
             raise ValueError(f"不支持的向量存储提供者：{self.config.provider}")
         return self.vector_store
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    def _create_embedding_cache(self) -> Optional[EmbeddingCache]:
+        """
+        根据嵌入模型配置创建持久化嵌入缓存，未配置路径时不启用
+        """
+        embedding_config = getattr(self.embedding_model, "config", None)
+        if embedding_config is None or not embedding_config.cache_path:
+            return None
+        self.logger.info(f"启用嵌入缓存: {embedding_config.cache_path}")
+        return EmbeddingCache(embedding_config.cache_path, max_entries=embedding_config.cache_max_entries)
@@ -0,0 +1,268 @@
+import os
+from abc import abstractmethod
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from config.models import Chunk, SearchResult
+from core.chunk_dedup import LOCATIONS_KEY
+from core.chunk_store import ChunkStore
+from core.embedding_cache import EmbeddingCache
+from core.sparse_index import SparseIndex
+from models.base import BaseEmbedding, BaseVectorStore
+from utils.batching import batched
+from utils.exceptions import SearchError
+from utils.logger import get_logger
+
+
+class ChunkVectorStore(BaseVectorStore):
+    """
+    向量存储的公共实现：分批向量化写入、嵌入缓存、chunk内容存储（ChunkStore）和BM25关键词索引（SparseIndex）
+    keyword_index 为 False 时写入不维护关键词索引（非hybrid检索用不到），首次关键词检索时再从chunk存储整体补建
+    子类实现 _upsert_batch / _rename_vectors / delete_chunks / reset / search / save / load
+    """
+
+    def __init__(self, embedding_model: BaseEmbedding, persist_directory: str, batch_size: int = 256,
+                 embedding_cache: Optional[EmbeddingCache] = None, keyword_index: bool = False):
+        self.embedding_model = embedding_model
+        self.persist_directory = persist_directory
+        self.batch_size = batch_size
+        self.embedding_cache = embedding_cache
+        self.keyword_index = keyword_index
+        self.logger = get_logger(self.__class__.__module__)
+        self._chunk_store: Optional[ChunkStore] = None
+        self._sparse_index: Optional[SparseIndex] = None
+        self._sparse_checked = False
+        self._sparse_invalidated = False  # 不维护关键词索引时，已清空过期的索引
+
+    def add_chunks(self, chunks: Iterable[Chunk])-> None:
+        """
+        添加chunks到向量存储中
+        chunks 可以是生成器：按 batch_size 分批向量化并写入，内存中只保留当前批次
+        """
+        # 批大小不能超过底层数据库单次写入的上限
+        batch_size = self.batch_size
+        if self.max_upsert_batch_size is not None:
+            batch_size = min(batch_size, self.max_upsert_batch_size)
+        self.logger.info(f"开始添加chunks到向量存储中（批大小 {batch_size}）...")
+
+        total = 0
+        try:
+            for batch, embeddings in self._embed_batches(batched(chunks, batch_size)):
+                self._upsert_batch(batch, embeddings)
+                total += len(batch)
+                self.logger.info(f"已写入 {total} 个chunks")
+        except Exception as e:
+            self.logger.error(f"添加chunks到向量存储时出错：{e}")
+            raise SearchError(f"添加chunks到向量存储时出错：{e}")
+
+        # 检查chunks是否为空
+        if total == 0:
+            self.logger.warning("没有chunks需要添加到向量存储中")
+            return
+        self.logger.info(f"向量存储添加完成，共 {total} 个chunks")
+
+    @property
+    def max_upsert_batch_size(self) -> Optional[int]:
+        """
+        底层数据库单次写入的最大条数，None 表示不限制
+        """
+        return None
+
+    @abstractmethod
+    def _upsert_batch(self, chunks: List[Chunk], embeddings: List[List[float]]) -> None:
+        """
+        写入一批chunks及其向量（已存在的chunk_id覆盖）
+        """
+        pass
+
+    def _embed_batches(self, batches: Iterable[List[Chunk]]) -> Iterator[Tuple[List[Chunk], List[List[float]]]]:
+        """
+        逐批向量化，产出 (chunks, 向量)；配置了嵌入缓存时只对未命中的文本调用模型
+        嵌入模型的 embed_batches 可以在调用方写入当前批期间计算下一批（见 EmbeddingWorkerPool）
+        """
+        pending = deque()  # 已交给嵌入模型、尚未收回向量的批次
+
+        def texts():
+            for batch in batches:
+                pending.append(batch)
+                yield [chunk.content for chunk in batch]
+
+        if self.embedding_cache is not None:
+            vector_batches = self.embedding_cache.embed_batches(self.embedding_model, texts())
+        else:
+            vector_batches = self.embedding_model.embed_batches(texts())
+        for embeddings in vector_batches:
+            yield pending.popleft(), embeddings
+
+    @property
+    def chunk_store(self) -> ChunkStore:
+        """
+        chunk内容存储，首次使用时在 persist_directory 下打开
+        """
+        if self._chunk_store is None:
+            self._chunk_store = ChunkStore.open(self.persist_directory)
+        return self._chunk_store
+
+    @property
+    def sparse_index(self) -> SparseIndex:
+        """
+        BM25关键词索引，首次使用时在 persist_directory 下打开
+        """
+        if self._sparse_index is None:
+            self._sparse_index = SparseIndex.open(self.persist_directory)
+        return self._sparse_index
+
+    def _maintained_sparse_index(self) -> Optional[SparseIndex]:
+        """
+        写入/删除chunk时需要同步更新的关键词索引
+        不维护时返回 None，并清空已有的索引（否则它会缺少之后写入的chunks），下次关键词检索时整体补建
+        """
+        if self.keyword_index:
+            self._ensure_sparse_index()  # 之前未维护的索引先补建，再增量更新
+            return self.sparse_index
+        if not self._sparse_invalidated:
+            self._sparse_invalidated = True
+            self._sparse_checked = False
+            if self._sparse_index is not None or os.path.exists(os.path.join(self.persist_directory, SparseIndex.FILENAME)):
+                self.sparse_index.clear()
+        return None
+
+    def _store_records(self, chunks: List[Chunk]) -> None:
+        """
+        保存完整的chunk信息，需要时写入关键词索引
+        """
+        sparse_index = self._maintained_sparse_index()
+        self.chunk_store.put_many(chunks)
+        if sparse_index is not None:
+            sparse_index.add_many(chunks)
+
+    def _delete_records(self, chunk_ids: List[str]) -> None:
+        sparse_index = self._maintained_sparse_index()
+        self.chunk_store.delete_many(chunk_ids)
+        if sparse_index is not None:
+            sparse_index.delete_many(chunk_ids)
+
+    def _clear_records(self) -> None:
+        self.chunk_store.clear()
+        sparse_index = self._maintained_sparse_index()  # 不维护时这里已经清空
+        if sparse_index is not None:
+            sparse_index.clear()
+
+    def add_chunk_locations(self, locations_by_id: Dict[str, List[Dict]]) -> None:
+        """
+        把重复出现的位置合并到已存储chunk的 metadata["locations"]
+        """
+        chunks = self._fetch_chunks(list(locations_by_id))
+        updates = {}
+        for chunk_id, chunk in chunks.items():
+            locations = chunk.metadata.get(LOCATIONS_KEY, [])
+            locations.extend(location for location in locations_by_id[chunk_id] if location not in locations)
+            chunk.metadata[LOCATIONS_KEY] = locations
+            updates[chunk_id] = chunk.metadata
+        self.chunk_store.update_metadata(updates)
+
+    def remove_chunk_locations(self, chunk_ids: List[str], sources: Iterable[str]) -> None:
+        """
+        从共享chunk的位置列表中去掉指定源文件（文件被修改/删除而该内容仍被其他文件引用时）
+        metadata中的 source 改为剩余的第一个位置
+        """
+        sources = {os.path.abspath(source) for source in sources}
+        updates = {}
+        for chunk_id, chunk in self._fetch_chunks(chunk_ids).items():
+            locations = [
+                location for location in chunk.metadata.get(LOCATIONS_KEY, [])
+                if os.path.abspath(str(location.get("source"))) not in sources
+            ]
+            if not locations:
+                continue
+            chunk.metadata[LOCATIONS_KEY] = locations
+            chunk.metadata["source"] = locations[0]["source"]
+            updates[chunk_id] = chunk.metadata
+        self.chunk_store.update_metadata(updates)
+
+    def rename_chunks(self, renamed: Dict[str, Chunk]) -> None:
+        """
+        把 旧chunk_id -> 新chunk 的映射应用到chunk存储、关键词索引和向量索引（向量不重新计算）
+        """
+        old_ids = list(renamed)
+        sparse_index = self._maintained_sparse_index()
+        self.chunk_store.delete_many(old_ids)
+        self.chunk_store.put_many(renamed.values())
+        if sparse_index is not None:
+            sparse_index.delete_many(old_ids)
+            sparse_index.add_many(renamed.values())
+        self._rename_vectors(renamed)
+
+    @abstractmethod
+    def _rename_vectors(self, renamed: Dict[str, Chunk]) -> None:
+        """
+        在向量索引中把 旧chunk_id 改为新chunk的id
+        """
+        pass
+
+    def has_chunk(self, chunk_id: str) -> bool:
+        return chunk_id in self.chunk_store
+
+    def _fetch_chunks(self, chunk_ids: List[str]) -> Dict[str, Chunk]:
+        """
+        只读取检索命中的chunks
+        """
+        return self.chunk_store.get_many(chunk_ids)
+
+    def sparse_search(self, query: str, k: int = 4) -> List[SearchResult]:
+        """
+        BM25关键词检索，score 为BM25得分（越大越相关）
+        """
+        self._ensure_sparse_index()
+        hits = self.sparse_index.search(query, k=k)
+        chunks = self._fetch_chunks([chunk_id for chunk_id, _ in hits])
+        return [
+            SearchResult(chunk=chunks[chunk_id], score=score, rank=rank)
+            for rank, (chunk_id, score) in enumerate(hits, 1)
+            if chunk_id in chunks
+        ]
+
+    def _ensure_sparse_index(self) -> None:
+        """
+        旧版本构建的、或写入时未维护（keyword_index=False）的知识库没有关键词索引，首次关键词检索时从chunk存储补建
+        """
+        if self._sparse_checked:
+            return
+        self._sparse_checked = True
+        self._sparse_invalidated = False
+        if len(self.sparse_index) == 0 and len(self.chunk_store) > 0:
+            self.logger.info("未找到关键词索引，从chunk存储重建...")
+            for batch in batched(self.chunk_store.iter_chunks(), self.batch_size):
+                self.sparse_index.add_many(batch)
+            self.sparse_index.commit()
+            self.logger.info(f"关键词索引重建完成: {len(self.sparse_index)} 个chunks")
+
+    def _save_chunk_store(self, path: str) -> None:
+        """
+        提交chunk存储和关键词索引的写入（写入向量时已同步写入SQLite）
+        """
+        try:
+            if os.path.dirname(os.path.abspath(self.chunk_store.path)) != os.path.abspath(path):
+                self.logger.warning(f"chunk存储位于 {self.chunk_store.path}，不会复制到 {path}")
+            self.chunk_store.commit()
+            if self._sparse_index is not None:
+                self._sparse_index.commit()
+            self.logger.info("chunk存储保存成功")
+        except Exception as e:
+            self.logger.error(f"保存chunk存储时出错：{e}")
+
+    def _load_chunk_store(self, path: str) -> None:
+        """
+        打开path下的chunk存储（旧版的 chunks_metadata.pkl 会被自动迁移）和关键词索引，chunk内容按需读取
+        """
+        if self._chunk_store is not None:
+            self._chunk_store.close()
+        if self._sparse_index is not None:
+            self._sparse_index.close()
+        self._chunk_store = ChunkStore.open(path)
+        # 不维护关键词索引且还没有索引文件时不创建，首次关键词检索时再打开
+        sparse_exists = os.path.exists(os.path.join(path, SparseIndex.FILENAME))
+        self._sparse_index = SparseIndex.open(path) if self.keyword_index or sparse_exists else None
+        self._sparse_checked = False
+        self._sparse_invalidated = False
+        # 不统计chunk数：COUNT(*) 要扫描整张表，加载耗时应与语料规模无关
+        self.logger.info(f"chunk存储已打开: {self._chunk_store.path}")
@@ -4,12 +4,15 @@ from config.settings import Settings
 from core.document_loader import DocumentLoader
 from core.text_processor import  TextProcessor
 from core.vector_store import VectorStoreManager
-from core.qa_engine import QAEngine
+from core.qa_engine import QAEngine, AnswerStream
+from core.manifest import SourceManifest
+from core.chunk_dedup import ChunkDeduplicator
+from core.chunk_ids import ID_SCHEME_VERSION, migrate_chunk_ids
+from core.answer_cache import SemanticAnswerCache
+from core.reranker import CrossEncoderReranker
 from core.qa_engine  import *
 from utils.logger import get_logger,setup_logger
-from models.deepseek_models import DeepSeekLLM
-from models.huggingface_models import HuggingFaceEmbedding
-from utils.exceptions import RAGSystemError, ConfigurationError, SearchError
+from utils.exceptions import RAGSystemError, ConfigurationError, DocumentLoadError
 from typing import List, Optional
 
 class RAGSystem:
@@ -31,6 +34,8 @@ class RAGSystem:
         self.llm_model = None
         self.vector_store_manager = None
         self.qa_engine = None
+        self.answer_cache = None
+        self.reranker = None
 
         self.logger.info("RAG系统初始化完成")
 
@@ -59,27 +64,71 @@ class RAGSystem:
         初始化模型
         """
         # 初始化嵌入模型
+        # 模型实现依赖 torch/openai 等重型库，在这里才导入，保持启动和 --help 等路径轻量
         if self.settings.embedding_config.provider == "huggingface":
+            from models.huggingface_models import HuggingFaceEmbedding
             self.logger.info("正在加载HuggingFace嵌入模型（首次加载需要下载模型，请耐心等待）...")
             self.embedding_model = HuggingFaceEmbedding(self.settings.embedding_config)
+        elif self.settings.embedding_config.provider == "onnx":
+            try:
+                from models.onnx_models import OnnxEmbedding
+            except ImportError as e:
+                raise ConfigurationError(f"使用ONNX嵌入后端需要安装onnxruntime（pip install onnxruntime）：{e}")
+            self.logger.info("正在加载ONNX嵌入模型（首次使用需要导出模型，请耐心等待）...")
+            self.embedding_model = OnnxEmbedding(self.settings.embedding_config)
         else:
             raise ValueError(f"不支持的嵌入模型: {self.settings.embedding_config.provider}")
 
         #初始化LLM模型
         if self.settings.llm_config.provider == "deepseek":
+            from models.deepseek_models import DeepSeekLLM
             self.llm_model = DeepSeekLLM(self.settings.llm_config)
         else:
             raise ValueError(f"不支持的LLM模型: {self.settings.llm_config.provider}")
         self.logger.info("模型初始化完成")
 
-    def build_knowledge_base(self, force_rebuild: bool = False):
+    def _create_answer_cache(self) -> Optional[SemanticAnswerCache]:
+        """
+        创建问答语义缓存，配置关闭时返回 None
+        """
+        cache_config = self.settings.answer_cache_config
+        if not cache_config.enabled:
+            return None
+        return SemanticAnswerCache(
+            self.embedding_model,
+            similarity_threshold=cache_config.similarity_threshold,
+            max_entries=cache_config.max_entries,
+            ttl_seconds=cache_config.ttl_seconds
+        )
+
+    def build_knowledge_base(self, force_rebuild: bool = False, incremental: bool = False):
+        """
+        构建知识库
+        force_rebuild: 清空并全量重建
+        incremental: 加载已有向量库后，按源文件清单只同步新增/修改/删除的文件
+        """
         self.logger.info("开始构建知识库")
         self._initialize_models()  # 确保模型先初始化
+        # 知识库重建/同步后旧回答可能已过期：丢弃旧的答案缓存
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+        self.answer_cache = self._create_answer_cache()
 
+        persist_directory = self.settings.vector_store_config.persist_directory
         # 修复判断逻辑：如果存在且不强制重建，则加载；否则创建新的
-        if os.path.exists(self.settings.vector_store_config.persist_directory) and not force_rebuild:
-            self.logger.info("发现已存在的向量数据库，直接加载")
-            self._load_existing_knowledge_base()
+        if os.path.exists(persist_directory) and not force_rebuild:
+            manifest = SourceManifest.load(persist_directory, self.settings.docs_path) if incremental else None
+            if incremental and manifest is None:
+                # 旧版本向量库没有清单，无法判断哪些chunks属于哪个文件，只能全量重建一次
+                self.logger.info("向量数据库缺少源文件清单，执行一次全量重建")
+                self._create_new_knowledge_base()
+            else:
+                self.logger.info("发现已存在的向量数据库，直接加载")
+                self._load_existing_knowledge_base()
+                if manifest is not None:
+                    # 加载时可能迁移了chunk id，重新读取清单
+                    manifest = SourceManifest.load(persist_directory, self.settings.docs_path)
+                    self._sync_knowledge_base(manifest)
         else:
             # 原代码错误地打印了"发现已存在..."，这里修正日志
             self.logger.info("未发现向量数据库或需要强制重建，开始创建新知识库")
@@ -88,6 +137,14 @@ class RAGSystem:
         if not self.vector_store_manager or not self.qa_engine:
             raise RAGSystemError("知识库构建不完整，向量存储未初始化")
 
+    def _create_document_loader(self) -> DocumentLoader:
+        processing_config = self.settings.processing_config
+        return DocumentLoader(
+            self.settings.docs_path,
+            parallel=processing_config.parallel_loading,
+            max_workers=processing_config.load_workers
+        )
+
     def _load_existing_knowledge_base(self):
         self.vector_store_manager = VectorStoreManager(
             self.embedding_model,
@@ -97,35 +154,46 @@ class RAGSystem:
         self.vector_store = self.vector_store_manager.get_vector_store()
         # 加载向量数据
         self.vector_store.load(self.settings.vector_store_config.persist_directory)
-        # 新增验证
-        if not hasattr(self.vector_store, 'chroma_db') or self.vector_store.chroma_db is None:
-            raise SearchError("向量存储加载失败，chroma_db未初始化")
+        self._migrate_chunk_ids()
 
-        self.qa_engine = QAEngine(
-            self.llm_model,
-            self.vector_store,  # 使用已加载的向量存储实例
-            self.settings.retrieval_config
-        )
+        self.qa_engine = self._create_qa_engine(self.vector_store)  # 使用已加载的向量存储实例
+
+    def _migrate_chunk_ids(self):
+        """
+        旧版本的向量库按加载顺序编号文档（doc_{i}），一次性迁移到稳定的文档id和chunk id，
+        源文件清单中登记的chunk_id同步更新
+        """
+        chunk_store = self.vector_store.chunk_store
+        if chunk_store.id_scheme >= ID_SCHEME_VERSION:
+            return
+        persist_directory = self.settings.vector_store_config.persist_directory
+        self.logger.info("向量库使用旧的chunk id方案，开始迁移...")
+        mapping = migrate_chunk_ids(self.vector_store, self.settings.docs_path)
+        manifest = SourceManifest.load(persist_directory, self.settings.docs_path)
+        if manifest is not None and mapping:
+            manifest.rename_chunk_ids(mapping)
+            manifest.save(persist_directory)
+        chunk_store.id_scheme = ID_SCHEME_VERSION
+        self.vector_store.save(persist_directory)
 
     def _create_new_knowledge_base(self):
         """
         创建新的知识库
+        文档加载 -> 切分 -> 向量化 是一条生成器流水线，向量存储按批消费，内存占用与语料规模无关
         """
-        #1.加载文档
-        loader = DocumentLoader(self.settings.docs_path)
-        documents = loader.load_documents()
-        
-        # 检查是否成功加载文档
-        if not documents:
-            raise RAGSystemError(f"未能从路径 {self.settings.docs_path} 加载任何文档")
+        persist_directory = self.settings.vector_store_config.persist_directory
+        manifest = SourceManifest(self.settings.docs_path)
+        chunk_ids_by_file = {}
 
+        #1.加载文档
+        loader = self._create_document_loader()
+        # 先确认有可加载的源文件再清空旧库，避免文档路径配置错误时把已有知识库清掉
+        if not os.path.isdir(self.settings.docs_path):
+            raise DocumentLoadError(f"文档路径不存在: {self.settings.docs_path}")
+        if not loader.list_source_files():
+            raise DocumentLoadError(f"文档路径 {self.settings.docs_path} 中没有找到 .md 或 .mdx 文件，保留现有知识库")
         #2.处理文档
         processor = TextProcessor(self.settings.processing_config)
-        chunks = processor.process_documents(documents)
-        
-        # 检查是否有生成chunks
-        if not chunks:
-            raise RAGSystemError("文档处理后未生成任何文本块")
 
         #3.向量化(创建向量存储)
         self.vector_store_manager = VectorStoreManager(
@@ -133,15 +201,185 @@ class RAGSystem:
             self.settings.vector_store_config
         )
         vector_store = self.vector_store_manager.get_vector_store()
-        vector_store.add_chunks(chunks)
-        vector_store.save(self.settings.vector_store_config.persist_directory)
+        vector_store.reset()
+
+        stats = {"documents": 0, "chunks": 0}
+        documents = self._count_items(loader.iter_documents(), stats, "documents")
+        deduplicator = self._create_deduplicator()
+        chunks = self._chunk_pipeline(
+            manifest, processor.iter_chunks(documents), chunk_ids_by_file, stats, deduplicator
+        )
+        pool = self._create_embedding_pool()
+        if pool is None:
+            vector_store.add_chunks(chunks)
+        else:
+            # 构建期间由工作进程池流水线向量化，每批chunk足够分给所有进程（add_chunks 会按数据库单次写入上限截断）
+            batch_size = vector_store.batch_size
+            vector_store.embedding_model = pool
+            vector_store.batch_size = max(batch_size, pool.preferred_batch_size)
+            try:
+                vector_store.add_chunks(chunks)
+            finally:
+                vector_store.embedding_model = self.embedding_model
+                vector_store.batch_size = batch_size
+                pool.close()
+        if deduplicator is not None:
+            vector_store.add_chunk_locations(deduplicator.extra_locations)
+
+        # 检查是否成功加载文档
+        if not stats["documents"]:
+            raise RAGSystemError(f"未能从路径 {self.settings.docs_path} 加载任何文档")
+        # 检查是否有生成chunks
+        if not stats["chunks"]:
+            raise RAGSystemError("文档处理后未生成任何文本块")
+        self.logger.info(f"共处理 {stats['documents']} 个文档，生成 {stats['chunks']} 个chunks")
+
+        vector_store.chunk_store.id_scheme = ID_SCHEME_VERSION
+        vector_store.save(persist_directory)
+        self.vector_store = vector_store
+
+        # 记录源文件清单，供后续增量同步使用
+        failed = {manifest.relpath(file_path) for file_path, _ in loader.failed_files}
+        for file_path in loader.list_source_files():
+            rel_path = manifest.relpath(file_path)
+            if rel_path not in failed:  # 加载失败的文件不登记，下次同步时重试
+                manifest.record(rel_path, chunk_ids_by_file.get(rel_path, []))
+        manifest.save(persist_directory)
 
         #4.创建QA引擎
-        self.qa_engine = QAEngine(
+        self.qa_engine = self._create_qa_engine(vector_store)
+
+    def _create_embedding_pool(self):
+        """
+        创建多进程嵌入工作池，未配置多个进程时返回 None
+        """
+        config = self.settings.embedding_config
+        if config.worker_processes <= 1:
+            return None
+        from models.embedding_pool import EmbeddingWorkerPool
+        return EmbeddingWorkerPool(
+            self.embedding_model,
+            config,
+            processes=config.worker_processes,
+            threads=config.worker_threads,
+            shard_size=config.worker_shard_size
+        )
+
+    def _create_qa_engine(self, vector_store) -> QAEngine:
+        return QAEngine(
             self.llm_model,
             vector_store,
-            self.settings.retrieval_config
+            self.settings.retrieval_config,
+            answer_cache=self.answer_cache,
+            max_concurrency=self.settings.llm_config.max_concurrency,
+            reranker=self._create_reranker()
+        )
+
+    def _create_reranker(self) -> Optional[CrossEncoderReranker]:
+        """
+        创建交叉编码器重排序器，配置关闭时返回 None（模型在首次重排序时加载）
+        """
+        if not self.settings.reranker_config.enabled:
+            return None
+        if self.reranker is None:
+            self.reranker = CrossEncoderReranker(self.settings.reranker_config)
+        return self.reranker
+
+    def _sync_knowledge_base(self, manifest: SourceManifest):
+        """
+        增量同步：只重新切分/向量化新增和修改的文件，删除已删除文件的chunks
+        """
+        persist_directory = self.settings.vector_store_config.persist_directory
+        loader = self._create_document_loader()
+        diff = manifest.diff(loader.list_source_files())
+        self.logger.info(
+            f"增量同步: 新增{len(diff.added)}个, 修改{len(diff.changed)}个, "
+            f"删除{len(diff.removed)}个, 仅时间戳变化{len(diff.touched)}个"
+        )
+
+        for rel_path in diff.touched:
+            manifest.record(rel_path)
+        if not diff.has_changes:
+            if diff.touched:
+                manifest.save(persist_directory)
+            self.logger.info("知识库已是最新，无需同步")
+            return
+
+        #1.删除已修改/已删除文件的旧chunks；去重后的chunk仍被其他文件引用时只去掉这些文件的位置
+        stale_files = diff.changed + diff.removed
+        stale_chunk_ids = set(manifest.chunk_ids_of(stale_files))
+        still_used = stale_chunk_ids.intersection(
+            manifest.chunk_ids_of(set(manifest.files) - set(stale_files))
         )
+        self.vector_store.delete_chunks(sorted(stale_chunk_ids - still_used))
+        if still_used:
+            self.vector_store.remove_chunk_locations(
+                sorted(still_used), [manifest.abspath(rel_path) for rel_path in stale_files]
+            )
+        for rel_path in diff.removed:
+            manifest.remove(rel_path)
+
+        #2.重新加载、切分并向量化新增/修改的文件
+        updated = diff.added + diff.changed
+        chunk_ids_by_file = {}
+        stats = {"chunks": 0}
+        if updated:
+            documents = loader.iter_files([manifest.abspath(rel_path) for rel_path in updated])
+            processor = TextProcessor(self.settings.processing_config)
+            # 内容已在向量库中（来自其他文件）的chunk只补充位置，不重新向量化
+            deduplicator = self._create_deduplicator(exists=self.vector_store.has_chunk)
+            self.vector_store.add_chunks(
+                self._chunk_pipeline(manifest, processor.iter_chunks(documents), chunk_ids_by_file, stats, deduplicator)
+            )
+            if deduplicator is not None:
+                self.vector_store.add_chunk_locations(deduplicator.extra_locations)
+
+        failed = {manifest.relpath(file_path) for file_path, _ in loader.failed_files}
+        for rel_path in updated:
+            if rel_path not in failed:  # 加载失败的文件不登记，下次同步时重试
+                manifest.record(rel_path, chunk_ids_by_file.get(rel_path, []))
+
+        self.vector_store.save(persist_directory)
+        manifest.save(persist_directory)
+        self.logger.info(f"增量同步完成，重新向量化{stats['chunks']}个chunks")
+
+    @staticmethod
+    def _count_items(items, stats: dict, key: str):
+        """
+        透传生成器中的元素并计数
+        """
+        for item in items:
+            stats[key] += 1
+            yield item
+
+    def _create_deduplicator(self, exists=None) -> Optional[ChunkDeduplicator]:
+        if not self.settings.processing_config.deduplicate_chunks:
+            return None
+        return ChunkDeduplicator(exists=exists)
+
+    def _chunk_pipeline(self, manifest: SourceManifest, chunks, chunk_ids_by_file: dict, stats: dict,
+                        deduplicator: Optional[ChunkDeduplicator]):
+        """
+        切分后的chunk流水线：(去重时换成内容id) -> 按来源文件登记chunk_id -> (去重时丢弃重复内容)
+        重复的chunk也要登记到各自的源文件，增量同步时才能正确判断内容是否仍被引用
+        """
+        if deduplicator is None:
+            return self._track_chunk_sources(manifest, chunks, chunk_ids_by_file, stats)
+        chunks = self._track_chunk_sources(manifest, deduplicator.assign_ids(chunks), chunk_ids_by_file, stats)
+        return deduplicator.drop_duplicates(chunks)
+
+    @staticmethod
+    def _track_chunk_sources(manifest: SourceManifest, chunks, chunk_ids_by_file: dict, stats: dict):
+        """
+        透传chunks，同时按来源文件（metadata中的source）记录chunk_id，供源文件清单使用
+        """
+        for chunk in chunks:
+            stats["chunks"] += 1
+            source = chunk.metadata.get("source")
+            if source:
+                chunk_ids_by_file.setdefault(manifest.relpath(source), []).append(chunk.chunk_id)
+            yield chunk
+
     def answer_question(self,question:str)-> str:
         """
         回答问题
@@ -150,6 +388,14 @@ class RAGSystem:
             raise RAGSystemError("知识库未构建，请先调用 build_knowledge_base()")
         return self.qa_engine.answer_question(question)
 
+    def stream_answer(self, question: str) -> AnswerStream:
+        """
+        流式回答问题：迭代返回值得到回答片段，迭代结束后 .result 为完整结果
+        """
+        if not self.qa_engine:
+            raise RAGSystemError("知识库未构建，请先调用 build_knowledge_base()")
+        return self.qa_engine.stream_answer(question)
+
     def interactive_mode(self):
         """交互式问答模式"""
         print("\n" + "=" * 60)
@@ -186,13 +432,18 @@ class RAGSystem:
                     continue
 
                 print(f"\n🤔 正在思考问题: {question}")
-                result = self.answer_question(question)
+                stream = self.stream_answer(question)
 
                 print(f"\n🤖 回答:")
-                print(result.answer)
+                for token in stream:
+                    print(token, end="", flush=True)
+                print()
+                result = stream.result
 
                 print(f"\n📊 检索信息:")
                 print(f"处理时间: {result.processing_time:.2f}秒")
+                if stream.time_to_first_token is not None:
+                    print(f"首字延迟: {stream.time_to_first_token:.2f}秒")
                 print(f"参考文档数量: {len(result.source_chunk)}")
 
                 if result.source_chunk:
@@ -219,7 +470,7 @@ def main():
 
         # 构建知识库
         print("正在初始化RAG系统...")
-        rag_system.build_knowledge_base(force_rebuild=True)
+        rag_system.build_knowledge_base(incremental=True)
 
         # 启动交互模式
         rag_system.interactive_mode()
@@ -1,7 +1,22 @@
+import importlib
 from .base import BaseEmbedding,BaseLLM,BaseVectorStore
-from .huggingface_models import HuggingFaceEmbedding  # 新增 HuggingFace 嵌入模型
 
-from .deepseek_models import  DeepSeekLLM
+# 具体模型依赖 torch/transformers/openai 等重型库，首次访问时才导入（PEP 562），
+# 只用到基类或配置的代码不需要承担这些导入开销
+_LAZY_IMPORTS = {
+    "HuggingFaceEmbedding": ".huggingface_models",  # 新增 HuggingFace 嵌入模型
+    "DeepSeekLLM": ".deepseek_models",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # 之后的访问不再经过 __getattr__
+    return value
+
 
 __all__ = [
     'BaseEmbedding', 'BaseLLM', 'BaseVectorStore',
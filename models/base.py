@@ -1,5 +1,6 @@
+import asyncio
 from abc import ABC,abstractmethod
-from typing import List,Dict,Any, Optional, Tuple
+from typing import List,Dict,Any, Iterable, Iterator, Optional, Tuple
 from config.models import Document, Chunk, SearchResult
 
 class BaseDocument(ABC):
@@ -38,6 +39,26 @@ class BaseLLM(ABC):
         基于上下文回答
         """
         pass
+
+    async def agenerate_with_context(self, question: str, context: str, **kwargs) -> str:
+        """
+        基于上下文异步回答
+        默认实现把同步调用放到线程池中执行，有原生异步客户端的子类应重写
+        """
+        return await asyncio.to_thread(self.generate_with_context, question, context, **kwargs)
+
+    async def aclose(self) -> None:
+        """
+        释放当前事件循环中的异步资源（如异步HTTP连接池），事件循环结束前调用；默认没有需要释放的资源
+        """
+        pass
+
+    def generate_with_context_stream(self, question: str, context: str, **kwargs) -> Iterator[str]:
+        """
+        基于上下文流式回答，逐个产出文本片段
+        默认实现一次性产出完整回答，支持流式的子类应重写
+        """
+        yield self.generate_with_context(question, context, **kwargs)
     """
     比如你之前可能写了 def generate(self, prompt: str, **kwargs) -> str，虽然加了 **kwargs，但父类要求的 context 参数没「显式出现」，ABC 就不认。
     """
@@ -64,6 +85,27 @@ class BaseEmbedding(ABC):
         """
         pass
 
+    @property
+    def cache_key(self) -> str:
+        """
+        嵌入缓存中区分模型的键；同一模型的不同推理后端（如量化）向量不完全相同时，子类应加以区分
+        """
+        return self.config.model_name
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量嵌入查询，默认逐个调用 embed_query，能一次前向计算的子类应重写
+        """
+        return [self.embed_query(text) for text in texts]
+
+    def embed_batches(self, batches: Iterable[List[str]]) -> Iterator[List[List[float]]]:
+        """
+        逐批嵌入文档，按输入顺序产出每批的向量；默认逐批调用 embed_documents，
+        能在后台计算下一批的子类（如多进程工作池）应重写，使调用方处理当前批时计算不停顿
+        """
+        for texts in batches:
+            yield self.embed_documents(texts)
+
         # 保持向后兼容的方法
     def embed_text(self, text: str) -> List[float]:
         """将单个文本转换为向量 - 向后兼容方法"""
@@ -73,6 +115,68 @@ class BaseEmbedding(ABC):
         """批量转换文本为向量 - 向后兼容方法"""
         return self.embed_documents(texts)
 
+class CachedQueryEmbedding(BaseEmbedding):
+    """
+    带查询向量LRU缓存的嵌入模型基类：重复/仅空白不同的问题直接复用向量，未命中的查询合并成一次前向计算
+    子类在 __init__ 中设置 self.query_cache（LRUCache）和 self.logger，并实现 _encode_queries / _empty_embedding
+    """
+
+    @abstractmethod
+    def _encode_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        一次前向计算编码一批（已规范化、非空的）查询文本
+        """
+        pass
+
+    @abstractmethod
+    def _empty_embedding(self) -> List[float]:
+        """
+        空文本或编码失败时返回的零向量
+        """
+        pass
+
+    @staticmethod
+    def normalize_query(text: str) -> str:
+        """
+        规范化查询文本：去掉首尾空白并合并连续空白，作为查询缓存的键
+        """
+        return " ".join(text.split())
+
+    def embed_query(self, text: str) -> List[float]:
+        if not text or not text.strip():
+            self.logger.warning("输入文本为空，返回零向量")
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量将查询文本转换为向量：未命中查询缓存的文本合并成一次前向计算
+        """
+        keys = [self.normalize_query(text) if text and text.strip() else None for text in texts]
+        embeddings: Dict[str, List[float]] = {}
+        missing = []
+        for key in dict.fromkeys(key for key in keys if key is not None):
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                embeddings[key] = list(cached)
+            else:
+                missing.append(key)
+
+        if missing:
+            try:
+                for key, embedding in zip(missing, self._encode_queries(missing)):
+                    self.query_cache.put(key, tuple(embedding))
+                    embeddings[key] = embedding
+            except Exception as e:
+                self.logger.error(f"查询嵌入失败: {e}")
+
+        return [embeddings[key] if key in embeddings else self._empty_embedding() for key in keys]
+
+    def query_cache_stats(self) -> Dict[str, float]:
+        """
+        查询向量缓存的命中统计
+        """
+        return self.query_cache.stats()
+
 @abstractmethod
 class BaseVectorStore(ABC):
     """
@@ -80,9 +184,23 @@ class BaseVectorStore(ABC):
     """
 
     @abstractmethod
-    def add_chunks(self, chunks: List[Chunk]) -> None:
+    def add_chunks(self, chunks: Iterable[Chunk]) -> None:
+        """
+        添加文档块到向量存储（chunks 可以是生成器，实现应分批消费）
+        """
+        pass
+
+    @abstractmethod
+    def delete_chunks(self, chunk_ids: List[str]) -> None:
         """
-        添加文档块到向量存储
+        按chunk_id删除文档块（增量同步时删除已修改/已删除文件的旧chunks）
+        """
+        pass
+
+    @abstractmethod
+    def reset(self) -> None:
+        """
+        清空向量存储（强制重建前调用，避免新旧数据混在一起）
         """
         pass
 
@@ -93,6 +211,21 @@ class BaseVectorStore(ABC):
         """
         pass
 
+    def sparse_search(self, query: str, k: int = 4) -> List[SearchResult]:
+        """
+        关键词（BM25）检索，不支持的实现抛出 NotImplementedError
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} 不支持关键词检索")
+
+    def search_batch(self, queries: List[str], k: int = 4,
+                     with_embeddings: bool = False) -> List[List[SearchResult]]:
+        """
+        批量搜索，返回与 queries 一一对应的结果列表，score 为相似度（越大越相关）
+        with_embeddings 时实现应在 chunk.embedding 中带回候选向量（MMR使用）
+        默认逐个调用 search，支持批量嵌入和批量近邻搜索的子类应重写
+        """
+        return [self.search(query, k=k) for query in queries]
+
     @abstractmethod
     def save(self, path: str) -> None:
         """
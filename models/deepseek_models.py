@@ -1,39 +1,139 @@
+import asyncio
+import threading
 import time
-from typing import List, Dict, Any
-from openai import OpenAI
+import weakref
+from typing import List, Dict, Any, Iterator, Optional
 from config.settings import ModelConfig
 from models.base import BaseEmbedding, BaseLLM
+from models.http_transport import (
+    CircuitBreaker, RetryPolicy, acall_with_retry, build_async_http_client, build_http_client, call_with_retry
+)
+from utils.exceptions import LLMError
+from utils.logger import get_logger
 
 class DeepSeekLLM(BaseLLM):
     """
     DeepSeek LLM 实现（使用 OpenAI Python SDK 指向 DeepSeek endpoint）
+    HTTP层使用带连接池/超时的httpx客户端，失败时按 RetryPolicy 重试并经过熔断器，最终失败抛出 LLMError
     """
+    DEFAULT_API_BASE = "https://api.deepseek.com"
+
     def __init__(self, config: ModelConfig):
+        from openai import AsyncOpenAI, OpenAI  # 创建客户端时才导入openai SDK
         self.config = config
+        self.logger = get_logger(__name__)
         # 推荐 base_url 不带 /v1；/v1 也可用，但通常使用 https://api.deepseek.com
+        # 配置 api_base 可以指向本地的 OpenAI 兼容服务（例如测试用的假服务）
+        base_url = config.api_base or self.DEFAULT_API_BASE
+        # 重试由 RetryPolicy 统一处理，关闭SDK自带的重试
         self.client = OpenAI(
             api_key=config.api_key,
-            base_url="https://api.deepseek.com"
+            base_url=base_url,
+            max_retries=0,
+            http_client=build_http_client(config)
+        )
+        # 异步客户端供 QAEngine 的并发批量问答使用，按事件循环分别创建（见 async_client）
+        self._async_client_class = AsyncOpenAI
+        self._base_url = base_url
+        self._async_clients = weakref.WeakKeyDictionary()  # 事件循环 -> AsyncOpenAI
+        self._async_lock = threading.Lock()
+        self.retry_policy = RetryPolicy(
+            max_retries=config.max_retries,
+            backoff_base=config.retry_backoff_base,
+            backoff_max=config.retry_backoff_max
+        )
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=config.circuit_failure_threshold,
+            reset_timeout=config.circuit_reset_timeout
         )
 
-    def _chat_completion(self, messages: list, model: str = "deepseek-chat", **kwargs) -> str:
+    @property
+    def async_client(self):
         """
-        发送 chat completion 请求并返回文本内容（封装了请求与常见错误处理）
+        当前事件循环的异步客户端
+        httpx异步连接池中的keep-alive连接绑定在创建它们的事件循环上，每次 asyncio.run 都是新的循环，不能复用旧循环的连接
         """
-        try:
-            resp = self.client.chat.completions.create(
-                model=model,
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._async_client_class(
+                    api_key=self.config.api_key,
+                    base_url=self._base_url,
+                    max_retries=0,
+                    http_client=build_async_http_client(self.config)
+                )
+                self._async_clients[loop] = client
+        return client
+
+    async def aclose(self) -> None:
+        """
+        关闭当前事件循环的异步客户端，释放其中的连接（事件循环结束前调用）
+        """
+        with self._async_lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def _chat_completion(self, messages: list, model: Optional[str] = None, **kwargs) -> str:
+        """
+        发送 chat completion 请求并返回文本内容（封装了连接池、超时、重试与熔断）
+        """
+        resp = call_with_retry(
+            lambda: self.client.chat.completions.create(
+                model=model or self.config.model_name,
+                messages=messages,
+                **kwargs
+            ),
+            self.retry_policy,
+            self.circuit_breaker
+        )
+        # DeepSeek/OpenAI-style 响应通常在 choices[0].message.content
+        return resp.choices[0].message.content
+
+    async def _achat_completion(self, messages: list, model: Optional[str] = None, **kwargs) -> str:
+        """
+        异步发送 chat completion 请求（等待网络时不阻塞事件循环）
+        """
+        resp = await acall_with_retry(
+            lambda: self.async_client.chat.completions.create(
+                model=model or self.config.model_name,
                 messages=messages,
                 **kwargs
-            )
-            # DeepSeek/OpenAI-style 响应通常在 choices[0].message.content
-            return resp.choices[0].message.content
+            ),
+            self.retry_policy,
+            self.circuit_breaker
+        )
+        return resp.choices[0].message.content
+
+    def _chat_completion_stream(self, messages: list, model: Optional[str] = None, **kwargs) -> Iterator[str]:
+        """
+        以流式方式发送 chat completion 请求，逐个产出增量文本
+        只有建立流（收到首个响应）之前的失败会重试，输出开始后的中断直接抛出 LLMError
+        """
+        stream = call_with_retry(
+            lambda: self.client.chat.completions.create(
+                model=model or self.config.model_name,
+                messages=messages,
+                stream=True,
+                **kwargs
+            ),
+            self.retry_policy,
+            self.circuit_breaker
+        )
+        try:
+            for chunk in stream:
+                # 流式响应的增量内容在 choices[0].delta.content，首尾的事件可能没有内容
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
         except Exception as e:
-            # 打印完整返回便于调试（可以在调试时打开）
-            print("DeepSeek 请求异常：", e)
-            # 若希望打印原始响应结构以便定位问题，可取消下面注释（慎用生产）
-            # import traceback; traceback.print_exc()
-            return "抱歉，生成回答时出现错误。"
+            self.circuit_breaker.record_failure()
+            raise LLMError(f"流式生成中断: {e}") from e
+        finally:
+            stream.close()
 
     def generate(self, prompt: str, **kwargs) -> str:
         """
@@ -49,12 +149,27 @@ class DeepSeekLLM(BaseLLM):
         """
         基于上下文生成回答
         """
+        return self._chat_completion(self._context_messages(question, context), **kwargs)
+
+    async def agenerate_with_context(self, question: str, context: str, **kwargs) -> str:
+        """
+        基于上下文异步生成回答
+        """
+        return await self._achat_completion(self._context_messages(question, context), **kwargs)
+
+    def generate_with_context_stream(self, question: str, context: str, **kwargs) -> Iterator[str]:
+        """
+        基于上下文流式生成回答
+        """
+        return self._chat_completion_stream(self._context_messages(question, context), **kwargs)
+
+    @staticmethod
+    def _context_messages(question: str, context: str) -> list:
         prompt = (
             "基于以下上下文信息回答用户问题。如果文档中没有相关信息，请明确说明。\n\n"
             f"上下文信息:\n{context}\n\n用户问题:\n{question}"
         )
-        messages = [
+        return [
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": prompt}
         ]
-        return self._chat_completion(messages, **kwargs)
@@ -0,0 +1,147 @@
+import math
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import replace
+from typing import Iterable, Iterator, List, Optional
+from config.settings import EmbeddingConfig
+from models.base import BaseEmbedding
+from utils.exceptions import ConfigurationError
+from utils.logger import get_logger
+
+# 工作进程内的嵌入模型，由 _init_worker 加载一次，之后每个分片复用
+_worker_model: Optional[BaseEmbedding] = None
+
+
+def _load_embedding_model(config: EmbeddingConfig) -> BaseEmbedding:
+    if config.provider == "huggingface":
+        from models.huggingface_models import HuggingFaceEmbedding
+        return HuggingFaceEmbedding(config)
+    if config.provider == "onnx":
+        from models.onnx_models import OnnxEmbedding
+        return OnnxEmbedding(config)
+    raise ConfigurationError(f"嵌入工作进程不支持的嵌入模型: {config.provider}")
+
+
+def _init_worker(config: EmbeddingConfig, threads: int) -> None:
+    """
+    工作进程初始化：限制算子内线程数后加载模型
+    """
+    global _worker_model
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_model = _load_embedding_model(replace(config, intra_op_threads=threads))
+
+
+def _embed_shard(texts: List[str]) -> List[List[float]]:
+    return _worker_model.embed_documents(texts)
+
+
+class EmbeddingWorkerPool(BaseEmbedding):
+    """
+    多进程嵌入：processes 个工作进程，每个进程用 threads 个线程做算子内并行，模型在每个进程中只加载一次
+    embed_documents 把文本切成分片分发给各进程，按输入顺序收回向量；查询嵌入仍由本进程的模型完成
+    embed_batches 在产出当前批向量前已提交后续批次，调用方写入向量库期间工作进程继续计算
+    工作进程用 spawn 方式启动，避免在已加载PyTorch的进程中 fork
+    """
+
+    def __init__(self, embedding_model: BaseEmbedding, config: EmbeddingConfig, processes: int,
+                 threads: int = 1, shard_size: int = 64):
+        self.embedding_model = embedding_model
+        self.config = config
+        self.processes = processes
+        self.threads = threads
+        self.shard_size = shard_size
+        self.logger = get_logger(__name__)
+        self.logger.info(f"启动嵌入工作进程池: {processes} 个进程 × {threads} 个线程")
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(config, threads)
+        )
+
+    @property
+    def client(self):
+        return getattr(self.embedding_model, "client", None)
+
+    @property
+    def cache_key(self) -> str:
+        return self.embedding_model.cache_key
+
+    @property
+    def preferred_batch_size(self) -> int:
+        """
+        每次调用 embed_documents 至少应传入的文本数：每个进程两个分片，分片之间不等待
+        """
+        return self.processes * self.shard_size * 2
+
+    def _submit(self, texts: List[str]) -> List[Future]:
+        """
+        把一批文本切成分片提交给工作进程，返回按顺序排列的分片future
+        """
+        if not texts:
+            return []
+        # 文本不足以填满所有进程时缩小分片，保证每个进程都有活干
+        shard_size = max(1, min(self.shard_size, math.ceil(len(texts) / self.processes)))
+        return [
+            self._executor.submit(_embed_shard, texts[start:start + shard_size])
+            for start in range(0, len(texts), shard_size)
+        ]
+
+    @staticmethod
+    def _collect(futures: List[Future]) -> List[List[float]]:
+        vectors = []
+        for future in futures:
+            vectors.extend(future.result())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._collect(self._submit(texts))
+
+    def embed_batches(self, batches: Iterable[List[str]], prefetch: int = 1) -> Iterator[List[List[float]]]:
+        """
+        流水线嵌入：等待第 i 批结果之前已提交第 i+1..i+prefetch 批的分片，按输入顺序产出每批的向量
+        """
+        batches = iter(batches)
+        in_flight = deque()
+
+        def submit_next() -> None:
+            texts = next(batches, None)
+            if texts is not None:
+                in_flight.append(self._submit(texts))
+
+        try:
+            for _ in range(prefetch):
+                submit_next()
+            while True:
+                submit_next()
+                if not in_flight:
+                    return
+                yield self._collect(in_flight.popleft())
+        finally:
+            # 调用方提前结束（如写入出错）时取消尚未开始的分片
+            for futures in in_flight:
+                for future in futures:
+                    future.cancel()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embedding_model.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.embedding_model.embed_queries(texts)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "EmbeddingWorkerPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,207 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+import httpx
+from config.settings import ModelConfig
+from utils.exceptions import CircuitOpenError, LLMError
+from utils.logger import get_logger
+
+T = TypeVar("T")
+
+logger = get_logger(__name__)
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败达到阈值后打开，在 reset_timeout 内直接拒绝请求；
+    超时后进入半开状态只放行一个试探请求（其余请求在试探结束前仍被拒绝），成功则关闭，失败则重新打开
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False  # 半开状态下是否已有试探请求在进行
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        请求前检查，熔断中（包括半开状态下已有试探请求时）抛出 CircuitOpenError
+        """
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("LLM服务熔断中，暂时拒绝请求")
+                self.state = self.HALF_OPEN
+            elif self.state == self.HALF_OPEN and self._trial_in_flight:
+                raise CircuitOpenError("LLM服务熔断恢复试探中，暂时拒绝请求")
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"LLM连续失败 {self._failures} 次，熔断 {self.reset_timeout} 秒")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """
+        请求结束但结果不反映服务是否健康（不可重试的错误、调用被取消），只释放半开状态的试探名额
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class RetryPolicy:
+    """
+    重试策略：对 429 / 5xx / 超时 / 连接错误做指数退避重试（带随机抖动）
+    """
+    def __init__(self, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        import openai  # 走到这里时客户端已创建，openai早已导入
+        if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return False
+
+    def delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """
+        第 attempt 次重试前的等待时间；429 响应带 Retry-After 时优先使用
+        """
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(cap / 2, cap)
+
+
+def call_with_retry(func: Callable[[], T], policy: RetryPolicy, breaker: CircuitBreaker) -> T:
+    """
+    同步调用 func，按重试策略重试，并把结果反馈给熔断器
+    """
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = func()
+            breaker.record_success()
+            return result
+        except Exception as e:
+            if not policy.is_retryable(e):
+                breaker.release()
+                raise LLMError(f"LLM请求失败: {e}") from e
+            breaker.record_failure()
+            if attempt >= policy.max_retries:
+                raise LLMError(f"LLM请求重试 {policy.max_retries} 次后仍失败: {e}") from e
+            wait = policy.delay(attempt, e)
+            logger.warning(f"LLM请求失败（{type(e).__name__}），{wait:.2f} 秒后第 {attempt + 1} 次重试")
+            time.sleep(wait)
+            attempt += 1
+        except BaseException:
+            # 调用被取消/中断：不计入失败，但要释放半开状态的试探名额
+            breaker.release()
+            raise
+
+
+def is_event_loop_error(error: BaseException) -> bool:
+    """
+    异步客户端的连接属于已关闭或其它事件循环时的错误（SDK包装成连接错误），这是调用方的用法问题，不反映服务是否健康
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, RuntimeError) and (
+            "Event loop is closed" in str(error) or "different loop" in str(error) or "different event loop" in str(error)
+        ):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+async def acall_with_retry(func: Callable[[], Awaitable[T]], policy: RetryPolicy, breaker: CircuitBreaker) -> T:
+    """
+    call_with_retry 的异步版本，func 每次调用返回一个新的协程
+    """
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await func()
+            breaker.record_success()
+            return result
+        except Exception as e:
+            if is_event_loop_error(e):
+                breaker.release()
+                raise LLMError(f"LLM异步客户端与当前事件循环不匹配: {e}") from e
+            if not policy.is_retryable(e):
+                breaker.release()
+                raise LLMError(f"LLM请求失败: {e}") from e
+            breaker.record_failure()
+            if attempt >= policy.max_retries:
+                raise LLMError(f"LLM请求重试 {policy.max_retries} 次后仍失败: {e}") from e
+            wait = policy.delay(attempt, e)
+            logger.warning(f"LLM请求失败（{type(e).__name__}），{wait:.2f} 秒后第 {attempt + 1} 次重试")
+            await asyncio.sleep(wait)
+            attempt += 1
+        except BaseException:
+            # 调用被取消/中断：不计入失败，但要释放半开状态的试探名额
+            breaker.release()
+            raise
+
+
+def _limits(config: ModelConfig) -> httpx.Limits:
+    max_connections = config.max_connections or config.max_concurrency
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=config.keepalive_expiry
+    )
+
+
+def _timeout(config: ModelConfig) -> httpx.Timeout:
+    return httpx.Timeout(config.read_timeout, connect=config.connect_timeout)
+
+
+def build_http_client(config: ModelConfig) -> httpx.Client:
+    """
+    创建带连接池和超时设置的同步HTTP客户端
+    """
+    return httpx.Client(limits=_limits(config), timeout=_timeout(config))
+
+
+def build_async_http_client(config: ModelConfig) -> httpx.AsyncClient:
+    """
+    创建带连接池和超时设置的异步HTTP客户端
+    """
+    return httpx.AsyncClient(limits=_limits(config), timeout=_timeout(config))
@@ -1,18 +1,48 @@
-import torch
+import json
+import os
 from typing import List, Optional, Dict, Any
-from transformers import AutoTokenizer, AutoModel
-from langchain_huggingface import HuggingFaceEmbeddings
-from models.base import BaseEmbedding
+from models.base import CachedQueryEmbedding
 from config.settings import EmbeddingConfig
 from utils.logger import get_logger
-
-
-class HuggingFaceEmbedding(BaseEmbedding):
+from utils.batching import AdaptiveBatcher
+from utils.lru_cache import LRUCache
+
+
+def sentence_transformer_max_seq_length(model_name_or_path: str) -> Optional[int]:
+    """
+    sentence-transformers模型的最大序列长度（sentence_bert_config.json），
+    可能比分词器的 model_max_length 小，例如 all-MiniLM-L6-v2 为256；本地目录优先，读不到时返回 None
+    """
+    try:
+        if os.path.isdir(model_name_or_path):
+            config_path = os.path.join(model_name_or_path, "sentence_bert_config.json")
+        else:
+            from huggingface_hub import hf_hub_download
+            config_path = hf_hub_download(model_name_or_path, "sentence_bert_config.json")
+        with open(config_path, encoding="utf-8") as f:
+            return json.load(f).get("max_seq_length")
+    except Exception:
+        return None
+
+
+class HuggingFaceEmbedding(CachedQueryEmbedding):
     """Hugging Face嵌入模型实现"""
 
     def __init__(self, config: EmbeddingConfig):
         self.config = config
         self.logger = get_logger(__name__)
+        # 查询向量缓存：重复/仅空白不同的问题直接复用向量，跳过模型编码
+        self.query_cache = LRUCache(config.query_cache_size)
+        # 文档按token长度排序后按token预算分批，减少padding
+        self.batcher = AdaptiveBatcher(
+            token_budget=config.batch_token_budget,
+            max_batch_size=config.max_batch_size,
+            adaptive=config.adaptive_batching
+        )
+
+        # torch / sentence-transformers 导入耗时较长，创建模型时才导入
+        import torch
+        from langchain_huggingface import HuggingFaceEmbeddings
 
         # 检查是否有GPU可用
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -54,6 +84,40 @@ class HuggingFaceEmbedding(BaseEmbedding):
                 self.logger.error(f"后备模式也失败: {backup_error}")
                 raise backup_error
 
+    def _sentence_transformer(self):
+        """
+        HuggingFaceEmbeddings内部的SentenceTransformer对象，取不到时返回 None
+        """
+        return getattr(self.client, "_client", None)
+
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """
+        用模型的分词器计算每个文本的token数（按模型最大长度截断），分词器不可用时按字符数估算
+        """
+        model = self._sentence_transformer()
+        tokenizer = getattr(model, "tokenizer", None)
+        if tokenizer is None:
+            return [len(text) // 4 + 1 for text in texts]
+        encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=model.max_seq_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        把一批文本作为一个batch编码（batch由 AdaptiveBatcher 按长度划分）
+        """
+        model = self._sentence_transformer()
+        if model is None:
+            return self.client.embed_documents(texts)
+        # 与 HuggingFaceEmbeddings.embed_documents 的预处理一致，保证向量不变
+        texts = [text.replace("\n", " ") for text in texts]
+        return model.encode(
+            texts,
+            batch_size=len(texts),
+            normalize_embeddings=True,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        ).tolist()
+
     def embed_text(self, text: str) -> List[float]:
         """将单个文本转换为向量 - 兼容旧接口"""
         return self.embed_query(text)
@@ -62,19 +126,12 @@ class HuggingFaceEmbedding(BaseEmbedding):
         """批量转换文本为向量 - 兼容旧接口"""
         return self.embed_documents(texts)
 
-    def embed_query(self, text: str) -> List[float]:
-        """将单个查询文本转换为向量 - BaseEmbedding要求的方法"""
-        if not text or not text.strip():
-            self.logger.warning("输入文本为空，返回零向量")
-            return [0.0] * 384  # all-MiniLM-L6-v2的维度是384
+    def _encode_queries(self, texts: List[str]) -> List[List[float]]:
+        # 未配置查询专用指令，查询与文档使用相同的编码参数，批量编码结果与逐条 embed_query 一致
+        return self.client.embed_documents(texts)
 
-        try:
-            embedding = self.client.embed_query(text)
-            return embedding
-        except Exception as e:
-            self.logger.error(f"Hugging Face查询嵌入失败: {e}")
-            # 返回零向量作为后备
-            return [0.0] * 384
+    def _empty_embedding(self) -> List[float]:
+        return [0.0] * 384  # all-MiniLM-L6-v2的维度是384
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """批量转换文档为向量 - BaseEmbedding要求的方法"""
@@ -87,7 +144,7 @@ class HuggingFaceEmbedding(BaseEmbedding):
             return [[0.0] * 384] * len(texts)
 
         try:
-            embeddings = self.client.embed_documents(valid_texts)
+            embeddings = self.batcher.run(valid_texts, self._token_lengths(valid_texts), self._encode_batch)
 
             # 如果原始列表中有空文本，需要补充零向量
             if len(valid_texts) != len(texts):
@@ -0,0 +1,208 @@
+import json
+import os
+from typing import List, Optional
+import numpy as np
+import onnxruntime as ort
+from config.settings import EmbeddingConfig
+from models.base import CachedQueryEmbedding
+from models.huggingface_models import sentence_transformer_max_seq_length
+from utils.batching import AdaptiveBatcher
+from utils.exceptions import EmbeddingError
+from utils.logger import get_logger
+from utils.lru_cache import LRUCache
+
+# 导出/量化后做一致性检查用的样本（中英文、长短混合）
+PARITY_TEXTS = [
+    "如何使用embed_query方法嵌入单个查询文本？",
+    "什么是LangChain？",
+    "OpenAIEmbeddings creates embeddings with the OpenAI API.",
+    "Vector stores persist embeddings and support similarity search over documents. " * 8,
+    # 超过 max_seq_length（MiniLM为256）的长文本，检查两边在同一位置截断
+    "Text splitters break long documents into chunks that fit the embedding model window. " * 30,
+]
+
+
+def _mean_pooling(hidden_states: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """
+    按attention mask做平均池化并归一化（与sentence-transformers的mean pooling + normalize一致）
+    """
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (hidden_states * mask).sum(axis=1)
+    pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+    return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+
+class OnnxEmbedding(CachedQueryEmbedding):
+    """
+    ONNX Runtime嵌入模型实现（CPU推理）
+    首次使用时把同名的Hugging Face模型导出为ONNX（可选int8动态量化）保存到 onnx_path，
+    导出/量化后与PyTorch向量做一致性检查；之后只加载ONNX模型和分词器，不需要PyTorch
+    """
+    FP32_FILENAME = "model.onnx"
+    INT8_FILENAME = "model_int8.onnx"
+
+    def __init__(self, config: EmbeddingConfig):
+        self.config = config
+        self.logger = get_logger(__name__)
+        self.query_cache = LRUCache(config.query_cache_size)
+        self.batcher = AdaptiveBatcher(
+            token_budget=config.batch_token_budget,
+            max_batch_size=config.max_batch_size,
+            adaptive=config.adaptive_batching
+        )
+        # 向量存储（chroma）不需要langchain的embedding对象，所有向量都由本类显式计算
+        self.client = None
+        self.onnx_dir = config.onnx_path or os.path.join("cache", "onnx", config.model_name.replace("/", "__"))
+        # 与sentence-transformers在同一长度截断（导出时已把配置保存到 onnx_dir，离线也能读到）
+        self.max_seq_length = (
+            sentence_transformer_max_seq_length(self.onnx_dir)
+            or sentence_transformer_max_seq_length(config.model_name)
+        )
+
+        model_path = self._prepare_model()
+        from transformers import AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(self.onnx_dir)
+        self.session = self._create_session(model_path)
+        self.quantized = model_path.endswith(self.INT8_FILENAME)
+        self.dimension = len(self._encode(["dimension probe"])[0])
+        self.logger.info(
+            f"成功加载ONNX嵌入模型: {model_path}（{'int8' if self.quantized else 'fp32'}，维度 {self.dimension}）"
+        )
+
+    @property
+    def cache_key(self) -> str:
+        # 量化后的向量与PyTorch的不完全相同，嵌入缓存按后端区分
+        return f"{self.config.model_name}@onnx-{'int8' if self.quantized else 'fp32'}"
+
+    def _create_session(self, model_path: str) -> ort.InferenceSession:
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.config.intra_op_threads:
+            options.intra_op_num_threads = self.config.intra_op_threads
+        return ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+
+    def _prepare_model(self) -> str:
+        """
+        确保ONNX模型存在（必要时导出/量化并做一致性检查），返回要加载的模型路径
+        """
+        fp32_path = os.path.join(self.onnx_dir, self.FP32_FILENAME)
+        int8_path = os.path.join(self.onnx_dir, self.INT8_FILENAME)
+        created = []
+        if not os.path.exists(fp32_path):
+            self._export(fp32_path)
+            created.append(fp32_path)
+        if self.config.onnx_quantize and not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            self.logger.info(f"int8动态量化: {int8_path}")
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+            created.append(int8_path)
+
+        model_path = int8_path if self.config.onnx_quantize else fp32_path
+        if created and self.config.onnx_parity_threshold:
+            from transformers import AutoTokenizer
+            self.tokenizer = AutoTokenizer.from_pretrained(self.onnx_dir)
+            for path in created:
+                self.session = self._create_session(path)
+                similarity = self.check_parity()
+                if similarity >= self.config.onnx_parity_threshold:
+                    continue
+                message = f"ONNX模型 {path} 与PyTorch向量的最小余弦相似度 {similarity:.4f} 低于阈值 {self.config.onnx_parity_threshold}"
+                os.remove(path)
+                if path == int8_path:
+                    self.logger.error(f"{message}，改用fp32模型")
+                    model_path = fp32_path
+                else:
+                    raise EmbeddingError(message)
+        return model_path
+
+    def _export(self, fp32_path: str) -> None:
+        """
+        用 torch.onnx 导出Hugging Face模型（批大小和序列长度为动态维度），分词器保存在同一目录
+        """
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+        self.logger.info(f"导出ONNX模型: {self.config.model_name} -> {fp32_path}")
+        os.makedirs(self.onnx_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(self.config.model_name)
+        model = AutoModel.from_pretrained(self.config.model_name).eval()
+        sample = tokenizer(["示例文本 sample text"], return_tensors="pt")
+        input_names = list(sample.keys())
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (dict(sample),),  # 以关键字参数传入，避免位置参数顺序与forward不一致
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+        tokenizer.save_pretrained(self.onnx_dir)
+        if self.max_seq_length:
+            with open(os.path.join(self.onnx_dir, "sentence_bert_config.json"), "w", encoding="utf-8") as f:
+                json.dump({"max_seq_length": self.max_seq_length}, f)
+
+    def check_parity(self, texts: Optional[List[str]] = None) -> float:
+        """
+        与PyTorch（sentence-transformers）计算的向量比较，返回逐条余弦相似度的最小值
+        """
+        from sentence_transformers import SentenceTransformer
+        texts = texts or PARITY_TEXTS
+        reference = SentenceTransformer(self.config.model_name, device="cpu").encode(
+            texts, normalize_embeddings=True
+        )
+        vectors = np.asarray(self._encode(texts), dtype=np.float32)
+        similarity = float(np.min(np.sum(vectors * reference, axis=1)))
+        self.logger.info(f"ONNX与PyTorch向量一致性检查：最小余弦相似度 {similarity:.4f}")
+        return similarity
+
+    @property
+    def max_length(self) -> int:
+        """
+        推理时的截断长度：优先使用sentence-transformers的 max_seq_length，否则用分词器的上限
+        """
+        return min(self.max_seq_length or self.tokenizer.model_max_length, 512)
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """
+        按token长度排序、按token预算分批推理，返回按原顺序排列的归一化向量
+        """
+        encoded = self.tokenizer(texts, add_special_tokens=True, truncation=True, max_length=self.max_length)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        return self.batcher.run(texts, lengths, self._encode_batch)
+
+    def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        input_names = {node.name for node in self.session.get_inputs()}
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in input_names}
+        hidden_states = self.session.run(["last_hidden_state"], feeds)[0]
+        return _mean_pooling(hidden_states, encoded["attention_mask"]).tolist()
+
+    def _encode_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts)
+
+    def _empty_embedding(self) -> List[float]:
+        return [0.0] * self.dimension
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """批量转换文档为向量，空文本返回零向量"""
+        if not texts:
+            return []
+        valid = [i for i, text in enumerate(texts) if text and text.strip()]
+        result = [[0.0] * self.dimension for _ in texts]
+        if not valid:
+            return result
+        try:
+            for i, embedding in zip(valid, self._encode([texts[i] for i in valid])):
+                result[i] = embedding
+        except Exception as e:
+            self.logger.error(f"ONNX批量嵌入失败: {e}")
+        return result
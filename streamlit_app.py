@@ -51,7 +51,7 @@ with st.sidebar:
                 rag_system = RAGSystem()
                 
                 # 构建知识库
-                rag_system.build_knowledge_base(force_rebuild=force_rebuild)
+                rag_system.build_knowledge_base(force_rebuild=force_rebuild, incremental=not force_rebuild)
                 
                 # 保存到session state
                 st.session_state.rag_system = rag_system
@@ -115,43 +115,52 @@ else:
     
     # 处理问题回答
     if question:
-        with st.spinner("正在思考中..."):
-            try:
-                start_time = time.time()
-                result = st.session_state.rag_system.answer_question(question)
-                end_time = time.time()
-                
-                # 显示答案
-                st.subheader("🤖 回答:")
-                st.write(result.answer)
-                
+        try:
+            start_time = time.time()
+            with st.spinner("正在检索相关文档..."):
+                stream = st.session_state.rag_system.stream_answer(question)
+
+            # 边生成边显示答案
+            st.subheader("🤖 回答:")
+            st.write_stream(iter(stream))
+            result = stream.result
+            end_time = time.time()
+
+            if result is not None:
                 # 显示相关信息
                 st.subheader("📊 相关信息:")
                 col1, col2, col3 = st.columns(3)
                 col1.metric("处理时间", f"{end_time - start_time:.2f}秒")
                 col2.metric("参考文档数", len(result.source_chunk))
                 col3.metric("模型温度", temperature)
-                
+            
                 # 显示参考来源
                 if result.source_chunk:
                     st.subheader("📚 参考来源:")
                     for i, source in enumerate(result.source_chunk[:3], 1):  # 只显示前3个
                         source_file = source.chunk.metadata.get('source', '未知')
                         similarity = source.score
-                        
+                    
                         with st.expander(f"来源 {i}: {os.path.basename(source_file)} (相关度: {similarity:.3f})"):
                             st.write(f"**文件名:** {os.path.basename(source_file)}")
                             st.write(f"**相关度:** {similarity:.3f}")
                             st.write("**内容预览:**")
                             st.text(source.chunk.content[:500] + "..." if len(source.chunk.content) > 500 else source.chunk.content)
-                            
-            except Exception as e:
-                st.error(f"❌ 回答问题时出错: {str(e)}")
-                logger.error(f"回答问题时出错: {str(e)}")
+                        
+        except Exception as e:
+            st.error(f"❌ 回答问题时出错: {str(e)}")
+            logger.error(f"回答问题时出错: {str(e)}")
     
     # 显示系统状态
     st.sidebar.subheader("系统状态")
     st.sidebar.info("🟢 运行中")
+    embedding_model = getattr(st.session_state.rag_system, "embedding_model", None)
+    if embedding_model is not None and hasattr(embedding_model, "query_cache_stats"):
+        cache_stats = embedding_model.query_cache_stats()
+        st.sidebar.text(
+            f"查询向量缓存: 命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']} "
+            f"({cache_stats['hit_rate']:.0%})"
+        )
     
     # 显示版本信息
     st.sidebar.subheader("版本信息")
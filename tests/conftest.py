@@ -0,0 +1,100 @@
+# 测试公共配置：把项目根目录加入路径，并提供不依赖模型下载的假嵌入模型
+import hashlib
+import sys
+from dataclasses import replace
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.models import Document  # noqa: E402
+from config.settings import EmbeddingConfig, ProcessingConfig, Settings  # noqa: E402
+from core.chunk_ids import document_id  # noqa: E402
+from core.document_loader import DocumentLoader  # noqa: E402
+from main import RAGSystem  # noqa: E402
+from models.base import BaseEmbedding  # noqa: E402
+from utils.logger import get_logger  # noqa: E402
+
+
+class FakeEmbedding(BaseEmbedding):
+    """
+    确定性的假嵌入模型：按文本哈希生成归一化向量，相同文本得到相同向量；记录被嵌入的文本
+    """
+    def __init__(self, dimension: int = 16):
+        self.config = EmbeddingConfig(provider="fake", model_name="fake-embedding")
+        self.dimension = dimension
+        self.embedded: List[str] = []
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+        vector = np.random.default_rng(seed).normal(size=self.dimension)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded.extend(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+@pytest.fixture
+def fake_embedding() -> FakeEmbedding:
+    return FakeEmbedding()
+
+
+def _read_plain_files(loader: DocumentLoader, file_paths: List[str]):
+    """
+    代替 unstructured 的文档加载：整个文件作为一个文档，doc_id 与真实加载器的规则一致
+    """
+    loader.failed_files = []
+    for file_path in file_paths:
+        with open(file_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        yield Document(content=content, doc_id=document_id(loader.docs_path, file_path), metadata={"source": file_path})
+
+
+@pytest.fixture
+def docs_dir(tmp_path) -> Path:
+    path = tmp_path / "docs"
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def rag_system(tmp_path, docs_dir, fake_embedding, monkeypatch) -> RAGSystem:
+    """
+    使用NumPy向量存储和假嵌入模型的RAGSystem，不加载真实模型、不访问网络
+    """
+    monkeypatch.setattr(DocumentLoader, "iter_files", _read_plain_files)
+    monkeypatch.setattr(DocumentLoader, "iter_documents", lambda loader: _read_plain_files(loader, loader.list_source_files()))
+
+    settings = Settings()
+    settings.docs_path = str(docs_dir)
+    settings.embedding_config = replace(settings.embedding_config, cache_path=None)
+    settings.vector_store_config = replace(
+        settings.vector_store_config, provider="numpy", persist_directory=str(tmp_path / "db")
+    )
+    settings.processing_config = ProcessingConfig(chunk_size=120, chunk_overlap=0)
+    settings.answer_cache_config = replace(settings.answer_cache_config, enabled=False)
+    settings.reranker_config = replace(settings.reranker_config, enabled=False)
+
+    system = RAGSystem.__new__(RAGSystem)
+    system.logger = get_logger("tests")
+    system.settings = settings
+    system.embedding_model = None
+    system.llm_model = None
+    system.vector_store_manager = None
+    system.qa_engine = None
+    system.answer_cache = None
+    system.reranker = None
+
+    def initialize_models():
+        system.embedding_model = fake_embedding
+
+    monkeypatch.setattr(system, "_initialize_models", initialize_models)
+    return system
@@ -0,0 +1,103 @@
+# 问答语义缓存测试
+from datetime import datetime
+
+import pytest
+
+from config.models import Chunk, QAResult
+from config.settings import RetrievalConfig
+from core.answer_cache import SemanticAnswerCache
+from core.numpy_vector_store import NumpyVectorStore
+from core.qa_engine import QAEngine
+from models.base import BaseEmbedding, BaseLLM
+
+
+class TableEmbedding(BaseEmbedding):
+    """
+    问题 -> 预设向量，用来构造指定的相似度
+    """
+    VECTORS = {
+        "What is LangChain?": [1.0, 0.0],
+        "what is langchain": [0.97, 0.243],  # 余弦相似度约0.97
+        "How do retrievers work?": [0.8, 0.6],  # 余弦相似度0.8
+    }
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.VECTORS[text]
+
+
+class CountingLLM(BaseLLM):
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, context=None):
+        return self.generate_with_context(prompt, context or "")
+
+    def generate_with_context(self, question, context, **kwargs):
+        self.calls += 1
+        return f"answer {self.calls}"
+
+
+def qa_result(answer):
+    return QAResult(question="q", answer=answer, source_chunk=[], processing_time=0.0, timestamp=datetime.now())
+
+
+@pytest.fixture
+def cache():
+    return SemanticAnswerCache(TableEmbedding(), similarity_threshold=0.95, max_entries=2)
+
+
+def test_similar_question_with_same_chunks_hits(cache):
+    cache.store("What is LangChain?", ["c1", "c2"], qa_result("cached"))
+    assert cache.lookup("what is langchain", ["c2", "c1"]).answer == "cached"
+    assert cache.stats()["hits"] == 1
+
+
+def test_different_chunks_or_dissimilar_question_misses(cache):
+    cache.store("What is LangChain?", ["c1", "c2"], qa_result("cached"))
+    assert cache.lookup("What is LangChain?", ["c1", "c3"]) is None
+    assert cache.lookup("How do retrievers work?", ["c1", "c2"]) is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_expired_entries_are_not_reused(cache, monkeypatch):
+    cache.ttl_seconds = 10
+    now = [1000.0]
+    monkeypatch.setattr("core.answer_cache.time.time", lambda: now[0])
+    cache.store("What is LangChain?", ["c1"], qa_result("cached"))
+    now[0] += 11
+    assert cache.lookup("What is LangChain?", ["c1"]) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    cache.store("What is LangChain?", ["c1"], qa_result("first"))
+    cache.store("What is LangChain?", ["c2"], qa_result("second"))
+    assert cache.lookup("What is LangChain?", ["c1"]).answer == "first"
+    cache.store("What is LangChain?", ["c3"], qa_result("third"))
+    assert cache.lookup("What is LangChain?", ["c2"]) is None
+    assert cache.lookup("What is LangChain?", ["c1"]).answer == "first"
+
+
+def test_clear_drops_all_answers(cache):
+    cache.store("What is LangChain?", ["c1"], qa_result("cached"))
+    cache.clear()
+    assert cache.lookup("What is LangChain?", ["c1"]) is None
+
+
+def test_qa_engine_reuses_cached_answer(tmp_path):
+    embedding = TableEmbedding()
+    store = NumpyVectorStore(embedding, str(tmp_path))
+    store.add_chunks([Chunk(content="What is LangChain?", metadata={}, chunk_id="c1", parent_doc_id="doc")])
+    store.save(str(tmp_path))
+    llm = CountingLLM()
+    engine = QAEngine(llm, store, RetrievalConfig(k=1), answer_cache=SemanticAnswerCache(embedding))
+
+    first = engine.answer_question("What is LangChain?")
+    second = engine.answer_question("what is langchain")
+    assert llm.calls == 1
+    assert not first.from_cache
+    assert second.from_cache
+    assert second.answer == first.answer
@@ -0,0 +1,74 @@
+# 按长度排序、按token预算分批的测试
+import pytest
+
+import utils.batching as batching
+from utils.batching import AdaptiveBatcher, batched
+
+
+def test_batched_splits_into_fixed_size_batches():
+    assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    with pytest.raises(ValueError):
+        list(batched([1], 0))
+
+
+def test_batches_follow_token_budget_and_results_keep_input_order():
+    batcher = AdaptiveBatcher(token_budget=100, max_batch_size=8, adaptive=False)
+    items = ["a", "bbbbbb", "cc", "dddddddddd", "eee"]
+    lengths = [10, 60, 20, 100, 30]
+    seen = []
+
+    def encode(batch):
+        seen.append(list(batch))
+        return [item.upper() for item in batch]
+
+    assert batcher.run(items, lengths, encode) == [item.upper() for item in items]
+    # 按长度降序分批，每批条数 = 预算 // 本批最长文本的token数
+    assert seen == [["dddddddddd"], ["bbbbbb"], ["eee", "cc", "a"]]
+
+
+def test_batch_size_is_capped_by_max_batch_size():
+    batcher = AdaptiveBatcher(token_budget=1000, max_batch_size=2, adaptive=False)
+    sizes = []
+    batcher.run(list(range(5)), [1] * 5, lambda batch: sizes.append(len(batch)) or batch)
+    assert sizes == [2, 2, 1]
+
+
+def test_budget_grows_while_throughput_improves_and_turns_back_when_it_drops():
+    batcher = AdaptiveBatcher(token_budget=1000, min_token_budget=500, max_token_budget=4000)
+    batcher._tune(tokens=1000, elapsed=1.0)  # 第一次只记录吞吐
+    assert batcher.token_budget == 1000
+
+    batcher._tune(tokens=2000, elapsed=1.0)  # 吞吐提高，沿当前方向调大
+    assert batcher.token_budget == 1250
+    budget = batcher.token_budget
+    batcher._tune(tokens=500, elapsed=1.0)  # 吞吐明显下降，反向调小
+    assert batcher.token_budget == int(budget / AdaptiveBatcher.STEP)
+
+
+def test_small_throughput_changes_are_ignored():
+    batcher = AdaptiveBatcher(token_budget=1000)
+    batcher._tune(tokens=1000, elapsed=1.0)
+    batcher._tune(tokens=1020, elapsed=1.0)
+    assert batcher.token_budget == 1000
+
+
+def test_budget_stays_within_bounds():
+    batcher = AdaptiveBatcher(token_budget=1000, min_token_budget=500, max_token_budget=1100)
+    batcher._tune(tokens=1000, elapsed=1.0)
+    for tokens in (2000, 4000, 8000):
+        batcher._tune(tokens=tokens, elapsed=1.0)
+    assert batcher.token_budget == 1100
+
+
+def test_adaptive_run_changes_budget_from_measured_throughput(monkeypatch):
+    batcher = AdaptiveBatcher(token_budget=100, max_batch_size=100)
+    timings = iter([1.0, 0.5, 0.5, 0.5])  # 第二批起同样的token数耗时减半（吞吐提高）
+    clock = {"now": 0.0}
+
+    def encode(batch):
+        clock["now"] += next(timings)
+        return batch
+
+    monkeypatch.setattr(batching.time, "perf_counter", lambda: clock["now"])
+    batcher.run(list(range(40)), [10] * 40, encode)
+    assert batcher.token_budget > 100
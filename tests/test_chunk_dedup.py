@@ -0,0 +1,71 @@
+# 按内容去重与位置合并测试
+import os
+
+from config.models import Chunk
+from core.chunk_dedup import LOCATIONS_KEY, ChunkDeduplicator, content_hash
+
+SHARED = "# Shared\n\nThis license paragraph is copied into several documents.\n"
+UNIQUE = "# Unique\n\nOnly this document explains output parsers.\n"
+
+
+def chunk(content, source):
+    return Chunk(content=content, metadata={"source": source}, chunk_id="", parent_doc_id=os.path.basename(source))
+
+
+def test_content_hash_ignores_whitespace_differences():
+    assert content_hash("a  b\nc") == content_hash(" a b c ")
+    assert content_hash("a b c") != content_hash("a b d")
+
+
+def test_duplicates_are_dropped_and_their_locations_collected():
+    deduplicator = ChunkDeduplicator()
+    chunks = [chunk("same text", "/d/a.md"), chunk("same  text", "/d/b.md"), chunk("other", "/d/a.md")]
+    kept = list(deduplicator.drop_duplicates(deduplicator.assign_ids(chunks)))
+    assert [c.content for c in kept] == ["same text", "other"]
+    assert deduplicator.duplicates == 1
+    assert deduplicator.extra_locations == {
+        content_hash("same text"): [{"source": "/d/b.md", "parent_doc_id": "b.md"}]
+    }
+
+
+def test_existing_content_is_not_embedded_again():
+    deduplicator = ChunkDeduplicator(exists=lambda chunk_id: chunk_id == content_hash("stored"))
+    kept = list(deduplicator.drop_duplicates(deduplicator.assign_ids([chunk("stored", "/d/c.md")])))
+    assert kept == []
+    assert list(deduplicator.extra_locations) == [content_hash("stored")]
+
+
+def stored(system, content):
+    chunks = system.vector_store.chunk_store.get_many([content_hash(content)])
+    return chunks.get(content_hash(content))
+
+
+def sources_of(stored_chunk):
+    return sorted(os.path.basename(location["source"]) for location in stored_chunk.metadata[LOCATIONS_KEY])
+
+
+def test_build_and_sync_merge_and_remove_locations(rag_system, docs_dir, fake_embedding):
+    rag_system.settings.processing_config.deduplicate_chunks = True
+    (docs_dir / "a.md").write_text(SHARED, encoding="utf-8")
+    (docs_dir / "b.md").write_text(SHARED, encoding="utf-8")
+    (docs_dir / "c.md").write_text(UNIQUE, encoding="utf-8")
+    rag_system.build_knowledge_base(force_rebuild=True)
+
+    shared_content = next(
+        c.content for c in rag_system.vector_store.chunk_store.iter_chunks() if "license" in c.content
+    )
+    assert sum("license" in text for text in fake_embedding.embedded) == 1
+    assert sources_of(stored(rag_system, shared_content)) == ["a.md", "b.md"]
+
+    # 删除一个引用文件：共享chunk保留，只去掉该文件的位置
+    os.remove(docs_dir / "a.md")
+    rag_system.build_knowledge_base(incremental=True)
+    shared = stored(rag_system, shared_content)
+    assert sources_of(shared) == ["b.md"]
+    assert os.path.basename(shared.metadata["source"]) == "b.md"
+
+    # 最后一个引用也删除后chunk被删除
+    os.remove(docs_dir / "b.md")
+    rag_system.build_knowledge_base(incremental=True)
+    assert stored(rag_system, shared_content) is None
+    assert content_hash(shared_content) not in rag_system.vector_store._ids
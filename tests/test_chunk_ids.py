@@ -0,0 +1,93 @@
+# 稳定文档/chunk id与旧id方案迁移测试
+import unicodedata
+from dataclasses import replace
+
+from config.models import Document
+from config.settings import ProcessingConfig
+from core.chunk_ids import ID_SCHEME_VERSION, POSITION_KEY, chunk_id, document_id, migrate_chunk_ids
+from core.manifest import SourceManifest
+from core.numpy_vector_store import NumpyVectorStore
+from core.text_processor import TextProcessor
+
+DOCS_PATH = "/docs"
+CONTENT = "# Guide\n\n" + "alpha beta gamma " * 120 + "\n\n## Install\n\nRun pip install langchain."
+
+
+def test_document_id_is_a_normalized_relative_path():
+    decomposed = unicodedata.normalize("NFD", "/docs/sub/café.md")
+    assert document_id(DOCS_PATH, decomposed) == "sub/café.md"
+    assert document_id(DOCS_PATH, "/docs/sub/../a.md", page=2) == "a.md#2"
+
+
+def test_chunk_id_depends_on_document_position_and_content():
+    base = chunk_id("a.md", "0", "text")
+    assert base == chunk_id("a.md", "0", "text")
+    assert len({base, chunk_id("b.md", "0", "text"), chunk_id("a.md", "1", "text"), chunk_id("a.md", "0", "txt")}) == 4
+
+
+def fresh_chunks():
+    source = "/docs/sub/a.md"
+    document = Document(content=CONTENT, metadata={"source": source}, doc_id=document_id(DOCS_PATH, source))
+    return TextProcessor(ProcessingConfig(chunk_size=300, chunk_overlap=0)).process_single_document(document)
+
+
+def legacy_copy(chunks):
+    """
+    旧版本的chunk：按加载顺序编号的文档id，没有记录结构位置
+    """
+    return [
+        replace(chunk, chunk_id=f"doc_7_chunk_{i}", parent_doc_id="doc_7",
+                metadata={key: value for key, value in chunk.metadata.items() if key != POSITION_KEY})
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def test_migration_reproduces_fresh_ids_without_reembedding(tmp_path, fake_embedding):
+    chunks = fresh_chunks()
+    assert len(chunks) > 2
+    store = NumpyVectorStore(fake_embedding, str(tmp_path))
+    store.add_chunks(legacy_copy(chunks))
+    store.save(str(tmp_path))
+    fake_embedding.embedded.clear()
+
+    mapping = migrate_chunk_ids(store, DOCS_PATH)
+    store.save(str(tmp_path))
+
+    assert sorted(mapping.values()) == sorted(chunk.chunk_id for chunk in chunks)
+    assert fake_embedding.embedded == []
+    reloaded = NumpyVectorStore(fake_embedding, str(tmp_path))
+    reloaded.load(str(tmp_path))
+    stored = list(reloaded.chunk_store.iter_chunks())
+    assert {chunk.chunk_id for chunk in stored} == {chunk.chunk_id for chunk in chunks}
+    assert {chunk.parent_doc_id for chunk in stored} == {"sub/a.md"}
+    hit = reloaded.search(chunks[0].content, k=1)[0]
+    assert hit.chunk.chunk_id == chunks[0].chunk_id
+    assert hit.score > 0.99
+
+
+def test_legacy_store_is_migrated_on_load_and_sync_finds_no_changes(rag_system, docs_dir, fake_embedding):
+    (docs_dir / "guide.md").write_text(CONTENT, encoding="utf-8")
+    rag_system.build_knowledge_base(force_rebuild=True)
+    store = rag_system.vector_store
+    persist_directory = rag_system.settings.vector_store_config.persist_directory
+    current_ids = sorted(chunk.chunk_id for chunk in store.chunk_store.iter_chunks())
+
+    # 把向量库和清单改写成旧id方案
+    chunks = list(store.chunk_store.iter_chunks())
+    legacy = legacy_copy(chunks)
+    store.rename_chunks({chunk.chunk_id: legacy_chunk for chunk, legacy_chunk in zip(chunks, legacy)})
+    store.chunk_store.id_scheme = 0
+    store.save(persist_directory)
+    manifest = SourceManifest.load(persist_directory, str(docs_dir))
+    manifest.files["guide.md"]["chunk_ids"] = [chunk.chunk_id for chunk in legacy]
+    manifest.save(persist_directory)
+
+    fake_embedding.embedded.clear()
+    rag_system.build_knowledge_base(incremental=True)
+
+    store = rag_system.vector_store
+    assert store.chunk_store.id_scheme == ID_SCHEME_VERSION
+    assert sorted(chunk.chunk_id for chunk in store.chunk_store.iter_chunks()) == current_ids
+    manifest = SourceManifest.load(persist_directory, str(docs_dir))
+    assert sorted(manifest.chunk_ids_of(["guide.md"])) == current_ids
+    assert fake_embedding.embedded == []
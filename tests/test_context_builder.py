@@ -0,0 +1,77 @@
+# 上下文组装测试：重叠去除、token预算内截断与跳过
+from config.models import Chunk, SearchResult
+from core.context_builder import ContextBuilder, TokenCounter
+
+
+class WordCounter:
+    """
+    按空格分词计数，结果与是否安装tiktoken无关
+    """
+    def count(self, text):
+        return len(text.split())
+
+    def truncate(self, text, max_tokens):
+        return " ".join(text.split()[:max_tokens])
+
+
+DOCUMENT = " ".join(f"word{i}" for i in range(60))
+
+
+def result(content, parent="doc", source="/docs/guide.md", rank=1, **metadata):
+    chunk = Chunk(content=content, metadata={"source": source, **metadata}, chunk_id=f"{parent}-{rank}",
+                  parent_doc_id=parent)
+    return SearchResult(chunk=chunk, score=1.0, rank=rank)
+
+
+def builder(max_tokens=1000):
+    return ContextBuilder(max_tokens=max_tokens, token_counter=WordCounter())
+
+
+def test_overlap_between_sibling_chunks_is_sent_once():
+    first, second = DOCUMENT[:200], DOCUMENT[150:]
+    context = builder().build([result(first, rank=1), result(second, rank=2)])
+    body = " ".join(line for line in context.splitlines() if not line.startswith("["))
+    assert body.split() == DOCUMENT.split()
+
+
+def test_overlap_is_kept_for_chunks_of_different_documents():
+    first, second = DOCUMENT[:200], DOCUMENT[150:]
+    context = builder().build([result(first, parent="a", rank=1), result(second, parent="b", rank=2)])
+    assert DOCUMENT[150:200].strip() in context.split("\n\n")[1]
+
+
+def test_chunk_contained_in_an_included_sibling_is_dropped():
+    context = builder().build([result(DOCUMENT, rank=1), result(DOCUMENT[100:300], rank=2)])
+    assert context.count("[") == 1
+
+
+def test_chunk_that_does_not_fit_is_truncated_to_the_budget():
+    long_text = " ".join(f"token{i}" for i in range(500))
+    context = builder(max_tokens=200).build([result(long_text)])
+    assert WordCounter().count(context) <= 200
+    assert context.splitlines()[1].startswith("token0 token1")
+
+
+def test_small_remainder_skips_chunk_but_keeps_later_short_ones():
+    first = " ".join(f"a{i}" for i in range(150))
+    second = " ".join(f"b{i}" for i in range(100))
+    third = "short answer"
+    context = builder(max_tokens=200).build([
+        result(first, parent="p1", rank=1), result(second, parent="p2", rank=2), result(third, parent="p3", rank=3)
+    ])
+    assert "b0" not in context
+    assert "short answer" in context
+    assert WordCounter().count(context) <= 200
+
+
+def test_header_names_source_and_section():
+    context = builder().build([result("Body text here.", **{"Header 1": "Guide", "Header 2": "Install"})])
+    assert context.splitlines()[0] == "[1] guide.md | Guide > Install"
+
+
+def test_token_counter_estimate_without_tiktoken():
+    counter = TokenCounter()
+    counter._encoding = None
+    assert counter.count("abcdefgh") == 2
+    assert counter.count("向量检索") == 4
+    assert counter.count(counter.truncate("abcd " * 100, 10)) <= 10
@@ -0,0 +1,56 @@
+# 文档加载测试：unstructured 的markdown加载器换成按纯文本读取的假实现
+import sys
+import types
+
+import pytest
+
+from core.document_loader import DocumentLoader
+
+
+class FakeMarkdownLoader:
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def load(self):
+        with open(self.file_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        if "BROKEN" in content:
+            raise ValueError("cannot parse")
+        return [types.SimpleNamespace(page_content=content, metadata={"source": self.file_path})]
+
+
+@pytest.fixture(autouse=True)
+def fake_unstructured(monkeypatch):
+    package = types.ModuleType("langchain_community")
+    loaders = types.ModuleType("langchain_community.document_loaders")
+    loaders.UnstructuredMarkdownLoader = FakeMarkdownLoader
+    package.document_loaders = loaders
+    monkeypatch.setitem(sys.modules, "langchain_community", package)
+    monkeypatch.setitem(sys.modules, "langchain_community.document_loaders", loaders)
+
+
+def test_sequential_iter_files_skips_and_records_failures(docs_dir):
+    (docs_dir / "a.md").write_text("first", encoding="utf-8")
+    (docs_dir / "b.md").write_text("BROKEN", encoding="utf-8")
+    (docs_dir / "c.md").write_text("third", encoding="utf-8")
+    loader = DocumentLoader(str(docs_dir))
+
+    documents = list(loader.iter_files(loader.list_source_files()))
+
+    assert [document.doc_id for document in documents] == ["a.md", "c.md"]
+    assert [file_path for file_path, _ in loader.failed_files] == [str(docs_dir / "b.md")]
+    assert "cannot parse" in loader.failed_files[0][1]
+
+
+def test_sequential_full_load_skips_and_records_failures(docs_dir):
+    (docs_dir / "a.md").write_text("first", encoding="utf-8")
+    (docs_dir / "b.md").write_text("BROKEN", encoding="utf-8")
+    (docs_dir / "c.md").write_text("third", encoding="utf-8")
+    loader = DocumentLoader(str(docs_dir))
+
+    documents = list(loader.iter_documents())
+
+    # 默认的串行全量加载与 iter_files 走同一条逐文件解析路径，坏文件不会中断构建
+    assert [document.content for document in documents] == ["first", "third"]
+    assert [document.doc_id for document in documents] == ["a.md", "c.md"]
+    assert [file_path for file_path, _ in loader.failed_files] == [str(docs_dir / "b.md")]
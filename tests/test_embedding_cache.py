@@ -0,0 +1,61 @@
+# 持久化嵌入缓存测试：命中/未命中、LRU淘汰与条目计数
+import time
+
+import numpy as np
+
+from core.embedding_cache import EmbeddingCache
+
+
+def row_count(cache):
+    return cache._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+def test_only_missing_texts_are_embedded(tmp_path, fake_embedding):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    first = cache.embed_documents(fake_embedding, ["alpha", "beta"])
+    assert fake_embedding.embedded == ["alpha", "beta"]
+
+    fake_embedding.embedded.clear()
+    # 批内重复的未命中文本只计算一次
+    vectors = cache.embed_documents(fake_embedding, ["beta", "gamma", "alpha", "gamma"])
+    assert fake_embedding.embedded == ["gamma"]
+    # 缓存中的向量以float32存储
+    assert np.allclose(vectors, [first[1], fake_embedding._vector("gamma"), first[0], fake_embedding._vector("gamma")])
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 4
+
+
+def test_vectors_persist_and_are_keyed_by_model(tmp_path, fake_embedding):
+    path = str(tmp_path / "cache.sqlite")
+    EmbeddingCache(path).put_many("model-a", ["alpha"], [[0.5, 0.25]])
+    cache = EmbeddingCache(path)
+    assert cache.get_many("model-a", ["alpha", "beta"]) == [[0.5, 0.25], None]
+    assert cache.get_many("model-b", ["alpha"]) == [None]
+
+
+def test_zero_vectors_are_not_cached(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many("model", ["failed"], [[0.0, 0.0]])
+    assert cache.get_many("model", ["failed"]) == [None]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=3)
+    for text in ("a", "b", "c"):
+        cache.put_many("model", [text], [[1.0]])
+        time.sleep(0.01)
+    cache.get_many("model", ["a"])  # a 最近被使用，b 成为最久未使用的条目
+    time.sleep(0.01)
+
+    cache.put_many("model", ["d", "e"], [[1.0], [1.0]])
+    assert cache.get_many("model", ["a", "b", "c", "d", "e"]) == [[1.0], None, None, [1.0], [1.0]]
+    assert cache._count == row_count(cache) == 3
+
+
+def test_replacing_existing_entries_does_not_grow_the_count(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    EmbeddingCache(path).put_many("model", ["a", "b"], [[1.0], [2.0]])
+    cache = EmbeddingCache(path, max_entries=2)
+    cache.put_many("model", ["a", "b"], [[3.0], [4.0]])
+    assert cache._count == row_count(cache) == 2
+    assert cache.get_many("model", ["a", "b"]) == [[3.0], [4.0]]
@@ -0,0 +1,53 @@
+# 嵌入工作池的流水线测试：用线程池代替进程池，工作进程中的模型换成假嵌入模型
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import models.embedding_pool as embedding_pool
+from config.models import Chunk
+from core.numpy_vector_store import NumpyVectorStore
+from models.embedding_pool import EmbeddingWorkerPool
+
+
+@pytest.fixture
+def pool(fake_embedding, monkeypatch):
+    monkeypatch.setattr(embedding_pool, "_worker_model", fake_embedding)
+    pool = EmbeddingWorkerPool.__new__(EmbeddingWorkerPool)
+    pool.embedding_model = fake_embedding
+    pool.processes = 2
+    pool.threads = 1
+    pool.shard_size = 2
+    pool._executor = ThreadPoolExecutor(max_workers=2)
+    yield pool
+    pool.close()
+
+
+def test_embed_documents_keeps_input_order(pool, fake_embedding):
+    texts = [f"text {i}" for i in range(7)]
+    assert pool.embed_documents(texts) == [fake_embedding._vector(text) for text in texts]
+
+
+def test_next_batch_is_submitted_before_current_is_returned(pool):
+    batches = [[f"batch {b} text {i}" for i in range(3)] for b in range(4)]
+    pulled = []
+
+    def source():
+        for batch in batches:
+            pulled.append(batch)
+            yield batch
+
+    for index, vectors in enumerate(pool.embed_batches(source())):
+        assert len(vectors) == 3
+        # 产出第 index 批时下一批已经在工作池中计算
+        assert len(pulled) == min(index + 2, len(batches))
+
+
+def test_store_ingest_through_pool_matches_direct_embedding(pool, fake_embedding, tmp_path):
+    chunks = [Chunk(content=f"chunk {i}", metadata={}, chunk_id=f"c{i}", parent_doc_id="doc") for i in range(11)]
+    store = NumpyVectorStore(pool, str(tmp_path), batch_size=4)
+    store.add_chunks(iter(chunks))
+    store.save(str(tmp_path))
+    expected = np.asarray([fake_embedding._vector(chunk.content) for chunk in chunks], dtype=np.float32)
+    assert store._ids == [chunk.chunk_id for chunk in chunks]
+    assert np.allclose(store._matrix, expected)
@@ -0,0 +1,45 @@
+# FAISS向量存储测试：小语料的IVF-PQ退化与HNSW已删除向量的重建
+import pytest
+
+from config.models import Chunk
+from config.settings import VectorStoreConfig
+
+faiss = pytest.importorskip("faiss")  # faiss-cpu 是可选依赖，不在 requirements.txt 中
+
+from core.faiss_vector_store import FaissVectorStore  # noqa: E402
+
+
+def build_store(tmp_path, fake_embedding, index_type, count, **options):
+    config = VectorStoreConfig(provider="faiss", persist_directory=str(tmp_path), index_type=index_type,
+                               pq_m=4, nlist=4, **options)
+    store = FaissVectorStore(fake_embedding, config)
+    store.add_chunks(
+        Chunk(content=f"text {i}", metadata={}, chunk_id=f"c{i}", parent_doc_id="doc") for i in range(count)
+    )
+    store.save(str(tmp_path))
+    return store
+
+
+def test_small_corpus_falls_back_to_flat_index(tmp_path, fake_embedding):
+    store = build_store(tmp_path, fake_embedding, "ivfpq", 50)
+    assert faiss.try_extract_index_ivf(store.index) is None
+    assert store.search("text 3", k=1)[0].chunk.chunk_id == "c3"
+
+
+def test_ivfpq_is_trained_when_corpus_is_large_enough(tmp_path, fake_embedding):
+    store = build_store(tmp_path, fake_embedding, "ivfpq", 400)
+    assert faiss.try_extract_index_ivf(store.index) is not None
+    assert store.index.ntotal == 400
+
+
+@pytest.mark.parametrize("deleted, expected_ntotal", [(10, 100), (30, 70)])
+def test_hnsw_compacts_after_tombstone_threshold(tmp_path, fake_embedding, deleted, expected_ntotal):
+    store = build_store(tmp_path, fake_embedding, "hnsw", 100, hnsw_compact_ratio=0.2)
+    store.delete_chunks([f"c{i}" for i in range(deleted)])
+    assert store.index.ntotal == expected_ntotal
+    assert store.search(f"text {deleted + 5}", k=1)[0].chunk.chunk_id == f"c{deleted + 5}"
+
+    store.save(str(tmp_path))
+    reloaded = FaissVectorStore(fake_embedding, store.config)
+    reloaded.load(str(tmp_path))
+    assert reloaded.search("text 50", k=1)[0].chunk.chunk_id == "c50"
@@ -0,0 +1,261 @@
+# 重试/退避、超时和熔断器测试：DeepSeekLLM 指向本地的假 OpenAI 兼容服务（HTTP/1.1 keep-alive），不访问网络
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from config.models import Chunk, SearchResult
+from config.settings import ModelConfig, RetrievalConfig
+from core.qa_engine import QAEngine
+from models.deepseek_models import DeepSeekLLM
+from models.http_transport import CircuitBreaker, RetryPolicy, acall_with_retry, call_with_retry
+from utils.exceptions import CircuitOpenError, LLMError
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """
+    按脚本依次响应 /chat/completions：整数为HTTP错误状态码，("sleep", 秒) 为超时后才响应，其它字符串为回答内容
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.script = []
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def next_action(self):
+        with self._lock:
+            self.requests += 1
+            return self.script.pop(0) if self.script else "ok"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 保持连接，客户端连接池会复用连接
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        action = self.server.next_action()
+        if isinstance(action, tuple) and action[0] == "sleep":
+            time.sleep(action[1])
+            action = "late"
+        if isinstance(action, int):
+            self._send(action, {"error": {"message": f"fake error {action}", "type": "server_error"}})
+            return
+        self._send(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "fake-model",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": action}, "finish_reason": "stop"}],
+        })
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端已超时断开
+
+
+@pytest.fixture
+def server():
+    fake = FakeOpenAIServer()
+    thread = threading.Thread(target=fake.serve_forever, daemon=True)
+    thread.start()
+    yield fake
+    fake.shutdown()
+    fake.server_close()
+
+
+def make_llm(server: FakeOpenAIServer, **overrides) -> DeepSeekLLM:
+    options = dict(
+        provider="deepseek",
+        model_name="fake-model",
+        api_key="test-key",
+        api_base=server.url,
+        connect_timeout=1.0,
+        read_timeout=2.0,
+        max_retries=2,
+        retry_backoff_base=0.01,
+        retry_backoff_max=0.05,
+        circuit_failure_threshold=0,
+        circuit_reset_timeout=0.2,
+    )
+    options.update(overrides)
+    return DeepSeekLLM(ModelConfig(**options))
+
+
+def test_server_errors_are_retried_until_success(server):
+    server.script = [500, 503, "answer"]
+    assert make_llm(server).generate("question") == "answer"
+    assert server.requests == 3
+
+
+def test_retries_exhausted_raise_llm_error(server):
+    server.script = [500, 500, 500]
+    with pytest.raises(LLMError, match="重试 2 次"):
+        make_llm(server).generate("question")
+    assert server.requests == 3
+
+
+def test_client_errors_are_not_retried(server):
+    server.script = [400]
+    with pytest.raises(LLMError):
+        make_llm(server).generate("question")
+    assert server.requests == 1
+
+
+def test_read_timeout_is_retried(server):
+    server.script = [("sleep", 1.0), "answer"]
+    llm = make_llm(server, read_timeout=0.2)
+    start = time.monotonic()
+    assert llm.generate("question") == "answer"
+    assert server.requests == 2
+    assert time.monotonic() - start < 1.0
+
+
+def test_async_call_is_retried(server):
+    server.script = [502, "answer"]
+    llm = make_llm(server)
+    assert asyncio.run(llm.agenerate_with_context("question", "context")) == "answer"
+    assert server.requests == 2
+
+
+def test_backoff_is_exponential_and_capped():
+    policy = RetryPolicy(backoff_base=0.5, backoff_max=2.0)
+    for attempt, cap in [(0, 0.5), (1, 1.0), (2, 2.0), (6, 2.0)]:
+        assert cap / 2 <= policy.delay(attempt) <= cap
+
+
+def test_retry_after_header_is_honoured_and_capped():
+    policy = RetryPolicy(backoff_base=0.5, backoff_max=2.0)
+    error = SimpleNamespace(response=httpx.Response(429, headers={"retry-after": "1.5"}))
+    assert policy.delay(0, error) == 1.5
+    error = SimpleNamespace(response=httpx.Response(429, headers={"retry-after": "30"}))
+    assert policy.delay(0, error) == 2.0
+
+
+def test_breaker_opens_rejects_and_recovers(server):
+    llm = make_llm(server, max_retries=1, circuit_failure_threshold=2)
+    server.script = [500, 500]
+    with pytest.raises(LLMError):
+        llm.generate("question")
+    assert llm.circuit_breaker.state == CircuitBreaker.OPEN
+
+    # 熔断期间直接拒绝，不发出请求
+    with pytest.raises(CircuitOpenError):
+        llm.generate("question")
+    assert server.requests == 2
+
+    time.sleep(0.25)
+    server.script = ["answer"]
+    assert llm.generate("question") == "answer"
+    assert llm.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens_breaker(server):
+    llm = make_llm(server, max_retries=1, circuit_failure_threshold=1)
+    server.script = [500]
+    with pytest.raises(LLMError):
+        llm.generate("question")
+    assert server.requests == 1
+
+    time.sleep(0.25)
+    server.script = [500]
+    # 半开试探失败后重新熔断，同一次调用的重试也被拒绝
+    with pytest.raises(CircuitOpenError):
+        llm.generate("question")
+    assert server.requests == 2
+    assert llm.circuit_breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    callers = 8
+    barrier = threading.Barrier(callers)
+    admitted = []
+
+    def call():
+        barrier.wait()
+        try:
+            breaker.before_call()
+            admitted.append(True)
+        except CircuitOpenError:
+            pass
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(admitted) == 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record_success()
+    breaker.before_call()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_non_retryable_trial_releases_half_open_slot():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    def bad_request():
+        raise ValueError("bad request")
+
+    with pytest.raises(LLMError):
+        call_with_retry(bad_request, RetryPolicy(max_retries=0), breaker)
+    # 试探请求的结果不反映服务状态，名额被释放，下一个请求可以继续试探
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_batches_in_separate_event_loops_reuse_nothing_from_closed_loops(server):
+    llm = make_llm(server, max_retries=0, circuit_failure_threshold=5, max_concurrency=8)
+    engine = QAEngine(llm, vector_store=None, config=RetrievalConfig(), max_concurrency=8)
+    chunk = Chunk(content="LangChain connects models to data.", metadata={"source": "doc.md"}, chunk_id="c1")
+    engine._retrieve_batch = lambda questions: [[SearchResult(chunk=chunk, score=1.0, rank=1)] for _ in questions]
+
+    questions = [f"question {i}" for i in range(16)]
+    for _ in range(2):
+        # 每次批量问答是一个新的事件循环，上一批留下的keep-alive连接不能被复用
+        results = engine.batch_answer_questions(questions)
+        assert [result.answer for result in results] == ["ok"] * len(questions)
+    assert server.requests == 32
+    assert llm.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_event_loop_errors_do_not_count_against_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+
+    async def closed_loop_call():
+        try:
+            raise RuntimeError("Event loop is closed")
+        except RuntimeError as e:
+            raise ConnectionError("Connection error.") from e
+
+    with pytest.raises(LLMError, match="事件循环"):
+        asyncio.run(acall_with_retry(closed_loop_call, RetryPolicy(max_retries=0), breaker))
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,89 @@
+# BM25关键词检索与RRF融合测试
+from config.models import Chunk, SearchResult
+from config.settings import RetrievalConfig
+from core.numpy_vector_store import NumpyVectorStore
+from core.retrieval import Retriever, reciprocal_rank_fusion
+from core.sparse_index import SparseIndex, tokenize
+
+
+def make_chunk(chunk_id, content="text"):
+    return Chunk(content=content, metadata={}, chunk_id=chunk_id, parent_doc_id="doc")
+
+
+def ranking(*chunk_ids):
+    return [SearchResult(chunk=make_chunk(chunk_id), score=0.0, rank=rank) for rank, chunk_id in enumerate(chunk_ids, 1)]
+
+
+def test_tokenize_splits_identifiers_and_cjk():
+    tokens = tokenize("OpenAIEmbeddings embed_query 向量库")
+    assert {"openaiembeddings", "open", "ai", "embeddings"} <= set(tokens)
+    assert {"embed_query", "embed", "query"} <= set(tokens)
+    assert {"向", "量", "库", "向量", "量库"} <= set(tokens)
+
+
+def test_bm25_ranks_exact_identifier_first(tmp_path):
+    index = SparseIndex.open(str(tmp_path))
+    index.add_many([
+        make_chunk("a", "Call embed_query to embed a single query string."),
+        make_chunk("b", "Documents are embedded in batches with embed_documents."),
+        make_chunk("c", "Retrievers return relevant documents."),
+    ])
+    hits = index.search("embed_query", k=3)
+    assert hits[0][0] == "a"
+    assert "c" not in [chunk_id for chunk_id, _ in hits]
+
+    index.delete_many(["a"])
+    assert "a" not in [chunk_id for chunk_id, _ in index.search("embed_query", k=3)]
+    index.close()
+
+
+def test_rrf_prefers_results_found_by_both_rankings():
+    fused = reciprocal_rank_fusion([ranking("a", "b", "c"), ranking("d", "c", "a")], k=3, rrf_k=60)
+    assert [result.chunk.chunk_id for result in fused] == ["a", "c", "d"]
+    assert fused[0].score == 1 / 61 + 1 / 63
+    assert [result.rank for result in fused] == [1, 2, 3]
+
+
+def test_rrf_with_an_empty_ranking_keeps_the_other_order():
+    fused = reciprocal_rank_fusion([ranking("a", "b"), []], k=5)
+    assert [result.chunk.chunk_id for result in fused] == ["a", "b"]
+
+
+def test_hybrid_retriever_finds_keyword_match(tmp_path, fake_embedding):
+    store = NumpyVectorStore(fake_embedding, str(tmp_path))
+    contents = [f"Unrelated filler paragraph number {i}." for i in range(20)]
+    contents.append("The SemanticAnswerCache reuses answers for similar questions.")
+    store.add_chunks(make_chunk(f"c{i}", content) for i, content in enumerate(contents))
+    store.save(str(tmp_path))
+
+    retriever = Retriever(store, RetrievalConfig(serch_type="hybrid", k=3, fetch_k=5))
+    results = retriever.retrieve("SemanticAnswerCache")
+    assert "c20" in [result.chunk.chunk_id for result in results]
+
+
+def test_keyword_index_is_not_written_unless_enabled(tmp_path, fake_embedding):
+    store = NumpyVectorStore(fake_embedding, str(tmp_path))
+    store.add_chunks([make_chunk("a", "alpha retriever"), make_chunk("b", "beta embeddings")])
+    store.save(str(tmp_path))
+    assert not (tmp_path / SparseIndex.FILENAME).exists()
+
+    # 首次关键词检索时从chunk存储补建
+    assert [result.chunk.chunk_id for result in store.sparse_search("retriever")] == ["a"]
+
+    # 补建后不再维护：之后的写入/删除清空索引，下次检索重新补建，而不是返回过期结果
+    store.add_chunks([make_chunk("c", "gamma retriever")])
+    store.delete_chunks(["a"])
+    assert [result.chunk.chunk_id for result in store.sparse_search("retriever")] == ["c"]
+
+
+def test_keyword_index_is_written_on_ingest_when_enabled(tmp_path, fake_embedding):
+    store = NumpyVectorStore(fake_embedding, str(tmp_path))
+    store.add_chunks([make_chunk("a", "alpha retriever")])
+    store.save(str(tmp_path))
+
+    # 之前未维护索引的库开启后，先补建已有chunks再增量写入
+    store = NumpyVectorStore(fake_embedding, str(tmp_path), keyword_index=True)
+    store.load(str(tmp_path))
+    store.add_chunks([make_chunk("b", "beta retriever")])
+    assert len(store.sparse_index) == 2
+    assert sorted(result.chunk.chunk_id for result in store.sparse_search("retriever")) == ["a", "b"]
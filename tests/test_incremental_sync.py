@@ -0,0 +1,94 @@
+# 源文件清单对比与增量同步测试
+import os
+
+import pytest
+
+from core.manifest import SourceManifest
+from utils.exceptions import DocumentLoadError
+
+ALPHA = "# Alpha\n\nLangChain connects language models to external data sources.\n"
+BETA = "# Beta\n\nVector stores keep embeddings for similarity search.\n"
+GAMMA = "# Gamma\n\nRetrievers return the documents most relevant to a query.\n"
+
+
+def write(path, content):
+    path.write_text(content, encoding="utf-8")
+
+
+def stored_sources(system):
+    return sorted({os.path.basename(chunk.metadata["source"]) for chunk in system.vector_store.chunk_store.iter_chunks()})
+
+
+def test_manifest_diff_detects_added_changed_removed_and_touched(docs_dir, tmp_path):
+    for name in ("a.md", "b.md", "c.md"):
+        write(docs_dir / name, name)
+    manifest = SourceManifest(str(docs_dir))
+    files = sorted(str(path) for path in docs_dir.iterdir())
+    diff = manifest.diff(files)
+    assert diff.added == ["a.md", "b.md", "c.md"]
+    for rel_path in diff.added:
+        manifest.record(rel_path, [f"{rel_path}-chunk"])
+    manifest.save(str(tmp_path))
+
+    manifest = SourceManifest.load(str(tmp_path), str(docs_dir))
+    write(docs_dir / "a.md", "a.md changed")
+    stat = os.stat(docs_dir / "b.md")
+    os.utime(docs_dir / "b.md", (stat.st_atime, stat.st_mtime + 10))
+    os.remove(docs_dir / "c.md")
+    write(docs_dir / "d.md", "d.md")
+
+    diff = manifest.diff(sorted(str(path) for path in docs_dir.iterdir()))
+    assert diff.added == ["d.md"]
+    assert diff.changed == ["a.md"]
+    assert diff.removed == ["c.md"]
+    assert diff.touched == ["b.md"]
+    assert manifest.chunk_ids_of(diff.changed + diff.removed) == ["a.md-chunk", "c.md-chunk"]
+
+
+def test_manifest_with_other_version_is_ignored(docs_dir, tmp_path):
+    (tmp_path / "sources_manifest.json").write_text('{"version": 0, "files": {}}', encoding="utf-8")
+    assert SourceManifest.load(str(tmp_path), str(docs_dir)) is None
+
+
+def test_incremental_sync_only_embeds_changed_files(rag_system, docs_dir, fake_embedding):
+    write(docs_dir / "alpha.md", ALPHA)
+    write(docs_dir / "beta.md", BETA)
+    rag_system.build_knowledge_base(force_rebuild=True)
+    assert stored_sources(rag_system) == ["alpha.md", "beta.md"]
+
+    write(docs_dir / "alpha.md", ALPHA + "\nChains compose prompts, models and parsers.\n")
+    os.remove(docs_dir / "beta.md")
+    write(docs_dir / "gamma.md", GAMMA)
+    fake_embedding.embedded.clear()
+    rag_system.build_knowledge_base(incremental=True)
+
+    assert stored_sources(rag_system) == ["alpha.md", "gamma.md"]
+    assert fake_embedding.embedded
+    assert not any("Vector stores" in text for text in fake_embedding.embedded)
+
+    manifest = SourceManifest.load(rag_system.settings.vector_store_config.persist_directory, str(docs_dir))
+    assert sorted(manifest.files) == ["alpha.md", "gamma.md"]
+    stored_ids = {chunk.chunk_id for chunk in rag_system.vector_store.chunk_store.iter_chunks()}
+    assert set(manifest.chunk_ids_of(manifest.files)) == stored_ids
+    assert set(rag_system.vector_store._ids) == stored_ids
+
+
+def test_incremental_sync_without_changes_embeds_nothing(rag_system, docs_dir, fake_embedding):
+    write(docs_dir / "alpha.md", ALPHA)
+    rag_system.build_knowledge_base(force_rebuild=True)
+    fake_embedding.embedded.clear()
+    rag_system.build_knowledge_base(incremental=True)
+    assert fake_embedding.embedded == []
+    assert stored_sources(rag_system) == ["alpha.md"]
+
+
+
+def test_rebuild_keeps_existing_store_when_docs_are_missing(rag_system, docs_dir):
+    write(docs_dir / "alpha.md", ALPHA)
+    rag_system.build_knowledge_base(force_rebuild=True)
+    os.remove(docs_dir / "alpha.md")
+
+    with pytest.raises(DocumentLoadError):
+        rag_system.build_knowledge_base(force_rebuild=True)
+    rag_system.build_knowledge_base()
+    assert stored_sources(rag_system) == ["alpha.md"]
@@ -0,0 +1,61 @@
+# MMR选择与相似度阈值测试
+import numpy as np
+
+from config.models import Chunk
+from config.settings import RetrievalConfig
+from core.numpy_vector_store import NumpyVectorStore
+from core.retrieval import Retriever, maximal_marginal_relevance
+
+
+def normalized(*rows):
+    matrix = np.asarray(rows, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def test_mmr_skips_near_duplicates():
+    embeddings = normalized([1.0, 0.0], [0.99, 0.01], [0.0, 1.0])
+    relevance = np.asarray([0.9, 0.89, 0.5], dtype=np.float32)
+    assert maximal_marginal_relevance(relevance, embeddings, k=2, lambda_mult=0.5) == [0, 2]
+
+
+def test_mmr_with_lambda_one_is_relevance_order():
+    embeddings = normalized([1.0, 0.0], [0.99, 0.01], [0.0, 1.0])
+    relevance = np.asarray([0.9, 0.89, 0.5], dtype=np.float32)
+    assert maximal_marginal_relevance(relevance, embeddings, k=3, lambda_mult=1.0) == [0, 1, 2]
+
+
+def test_mmr_returns_at_most_the_number_of_candidates():
+    embeddings = normalized([1.0, 0.0], [0.0, 1.0])
+    assert sorted(maximal_marginal_relevance(np.asarray([0.3, 0.2]), embeddings, k=5)) == [0, 1]
+    assert maximal_marginal_relevance(np.zeros(0), np.zeros((0, 2)), k=3) == []
+
+
+def build_store(tmp_path, fake_embedding, contents):
+    store = NumpyVectorStore(fake_embedding, str(tmp_path))
+    store.add_chunks(
+        Chunk(content=content, metadata={}, chunk_id=f"c{i}", parent_doc_id="doc") for i, content in enumerate(contents)
+    )
+    store.save(str(tmp_path))
+    return store
+
+
+def test_mmr_retriever_drops_duplicate_chunks(tmp_path, fake_embedding):
+    question = "How do overlapping chunks affect retrieval?"
+    # 重叠切分产生的重复chunk与问题的向量相同
+    store = build_store(tmp_path, fake_embedding, [question, question, "Other text A.", "Other text B."])
+
+    similarity = Retriever(store, RetrievalConfig(serch_type="similarity", k=2)).retrieve(question)
+    assert {result.chunk.chunk_id for result in similarity} == {"c0", "c1"}
+
+    mmr = Retriever(store, RetrievalConfig(serch_type="mmr", k=2, fetch_k=4, mmr_lambda=0.5)).retrieve(question)
+    ids = [result.chunk.chunk_id for result in mmr]
+    assert len(ids) == 2
+    assert len({"c0", "c1"} & set(ids)) == 1
+
+
+def test_score_threshold_filters_weak_matches(tmp_path, fake_embedding):
+    question = "What is LangChain?"
+    store = build_store(tmp_path, fake_embedding, [question, "Completely unrelated text."])
+    results = Retriever(store, RetrievalConfig(k=2, score_threshold=0.9)).retrieve(question)
+    assert [result.chunk.chunk_id for result in results] == ["c0"]
+    assert results[0].score > 0.99
@@ -0,0 +1,54 @@
+# ONNX嵌入后端测试：用很小的sentence-transformers模型导出ONNX并与PyTorch向量做一致性检查
+# 需要 onnxruntime / torch / transformers / sentence-transformers，缺少时跳过；首次运行需要下载模型
+import os
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+sentence_transformers = pytest.importorskip("sentence_transformers")
+
+import numpy as np  # noqa: E402
+
+from config.settings import EmbeddingConfig  # noqa: E402
+from models.onnx_models import PARITY_TEXTS, OnnxEmbedding  # noqa: E402
+
+TINY_MODEL = "sentence-transformers-testing/stsb-bert-tiny-safetensors"
+
+
+@pytest.fixture(scope="module")
+def reference_model():
+    try:
+        return sentence_transformers.SentenceTransformer(TINY_MODEL, device="cpu")
+    except OSError as e:
+        pytest.skip(f"无法下载测试模型 {TINY_MODEL}: {e}")
+
+
+@pytest.fixture(scope="module")
+def onnx_embedding(reference_model, tmp_path_factory):
+    onnx_dir = tmp_path_factory.mktemp("onnx")
+    config = EmbeddingConfig(provider="onnx", model_name=TINY_MODEL, onnx_path=str(onnx_dir),
+                             onnx_parity_threshold=0.99)
+    return OnnxEmbedding(config)
+
+
+def test_export_writes_model_tokenizer_and_sequence_length(onnx_embedding, reference_model):
+    for filename in (OnnxEmbedding.FP32_FILENAME, "tokenizer_config.json", "sentence_bert_config.json"):
+        assert os.path.exists(os.path.join(onnx_embedding.onnx_dir, filename))
+    assert onnx_embedding.max_seq_length == reference_model.max_seq_length
+    assert onnx_embedding.dimension == reference_model.get_sentence_embedding_dimension()
+
+
+def test_onnx_vectors_match_pytorch(onnx_embedding, reference_model):
+    reference = reference_model.encode(PARITY_TEXTS, normalize_embeddings=True)
+    vectors = np.asarray(onnx_embedding.embed_documents(PARITY_TEXTS), dtype=np.float32)
+    assert np.min(np.sum(vectors * reference, axis=1)) >= 0.99
+    assert onnx_embedding.check_parity() >= 0.99
+
+
+def test_onnx_queries_use_the_shared_query_cache(onnx_embedding):
+    first = onnx_embedding.embed_query("What is  LangChain?")
+    hits = onnx_embedding.query_cache_stats()["hits"]
+    assert onnx_embedding.embed_queries(["What is LangChain?"]) == [first]
+    assert onnx_embedding.query_cache_stats()["hits"] == hits + 1
@@ -0,0 +1,46 @@
+# 串行与并行切分一致性测试
+from dataclasses import asdict, replace
+
+from config.models import Document
+from config.settings import ProcessingConfig
+from core.chunk_ids import document_id
+from core.text_processor import TextProcessor
+from utils.parallel import ordered_parallel_map
+
+
+def _square(value):
+    return value * value
+
+
+def make_documents(count=7):
+    documents = []
+    for i in range(count):
+        source = f"/docs/section{i % 3}/page{i}.md"
+        content = (
+            f"# Page {i}\n\nIntro for page {i}. " + "Retrieval augmented generation. " * (10 + i * 5)
+            + f"\n\n## Details {i}\n\n" + "Chunks overlap at their boundaries. " * (4 + i)
+        )
+        documents.append(Document(content=content, metadata={"source": source},
+                                  doc_id=document_id("/docs", source)))
+    return documents
+
+
+def test_ordered_parallel_map_keeps_input_order():
+    assert list(ordered_parallel_map(_square, range(20), max_workers=3, max_in_flight=4)) == [i * i for i in range(20)]
+
+
+def test_parallel_chunking_matches_serial_chunking():
+    config = ProcessingConfig(chunk_size=200, chunk_overlap=40)
+    serial = list(TextProcessor(config).iter_chunks(make_documents()))
+    parallel_config = replace(config, parallel_chunking=True, chunk_workers=2, chunk_docs_per_task=2)
+    parallel = list(TextProcessor(parallel_config).iter_chunks(iter(make_documents())))
+
+    assert len(serial) > len(make_documents())
+    assert [asdict(chunk) for chunk in parallel] == [asdict(chunk) for chunk in serial]
+    assert len({chunk.chunk_id for chunk in serial}) == len(serial)
+
+
+def test_chunks_respect_chunk_size():
+    config = ProcessingConfig(chunk_size=200, chunk_overlap=40)
+    for chunk in TextProcessor(config).iter_chunks(make_documents()):
+        assert len(chunk.content) <= 200
@@ -0,0 +1,168 @@
+# QAEngine 测试：并发批量问答（假LLM记录同时进行的生成数）与流式回答，检索直接返回固定结果
+import asyncio
+import threading
+import time
+
+import pytest
+
+from config.models import Chunk, SearchResult
+from config.settings import RetrievalConfig
+from core.answer_cache import SemanticAnswerCache
+from core.qa_engine import QAEngine
+from models.base import BaseLLM
+
+
+class FakeAsyncLLM(BaseLLM):
+    """
+    异步生成时按问题编号倒序结束（先提交的后完成），记录最大并发数和 aclose 调用次数
+    """
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.closed = 0
+
+    def generate(self, prompt: str, context: str = None) -> str:
+        return f"answer to {prompt}"
+
+    def generate_with_context(self, question: str, context: str, **kwargs) -> str:
+        return f"answer to {question}"
+
+    async def agenerate_with_context(self, question: str, context: str, **kwargs) -> str:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            index = int(question.split()[-1])
+            await asyncio.sleep(self.delay * (10 - index % 10))
+            return f"answer to {question}"
+        finally:
+            self.in_flight -= 1
+
+    async def aclose(self) -> None:
+        self.closed += 1
+
+
+class SlowQueryEmbedding:
+    """
+    问题向量计算阻塞 delay 秒，模拟CPU上的模型前向计算
+    """
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.threads = set()
+
+    def embed_query(self, text: str):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return [1.0, 0.0]
+
+
+def make_engine(llm, **kwargs) -> QAEngine:
+    engine = QAEngine(llm, vector_store=None, config=RetrievalConfig(), **kwargs)
+    chunk = Chunk(content="LangChain connects models to data.", metadata={"source": "doc.md"}, chunk_id="c1")
+    engine._retrieve_batch = lambda questions: [[SearchResult(chunk=chunk, score=1.0, rank=1)] for _ in questions]
+    return engine
+
+
+def test_batch_results_keep_input_order_and_respect_concurrency_limit():
+    llm = FakeAsyncLLM()
+    engine = make_engine(llm, max_concurrency=3)
+    questions = [f"question {i}" for i in range(10)]
+
+    results = engine.batch_answer_questions(questions)
+
+    assert [result.question for result in results] == questions
+    assert [result.answer for result in results] == [f"answer to {q}" for q in questions]
+    assert llm.max_in_flight == 3
+    # 每批结束前关闭LLM在该事件循环中的异步客户端
+    assert llm.closed == 1
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 4])
+def test_explicit_concurrency_overrides_engine_default(max_concurrency):
+    llm = FakeAsyncLLM(delay=0.005)
+    engine = make_engine(llm, max_concurrency=8)
+    asyncio.run(engine.abatch_answer_questions([f"question {i}" for i in range(8)], max_concurrency=max_concurrency))
+    assert llm.max_in_flight == max_concurrency
+
+
+def test_answer_cache_work_does_not_block_the_event_loop():
+    embedding = SlowQueryEmbedding(delay=0.1)
+    engine = make_engine(FakeAsyncLLM(delay=0.0), max_concurrency=4,
+                         answer_cache=SemanticAnswerCache(embedding, similarity_threshold=0.95))
+    start = time.monotonic()
+    results = engine.batch_answer_questions([f"question {i}" for i in range(4)])
+    elapsed = time.monotonic() - start
+
+    assert len(results) == 4
+    # 写缓存时的4次问题向量计算在线程池中并行，而不是在事件循环上串行执行（串行约0.4秒）
+    assert elapsed < 0.3
+    assert threading.get_ident() not in embedding.threads
+
+
+class FakeStreamingLLM(FakeAsyncLLM):
+    """
+    逐个产出预设的token，记录上游流是否被关闭；fail_after 个token之后抛出异常
+    """
+    def __init__(self, tokens, fail_after=None):
+        super().__init__()
+        self.tokens = tokens
+        self.fail_after = fail_after
+        self.stream_closed = False
+
+    def generate_with_context_stream(self, question: str, context: str, **kwargs):
+        try:
+            for index, token in enumerate(self.tokens):
+                if index == self.fail_after:
+                    raise RuntimeError("connection dropped")
+                yield token
+        finally:
+            self.stream_closed = True
+
+
+def make_streaming_engine(llm, fake_embedding):
+    engine = make_engine(llm, answer_cache=SemanticAnswerCache(fake_embedding, similarity_threshold=0.95))
+    engine._retrieve = lambda question: engine._retrieve_batch([question])[0]
+    return engine
+
+
+def test_stream_yields_tokens_then_result_and_caches_the_answer(fake_embedding):
+    llm = FakeStreamingLLM(["Lang", "Chain ", "connects ", "models."])
+    engine = make_streaming_engine(llm, fake_embedding)
+
+    stream = engine.stream_answer("What is LangChain?")
+    assert stream.result is None
+    assert list(stream) == llm.tokens
+    assert stream.result.answer == "LangChain connects models."
+    assert stream.result.source_chunk[0].chunk.chunk_id == "c1"
+    assert stream.time_to_first_token is not None
+    assert stream.time_to_first_token <= stream.result.processing_time
+
+    cached = engine.stream_answer("What is LangChain?")
+    assert cached.from_cache
+    assert list(cached) == ["LangChain connects models."]
+
+
+def test_early_exit_closes_the_llm_stream_without_result_or_cache(fake_embedding):
+    llm = FakeStreamingLLM(["Lang", "Chain ", "connects ", "models."])
+    engine = make_streaming_engine(llm, fake_embedding)
+
+    stream = engine.stream_answer("What is LangChain?")
+    for token in stream:
+        break
+    assert token == "Lang"
+    assert llm.stream_closed
+    assert stream.result is None
+    # 不完整的回答不进缓存
+    assert not engine.stream_answer("What is LangChain?").from_cache
+
+
+def test_stream_failure_yields_apology_and_is_not_cached(fake_embedding):
+    llm = FakeStreamingLLM(["Lang", "Chain"], fail_after=1)
+    engine = make_streaming_engine(llm, fake_embedding)
+
+    stream = engine.stream_answer("What is LangChain?")
+    tokens = list(stream)
+    assert tokens[0] == "Lang"
+    assert "抱歉" in tokens[-1]
+    assert stream.result.answer == "".join(tokens)
+    assert not engine.stream_answer("What is LangChain?").from_cache
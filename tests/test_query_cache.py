@@ -0,0 +1,87 @@
+# 查询向量LRU缓存测试：LRUCache 本身，以及嵌入后端共用的 CachedQueryEmbedding 缓存路径
+import threading
+from typing import List
+
+from config.settings import EmbeddingConfig
+from models.base import CachedQueryEmbedding
+from utils.logger import get_logger
+from utils.lru_cache import LRUCache
+
+
+class CountingQueryEmbedding(CachedQueryEmbedding):
+    """
+    记录每次前向计算收到的查询文本
+    """
+    def __init__(self, query_cache_size: int = 8, fail: bool = False):
+        self.config = EmbeddingConfig(provider="fake", model_name="fake-embedding")
+        self.logger = get_logger("tests")
+        self.query_cache = LRUCache(query_cache_size)
+        self.calls: List[List[str]] = []
+        self.fail = fail
+
+    def _encode_queries(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def _empty_embedding(self) -> List[float]:
+        return [0.0, 0.0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode_queries(texts)
+
+
+def test_lru_cache_evicts_least_recently_used_and_counts_hits():
+    cache = LRUCache(capacity=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # a 最近使用，b 成为最久未使用
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats() == {"hits": 2, "misses": 1, "size": 2, "capacity": 2, "hit_rate": 2 / 3}
+
+
+def test_lru_cache_with_zero_capacity_stores_nothing():
+    cache = LRUCache(capacity=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_lru_cache_is_thread_safe():
+    cache = LRUCache(capacity=64)
+
+    def worker(offset):
+        for i in range(500):
+            cache.put((offset + i) % 100, i)
+            cache.get(i % 100)
+
+    threads = [threading.Thread(target=worker, args=(n * 7,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 64
+    assert cache.hits + cache.misses == 8 * 500
+
+
+def test_repeated_and_whitespace_variant_queries_skip_the_model():
+    model = CountingQueryEmbedding()
+    first = model.embed_query("What is LangChain?")
+    assert model.embed_query("  What is\tLangChain? ") == first
+    assert model.embed_query("What is LangChain?") == first
+    assert model.calls == [["What is LangChain?"]]
+    stats = model.query_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+
+def test_empty_queries_and_failures_return_zero_vectors_and_are_not_cached():
+    model = CountingQueryEmbedding(fail=True)
+    assert model.embed_query("   ") == [0.0, 0.0]
+    assert model.calls == []
+    assert model.embed_query("question") == [0.0, 0.0]
+    assert model.embed_query("question") == [0.0, 0.0]
+    # 失败的结果不进缓存，下次重新计算
+    assert model.calls == [["question"], ["question"]]
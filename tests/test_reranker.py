@@ -0,0 +1,92 @@
+# 交叉编码器重排序测试：假交叉编码器按内容中的数字打分，不加载真实模型
+import time
+
+from config.models import Chunk, SearchResult
+from config.settings import RerankerConfig
+from core.reranker import CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    """
+    得分为chunk内容末尾的数字，每对耗时 seconds_per_pair 秒
+    """
+    def __init__(self, seconds_per_pair: float = 0.0):
+        self.seconds_per_pair = seconds_per_pair
+        self.batches = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.batches.append(len(pairs))
+        time.sleep(self.seconds_per_pair * len(pairs))
+        return [float(content.split()[-1]) for _, content in pairs]
+
+
+def candidates(*scores):
+    return [
+        SearchResult(chunk=Chunk(content=f"chunk {score}", metadata={}, chunk_id=f"c{score}"), score=0.0, rank=rank)
+        for rank, score in enumerate(scores, 1)
+    ]
+
+
+def make_reranker(model, **options) -> CrossEncoderReranker:
+    reranker = CrossEncoderReranker(RerankerConfig(enabled=True, **options))
+    reranker._model = model
+    return reranker
+
+
+def ids(results):
+    return [result.chunk.chunk_id for result in results]
+
+
+def test_candidates_are_scored_in_one_batch_and_top_n_kept():
+    model = FakeCrossEncoder()
+    reranker = make_reranker(model, top_n=2, latency_budget_ms=None)
+    results = reranker.rerank("question", candidates(1, 5, 3, 4))
+    assert ids(results) == ["c5", "c4"]
+    assert [result.rank for result in results] == [1, 2]
+    assert [result.score for result in results] == [5.0, 4.0]
+    assert model.batches == [4]
+
+
+def test_reranking_is_skipped_when_over_the_latency_budget():
+    model = FakeCrossEncoder()
+    reranker = make_reranker(model, top_n=2, latency_budget_ms=10)
+    reranker._seconds_per_pair = 0.05  # 预计2对就要100ms，超出10ms预算
+
+    results = reranker.rerank("question", candidates(1, 5, 3, 4))
+    assert ids(results) == ["c1", "c5"]  # 原始排序的前 top_n 个
+    assert model.batches == []
+    assert reranker.skipped == 1
+    # 每次跳过都调低估计，负载下降后能重新尝试重排序
+    assert reranker._seconds_per_pair < 0.05
+
+
+def test_only_affordable_candidates_are_reranked():
+    model = FakeCrossEncoder()
+    reranker = make_reranker(model, top_n=2, latency_budget_ms=30)
+    reranker._seconds_per_pair = 0.01  # 预算内能打分3对
+
+    results = reranker.rerank("question", candidates(1, 2, 3, 9))
+    assert model.batches == [3]
+    assert ids(results) == ["c3", "c2"]
+
+
+class SlowLoadingReranker(CrossEncoderReranker):
+    """
+    每次取模型都要等待 load_seconds 秒，模拟首次调用时的模型加载
+    """
+    def __init__(self, config: RerankerConfig, model: FakeCrossEncoder, load_seconds: float):
+        super().__init__(config)
+        self._fake_model = model
+        self.load_seconds = load_seconds
+
+    @property
+    def model(self):
+        time.sleep(self.load_seconds)
+        return self._fake_model
+
+
+def test_latency_estimate_excludes_model_loading():
+    reranker = SlowLoadingReranker(RerankerConfig(enabled=True, top_n=2, latency_budget_ms=None),
+                                   FakeCrossEncoder(seconds_per_pair=0.001), load_seconds=0.2)
+    reranker.rerank("question", candidates(1, 2, 3, 4))
+    assert reranker._seconds_per_pair < 0.02
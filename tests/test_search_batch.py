@@ -0,0 +1,70 @@
+# 批量多查询检索测试：未命中缓存的查询合并成一次前向计算，批量近邻搜索与逐个搜索结果一致
+from typing import List
+
+import pytest
+
+from config.models import Chunk
+from config.settings import EmbeddingConfig
+from core.numpy_vector_store import NumpyVectorStore
+from models.base import CachedQueryEmbedding
+from utils.logger import get_logger
+from utils.lru_cache import LRUCache
+
+
+class BatchRecordingEmbedding(CachedQueryEmbedding):
+    """
+    向量与假嵌入模型相同，记录每次查询前向计算的批次
+    """
+    def __init__(self, fake_embedding):
+        self.config = EmbeddingConfig(provider="fake", model_name="fake-embedding")
+        self.logger = get_logger("tests")
+        self.query_cache = LRUCache(64)
+        self.fake = fake_embedding
+        self.query_batches: List[List[str]] = []
+
+    def _encode_queries(self, texts: List[str]) -> List[List[float]]:
+        self.query_batches.append(list(texts))
+        return [self.fake._vector(text) for text in texts]
+
+    def _empty_embedding(self) -> List[float]:
+        return [0.0] * self.fake.dimension
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.fake.embed_documents(texts)
+
+
+@pytest.fixture
+def model(fake_embedding):
+    return BatchRecordingEmbedding(fake_embedding)
+
+
+@pytest.fixture
+def store(model, tmp_path):
+    store = NumpyVectorStore(model, str(tmp_path))
+    store.add_chunks(Chunk(content=f"chunk {i}", metadata={}, chunk_id=f"c{i}", parent_doc_id="doc") for i in range(30))
+    store.save(str(tmp_path))
+    return store
+
+
+def test_missing_queries_are_encoded_in_one_deduplicated_batch(model):
+    model.embed_query("cached question")
+    vectors = model.embed_queries(["cached question", "new one", "  new   one ", "", "another"])
+    assert model.query_batches == [["cached question"], ["new one", "another"]]
+    assert vectors[1] == vectors[2] == model.fake._vector("new one")
+    assert vectors[3] == model._empty_embedding()
+
+
+def test_search_batch_matches_individual_searches(store, model):
+    queries = ["chunk 3", "chunk 17", "something else"]
+    batch = store.search_batch(queries, k=5)
+    assert model.query_batches == [queries]
+
+    model.query_cache.clear()
+    for query, results in zip(queries, batch):
+        single = store.search(query, k=5)
+        assert [r.chunk.chunk_id for r in results] == [r.chunk.chunk_id for r in single]
+        assert [r.rank for r in results] == [1, 2, 3, 4, 5]
+        assert [r.score for r in results] == pytest.approx([r.score for r in single])
+    # 与查询文本相同的chunk排在第一位
+    assert batch[0][0].chunk.chunk_id == "c3"
+    assert batch[1][0].chunk.chunk_id == "c17"
@@ -0,0 +1,61 @@
+# 按嵌入模型token数切分的测试：chunk不超出模型窗口；需要 transformers，首次运行需要下载分词器
+import pytest
+
+pytest.importorskip("transformers")
+
+from config.models import Document  # noqa: E402
+from config.settings import ProcessingConfig  # noqa: E402
+from core.text_processor import EmbeddingTokenCounter, TextProcessor  # noqa: E402
+
+TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"
+WINDOW = 64  # 显式给出窗口，不依赖从模型配置读取的 max_seq_length
+
+
+@pytest.fixture(scope="module")
+def counter():
+    try:
+        return EmbeddingTokenCounter(TOKENIZER, max_tokens=WINDOW)
+    except OSError as e:
+        pytest.skip(f"无法下载分词器 {TOKENIZER}: {e}")
+
+
+def make_processor(chunk_size, chunk_overlap=8) -> TextProcessor:
+    return TextProcessor(ProcessingConfig(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_unit="tokens",
+                                          tokenizer_name=TOKENIZER, max_tokens=WINDOW))
+
+
+def test_counter_reserves_special_tokens_and_caches_counts(counter):
+    assert counter.max_tokens == WINDOW - counter.tokenizer.num_special_tokens_to_add()
+    text = "LangChain connects language models to external data."
+    assert counter(text) == len(counter.tokenizer.encode(text, add_special_tokens=False))
+    counter(text)
+    assert counter.count.cache_info().hits >= 1
+
+
+def test_split_to_fit_respects_the_token_limit(counter):
+    text = "supercalifragilistic" * 40  # 没有任何分隔符
+    pieces = counter.split_to_fit(text, 10)
+    assert len(pieces) > 1
+    assert all(counter(piece) <= 10 for piece in pieces)
+    assert "".join(pieces) == text
+
+
+def test_chunk_size_larger_than_the_window_is_clamped(counter):
+    processor = make_processor(chunk_size=1000)
+    assert processor.chunk_size == counter.max_tokens
+
+
+def test_every_chunk_fits_the_chunk_size(counter):
+    content = "\n\n".join([
+        "# Retrievers\n\n" + "Retrievers return the documents most relevant to a query. " * 12,
+        "## Vector stores\n\n" + "Vector stores keep embeddings for similarity search. " * 9,
+        "## Identifiers\n\n" + "OpenAIEmbeddings_embed_query_" * 30,
+        "中文文本同样按照嵌入模型的分词器计算长度。" * 10,
+    ])
+    processor = make_processor(chunk_size=48)
+    chunks = processor.process_single_document(Document(content=content, doc_id="doc.md", metadata={"source": "doc.md"}))
+
+    assert len(chunks) > 4
+    assert all(counter(chunk.content) <= 48 for chunk in chunks)
+    # 编码时加上特殊token后仍在模型窗口内
+    assert all(len(counter.tokenizer.encode(chunk.content)) <= WINDOW for chunk in chunks)
@@ -1,4 +1,4 @@
 from .logger import setup_logger, get_logger
-from .exceptions import RAGSystemError, DocumentLoadError, EmbeddingError, SearchError
+from .exceptions import RAGSystemError, DocumentLoadError, EmbeddingError, SearchError, LLMError, CircuitOpenError
 
-__all__ = ['setup_logger', 'get_logger', 'RAGSystemError', 'DocumentLoadError', 'EmbeddingError', 'SearchError']
+__all__ = ['setup_logger', 'get_logger', 'RAGSystemError', 'DocumentLoadError', 'EmbeddingError', 'SearchError', 'LLMError', 'CircuitOpenError']
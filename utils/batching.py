@@ -0,0 +1,84 @@
+import threading
+import time
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def batched(iterable: Iterable[T], batch_size: int) -> Iterator[List[T]]:
+    """
+    把可迭代对象按固定大小分批，最后一批可能不足 batch_size
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size 必须大于0")
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class AdaptiveBatcher:
+    """
+    按长度排序、按token预算分批：长度相近的文本放在同一批，减少padding浪费
+    每批的条数 = token预算 // 本批最长文本的token数（不超过 max_batch_size），
+    并根据实测吞吐（每秒处理的有效token数）自动调大或调小token预算；结果按原始顺序返回
+    """
+    STEP = 1.25  # 每次调整token预算的倍数
+    TOLERANCE = 0.05  # 吞吐变化在该比例内视为噪声，不调整
+    EMA_ALPHA = 0.3
+
+    def __init__(self, token_budget: int = 8192, max_batch_size: int = 128, adaptive: bool = True,
+                 min_token_budget: int = 512, max_token_budget: int = 131072):
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.adaptive = adaptive
+        self.min_token_budget = min_token_budget
+        self.max_token_budget = max_token_budget
+        self._direction = 1
+        self._avg_throughput: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def run(self, items: Sequence[T], lengths: Sequence[int], encode: Callable[[List[T]], List[R]]) -> List[R]:
+        """
+        对 items 分批调用 encode，lengths 为每个元素的token数
+        """
+        order = sorted(range(len(items)), key=lambda i: lengths[i], reverse=True)
+        results: List[Optional[R]] = [None] * len(items)
+        pos = 0
+        while pos < len(order):
+            # 按长度降序，本批第一个就是最长的
+            longest = max(lengths[order[pos]], 1)
+            size = max(1, min(self.max_batch_size, self.token_budget // longest, len(order) - pos))
+            batch = order[pos:pos + size]
+            start_time = time.perf_counter()
+            outputs = encode([items[i] for i in batch])
+            elapsed = time.perf_counter() - start_time
+            for i, output in zip(batch, outputs):
+                results[i] = output
+            if self.adaptive:
+                self._tune(sum(lengths[i] for i in batch), elapsed)
+            pos += size
+        return results
+
+    def _tune(self, tokens: int, elapsed: float) -> None:
+        """
+        爬山法调节token预算：吞吐明显高于滑动平均时沿当前方向继续调整，明显低于时反向
+        """
+        if elapsed <= 0 or tokens <= 0:
+            return
+        throughput = tokens / elapsed
+        with self._lock:
+            if self._avg_throughput is not None:
+                if throughput < self._avg_throughput * (1 - self.TOLERANCE):
+                    self._direction = -self._direction
+                if abs(throughput - self._avg_throughput) > self._avg_throughput * self.TOLERANCE:
+                    factor = self.STEP if self._direction > 0 else 1 / self.STEP
+                    self.token_budget = int(min(self.max_token_budget,
+                                                max(self.min_token_budget, self.token_budget * factor)))
+                self._avg_throughput += self.EMA_ALPHA * (throughput - self._avg_throughput)
+            else:
+                self._avg_throughput = throughput
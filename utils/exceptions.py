@@ -27,3 +27,15 @@ class ConfigurationError(RAGSystemError):
     配置异常类
     """
     pass
+
+class LLMError(RAGSystemError):
+    """
+    LLM调用异常类（重试耗尽或不可重试的错误）
+    """
+    pass
+
+class CircuitOpenError(LLMError):
+    """
+    熔断器打开时拒绝请求的异常类
+    """
+    pass
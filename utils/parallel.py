@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def resolve_workers(max_workers: Optional[int]) -> int:
+    """
+    解析进程数配置：None 或 <=0 表示使用全部CPU核数
+    """
+    if max_workers is None or max_workers <= 0:
+        return os.cpu_count() or 1
+    return max_workers
+
+
+def ordered_parallel_map(func: Callable[[T], R], items: Iterable[T],
+                         max_workers: Optional[int] = None,
+                         max_in_flight: Optional[int] = None,
+                         initializer: Optional[Callable] = None,
+                         initargs: Tuple = ()) -> Iterator[R]:
+    """
+    在进程池中执行 func，按输入顺序逐个产出结果
+    同时在途的任务数不超过 max_in_flight（默认进程数的2倍），消费者处理得慢时不会继续提交，
+    避免结果在内存中堆积
+    func 必须是模块级函数（可被pickle）
+    工作进程用 spawn 方式启动：调用方通常已加载PyTorch/tokenizers，在其线程已启动的进程中 fork 可能死锁，
+    工作进程的状态由 initializer 重新建立
+    """
+    workers = resolve_workers(max_workers)
+    max_in_flight = max_in_flight or workers * 2
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=initializer,
+        initargs=initargs
+    )
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # 消费者提前退出时取消尚未开始的任务
+        executor.shutdown(wait=True, cancel_futures=True)